@@ -2,6 +2,12 @@ import math
 import heapq
 from collections import deque
 
+import numpy as np
+
+from fleet import as_snapshot
+from instrumentation import metrics, record_graph, timed
+from visibility_graph import SIGNAL_SPEED, build_los_graph, haversine_pairs, horizon_adjacencies, los_adjacency
+
 def extrapolate_position(lat, lon, velocity, track, time_delta_seconds):
     """
     Calculates new lat/lon based on velocity (m/s) and true track (degrees).
@@ -29,6 +35,129 @@ def extrapolate_position(lat, lon, velocity, track, time_delta_seconds):
     
     return new_lat, new_lon
 
+# WGS84 ellipsoid (semi-major axis in meters, flattening)
+WGS84_A = 6378137.0
+WGS84_F = 1 / 298.257223563
+
+FORECAST_MODELS = ('flat', 'spherical', 'ellipsoidal')
+
+def extrapolate_positions(lat, lon, velocity, track, time_delta_seconds, model='flat'):
+    """
+    Vectorized forecast over arrays of aircraft. Arguments broadcast
+    against each other (e.g. (1, N) positions with (H, 1) time offsets);
+    NaN velocity or track means the aircraft keeps its position, like None
+    does in extrapolate_position. Longitudes are wrapped to [-180, 180).
+
+    model: 'flat'        extrapolate_position's local flat-earth step
+                         (fast; drifts over long horizons and near the poles)
+           'spherical'   great-circle destination on a sphere of radius R
+           'ellipsoidal' geodesic destination on the WGS84 ellipsoid
+                         (Vincenty's direct formula)
+    """
+    lat = np.asarray(lat, dtype=float)
+    lon = np.asarray(lon, dtype=float)
+    velocity = np.asarray(velocity, dtype=float)
+    track = np.asarray(track, dtype=float)
+
+    moving = ~(np.isnan(velocity) | np.isnan(track))
+    distance = np.where(moving, velocity, 0.0) * time_delta_seconds
+    track_rad = np.radians(np.where(moving, track, 0.0))
+
+    if model == 'flat':
+        new_lat, new_lon = _flat_destination(lat, lon, distance, track_rad)
+    elif model == 'spherical':
+        new_lat, new_lon = _spherical_destination(lat, lon, distance, track_rad)
+    elif model == 'ellipsoidal':
+        new_lat, new_lon = _ellipsoidal_destination(lat, lon, distance, track_rad)
+    else:
+        raise ValueError(f"Unknown forecast model: {model}")
+
+    return new_lat, np.mod(new_lon + 180, 360) - 180
+
+def _flat_destination(lat, lon, distance, track_rad):
+    R = 6371000
+    delta_n = distance * np.cos(track_rad)
+    delta_e = distance * np.sin(track_rad)
+
+    # At the poles east is undefined; leave the longitude alone there
+    cos_lat = np.cos(np.radians(lat))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        dlon = np.where(np.abs(cos_lat) > 1e-12, delta_e / (R * cos_lat), 0.0)
+
+    new_lat = lat + (delta_n / R) * (180 / math.pi)
+    new_lon = lon + dlon * (180 / math.pi)
+    # Past a pole: reflect back and continue on the opposite meridian
+    folded = np.mod(new_lat + 90, 360)
+    over = folded > 180
+    new_lat = np.where(over, 270 - folded, folded - 90)
+    new_lon = np.where(over, new_lon + 180, new_lon)
+    return new_lat, new_lon
+
+def _spherical_destination(lat, lon, distance, track_rad):
+    R = 6371000
+    phi1 = np.radians(lat)
+    delta = distance / R
+    sin_phi1, cos_phi1 = np.sin(phi1), np.cos(phi1)
+    sin_delta, cos_delta = np.sin(delta), np.cos(delta)
+
+    sin_phi2 = np.clip(sin_phi1 * cos_delta + cos_phi1 * sin_delta * np.cos(track_rad), -1.0, 1.0)
+    dlon = np.arctan2(np.sin(track_rad) * sin_delta * cos_phi1, cos_delta - sin_phi1 * sin_phi2)
+    return np.degrees(np.arcsin(sin_phi2)), lon + np.degrees(dlon)
+
+def _ellipsoidal_destination(lat, lon, distance, track_rad, tolerance=1e-12, max_iterations=20):
+    a, f = WGS84_A, WGS84_F
+    b = a * (1 - f)
+    sin_alpha1, cos_alpha1 = np.sin(track_rad), np.cos(track_rad)
+
+    # Reduced latitude and the equatorial azimuth of the geodesic
+    tan_u1 = (1 - f) * np.tan(np.radians(lat))
+    cos_u1 = 1 / np.sqrt(1 + tan_u1 ** 2)
+    sin_u1 = tan_u1 * cos_u1
+    sigma1 = np.arctan2(tan_u1, cos_alpha1)
+    sin_alpha = cos_u1 * sin_alpha1
+    cos2_alpha = 1 - sin_alpha ** 2
+    u2 = cos2_alpha * (a * a - b * b) / (b * b)
+    big_a = 1 + u2 / 16384 * (4096 + u2 * (-768 + u2 * (320 - 175 * u2)))
+    big_b = u2 / 1024 * (256 + u2 * (-128 + u2 * (74 - 47 * u2)))
+
+    # Iterate the arc length on the auxiliary sphere (a few rounds below 1000 km)
+    sigma = distance / (b * big_a)
+    for _ in range(max_iterations):
+        cos_2sigma_m = np.cos(2 * sigma1 + sigma)
+        sin_sigma, cos_sigma = np.sin(sigma), np.cos(sigma)
+        delta_sigma = big_b * sin_sigma * (cos_2sigma_m + big_b / 4 * (
+            cos_sigma * (-1 + 2 * cos_2sigma_m ** 2)
+            - big_b / 6 * cos_2sigma_m * (-3 + 4 * sin_sigma ** 2) * (-3 + 4 * cos_2sigma_m ** 2)))
+        new_sigma = distance / (b * big_a) + delta_sigma
+        converged = np.all(np.abs(new_sigma - sigma) < tolerance)
+        sigma = new_sigma
+        if converged:
+            break
+
+    cos_2sigma_m = np.cos(2 * sigma1 + sigma)
+    sin_sigma, cos_sigma = np.sin(sigma), np.cos(sigma)
+    x = sin_u1 * sin_sigma - cos_u1 * cos_sigma * cos_alpha1
+    phi2 = np.arctan2(sin_u1 * cos_sigma + cos_u1 * sin_sigma * cos_alpha1,
+                      (1 - f) * np.sqrt(sin_alpha ** 2 + x ** 2))
+    lam = np.arctan2(sin_sigma * sin_alpha1, cos_u1 * cos_sigma - sin_u1 * sin_sigma * cos_alpha1)
+    c = f / 16 * cos2_alpha * (4 + f * (4 - 3 * cos2_alpha))
+    dlon = lam - (1 - c) * f * sin_alpha * (
+        sigma + c * sin_sigma * (cos_2sigma_m + c * cos_sigma * (-1 + 2 * cos_2sigma_m ** 2)))
+    return np.degrees(phi2), lon + np.degrees(dlon)
+
+@timed("forecast")
+def extrapolate_fleet(fleet, time_delta_seconds, model='flat'):
+    """
+    Forecast a whole FleetSnapshot; returns a new snapshot that shares every
+    column except lat/lon with the original. model as in extrapolate_positions.
+    """
+    if not time_delta_seconds:
+        return fleet
+    lat, lon = extrapolate_positions(
+        fleet.lat, fleet.lon, fleet.velocity, fleet.track, time_delta_seconds, model
+    )
+    return fleet.with_positions(lat, lon)
+
 # ---------------------------
 # Helper functions
 # ---------------------------
@@ -47,62 +176,224 @@ def los_distance(alt1, alt2):
     h2 = alt2 if alt2 and alt2 > 0 else 0
     return math.sqrt(2*R*h1) + math.sqrt(2*R*h2)
 
+# ---------------------------
+# Path reconstruction
+# ---------------------------
+def _walk_back(prev, node):
+    """
+    Follow predecessor links from node back to the search root.
+    Returns the nodes root-first.
+    """
+    path = []
+    while node is not None:
+        path.append(node)
+        node = prev[node]
+    path.reverse()
+    return path
+
 # ---------------------------
 # Dijkstra shortest path
 # ---------------------------
-def dijkstra(graph, start_id, end_id):
-    queue = [(0, start_id, [])]
+def dijkstra(graph, start_id, end_id, stats=None):
+    """
+    Return the minimum-weight path (list of node ids) or None.
+    Heap entries are (cost, node); the path is rebuilt from a predecessor
+    map, so pushes do not copy paths.
+    stats: optional dict; 'expanded' is set to the number of settled nodes
+    """
+    _, prev, seen = _dijkstra_search(graph, start_id, end_id)
+    if stats is not None:
+        stats['expanded'] = len(seen)
+    if end_id not in seen:
+        return None
+    return _walk_back(prev, end_id)
+
+def dijkstra_tree(graph, start_id):
+    """
+    Single-source shortest-path tree: (dist, prev) dicts covering every
+    node reachable from start_id.
+    """
+    dist, prev, _ = _dijkstra_search(graph, start_id, None)
+    return dist, prev
+
+def _dijkstra_search(graph, start_id, end_id):
+    """
+    Settle nodes from start_id until end_id is settled (or everything
+    reachable when end_id is None). Returns (dist, prev, settled).
+    """
+    dist = {start_id: 0}
+    prev = {start_id: None}
+    queue = [(0, start_id)]
     seen = set()
     while queue:
-        total, node, path = heapq.heappop(queue)
-        if node == end_id:
-            return path + [node]
+        total, node = heapq.heappop(queue)
         if node in seen:
             continue
         seen.add(node)
+        if node == end_id:
+            break
         for neighbor, delay in graph.get(node, []):
-            if neighbor not in seen:
-                heapq.heappush(queue, (total + delay, neighbor, path + [node]))
-    return None
+            cost = total + delay
+            if neighbor not in seen and cost < dist.get(neighbor, math.inf):
+                dist[neighbor] = cost
+                prev[neighbor] = node
+                heapq.heappush(queue, (cost, neighbor))
+    return dist, prev, seen
+
+# ---------------------------
+# Bidirectional A* for the delay metric
+# ---------------------------
+def bidirectional_astar(graph, start_id, end_id, fleet, extra_delay=0.0, stats=None):
+    """
+    Minimum-delay path using bidirectional A*. The heuristic is the
+    great-circle distance to the target divided by the signal speed, which
+    never exceeds the delay of the remaining links. Both searches use the
+    average potential p(v) = (h_end(v) - h_start(v)) / 2, so reduced link
+    weights stay non-negative in both directions and the usual
+    bidirectional Dijkstra stopping rule applies.
+
+    fleet: FleetSnapshot holding the positions the graph was built from
+    extra_delay: per-link extra delay used for the weights (must be >= 0)
+    """
+    if extra_delay < 0:
+        raise ValueError("bidirectional A* needs a non-negative extra_delay")
+    index = fleet.index
+    if start_id not in index or end_id not in index:
+        return None
+
+    # Potential of every aircraft, computed once with NumPy
+    s, t = index[start_id], index[end_id]
+    to_end = haversine_pairs(fleet.lat, fleet.lon, fleet.lat[t], fleet.lon[t])
+    to_start = haversine_pairs(fleet.lat, fleet.lon, fleet.lat[s], fleet.lon[s])
+    potential = ((to_end - to_start) / (2 * SIGNAL_SPEED)).tolist()
+
+    dist = ({start_id: 0.0}, {end_id: 0.0})
+    prev = ({start_id: None}, {end_id: None})
+    queues = ([(0.0, start_id)], [(0.0, end_id)])
+    settled = (set(), set())
+    best, meet = math.inf, None
+    if start_id == end_id:
+        best, meet = 0.0, start_id
+
+    while queues[0] and queues[1]:
+        if queues[0][0][0] + queues[1][0][0] >= best:
+            break
+        # Forward (+1) searches from start, backward (-1) from end
+        side = 0 if queues[0][0][0] <= queues[1][0][0] else 1
+        sign = 1 if side == 0 else -1
+        total, node = heapq.heappop(queues[side])
+        if node in settled[side]:
+            continue
+        settled[side].add(node)
+        p_node = potential[index[node]]
+        other_dist = dist[1 - side]
+        for neighbor, weight in graph.get(node, []):
+            reduced = max(weight + sign * (potential[index[neighbor]] - p_node), 0.0)
+            cost = total + reduced
+            if neighbor not in settled[side] and cost < dist[side].get(neighbor, math.inf):
+                dist[side][neighbor] = cost
+                prev[side][neighbor] = node
+                heapq.heappush(queues[side], (cost, neighbor))
+            if neighbor in other_dist:
+                through = total + reduced + other_dist[neighbor]
+                if through < best:
+                    best, meet = through, (node, neighbor) if side == 0 else (neighbor, node)
+
+    if stats is not None:
+        stats['expanded'] = len(settled[0]) + len(settled[1])
+    if meet is None:
+        return None
+    if not isinstance(meet, tuple):
+        return [meet]
+    # meet is the (forward node, backward node) link that closed the best path
+    forward = _walk_back(prev[0], meet[0])
+    backward = _walk_back(prev[1], meet[1])
+    backward.reverse()
+    return forward + backward
 
 # ---------------------------
 # BFS for hop-minimizing
 # ---------------------------
-def bfs_shortest_hops(graph, start_id, end_id):
+def bfs_shortest_hops(graph, start_id, end_id, stats=None):
     """
     Return path (list of node ids) minimizing number of hops (BFS).
     graph: adjacency list mapping id -> list of (neighbor_id, weight)
+    stats: optional dict; 'expanded' is set to the number of dequeued nodes
+    """
+    _, prev, expanded = _bfs_search(graph, start_id, end_id)
+    if stats is not None:
+        stats['expanded'] = expanded
+    if end_id not in prev:
+        return None
+    return _walk_back(prev, end_id)
+
+def bfs_tree(graph, start_id):
+    """
+    Hop-count tree: (hops, prev) dicts covering every node reachable from start_id.
     """
-    q = deque([[start_id]])
-    visited = {start_id}
+    hops, prev, _ = _bfs_search(graph, start_id, None)
+    return hops, prev
+
+def _bfs_search(graph, start_id, end_id):
+    """
+    Breadth-first search from start_id, stopping once end_id is dequeued
+    (or exhausting the component when end_id is None).
+    Returns (hops, prev, expanded).
+    """
+    q = deque([start_id])
+    hops = {start_id: 0}
+    prev = {start_id: None}
+    expanded = 0
     while q:
-        path = q.popleft()
-        node = path[-1]
+        node = q.popleft()
+        expanded += 1
         if node == end_id:
-            return path
+            break
         for neighbor, _ in graph.get(node, []):
-            if neighbor not in visited:
-                visited.add(neighbor)
-                q.append(path + [neighbor])
-    return None
+            if neighbor not in prev:
+                prev[neighbor] = node
+                hops[neighbor] = hops[node] + 1
+                q.append(neighbor)
+    return hops, prev, expanded
+
+def find_path(graph, start_id, end_id, metric='delay', search='dijkstra', fleet=None, extra_delay=0.0,
+              stats=None):
+    """
+    Run the search that matches the metric: BFS for 'hops', Dijkstra otherwise.
+    search='astar' switches the delay metric to bidirectional A*, which needs
+    the FleetSnapshot the graph was built from. Pairs in different connected
+    components are rejected without a search when the graph knows its
+    components (CSRAdjacency).
+    """
+    if hasattr(graph, 'connected') and not graph.connected(start_id, end_id):
+        metrics.count("search.rejected")
+        return None
+    if stats is None and metrics.enabled:
+        stats = {}
+    with metrics.timer("search"):
+        if metric == 'hops':
+            path = bfs_shortest_hops(graph, start_id, end_id, stats)
+        elif search == 'astar':
+            if fleet is None:
+                raise ValueError("search='astar' needs the fleet positions")
+            path = bidirectional_astar(graph, start_id, end_id, fleet, extra_delay, stats)
+        elif search == 'dijkstra':
+            path = dijkstra(graph, start_id, end_id, stats)
+        else:
+            raise ValueError(f"Unknown search: {search}")
+    if stats is not None and 'expanded' in stats:
+        metrics.count("search.expanded", stats['expanded'])
+        metrics.gauge("search.last_expanded", stats['expanded'])
+    return path
 
 # ---------------------------
-# Main path function
+# Graph construction
 # ---------------------------
-def compute_los_path(planes_list, start_icao, end_icao, extra_delay=0.0, metric='delay'):
+def build_graph_python(nodes, extra_delay=0.0, metric='delay'):
     """
-    planes_list: list of dicts, each with keys ['icao24','callsign','lat','lon','geo_alt']
-    start_icao: ICAO24 of start plane (already in planes_list)
-    end_icao: ICAO24 of end plane (already in planes_list)
-    extra_delay: float, extra constant added to each link delay
-    metric: 'delay' (default) to minimize estimated transmission delay (Dijkstra),
-            'hops' to minimize number of relays (BFS / unit weights)
-
-    Returns: list of dicts representing the path from start to end
+    Reference graph builder: exact LOS test on every pair in pure Python.
+    Kept for cross-checking the vectorized builder.
     """
-    nodes = planes_list  # start/end are already included
-
-    # Build graph: adjacency list by LOS
     graph = {p['icao24']: [] for p in nodes}
     for i, p1 in enumerate(nodes):
         for j, p2 in enumerate(nodes):
@@ -117,18 +408,233 @@ def compute_los_path(planes_list, start_icao, end_icao, extra_delay=0.0, metric=
                     weight = d / 300000 + extra_delay
                 graph[p1['icao24']].append((p2['icao24'], weight))
                 graph[p2['icao24']].append((p1['icao24'], weight))
+    return graph
+
+def build_graph(nodes, extra_delay=0.0, metric='delay', backend='grid', los_predicate=None):
+    """
+    Build the LOS adjacency list id -> list of (neighbor_id, weight).
+    nodes: FleetSnapshot or list of plane dicts
+    backend: 'grid' (spatially culled, vectorized), 'parallel' (grid tiles
+             on a process pool), 'bruteforce' (all pairs, vectorized) or
+             'python' (reference pairwise loop)
+    los_predicate: optional extra LOS test run on the geometric edges,
+                   e.g. terrain.TerrainLOS (not with backend='python')
+    """
+    if backend == 'python':
+        if los_predicate is not None:
+            raise ValueError("los_predicate needs a vectorized backend")
+        return build_graph_python(nodes, extra_delay, metric)
+    fleet = as_snapshot(nodes)
+    return build_los_graph(
+        fleet.icao24.tolist(),
+        fleet.lat,
+        fleet.lon,
+        fleet.geo_alt,
+        metric=metric,
+        extra_delay=extra_delay,
+        backend=backend,
+        los_predicate=los_predicate
+    )
+
+# ---------------------------
+# Main path function
+# ---------------------------
+def compute_los_path(planes_list, start_icao, end_icao, extra_delay=0.0, metric='delay', backend='grid',
+                     los_graph=None, search='dijkstra', los_predicate=None):
+    """
+    planes_list: FleetSnapshot, or list of dicts with keys ['icao24','callsign','lat','lon','geo_alt']
+    start_icao: ICAO24 of start plane (already in planes_list)
+    end_icao: ICAO24 of end plane (already in planes_list)
+    extra_delay: float, extra constant added to each link delay
+    metric: 'delay' (default) to minimize estimated transmission delay (Dijkstra),
+            'hops' to minimize number of relays (BFS / unit weights)
+    backend: graph builder, 'grid' (default), 'parallel', 'bruteforce' or 'python' (see build_graph)
+    los_graph: optional IncrementalLOSGraph kept by the caller; it is updated
+               to planes_list instead of building a new graph
+    search: 'dijkstra' (default) or 'astar' (bidirectional A*, delay metric only)
+    los_predicate: optional extra LOS test on the geometric edges, e.g.
+                   terrain.TerrainLOS (vectorized backends only, no los_graph)
+
+    Returns: list of dicts (PlaneViews for a FleetSnapshot) representing the path from start to end
+    """
+    nodes = as_snapshot(planes_list)  # start/end are already included
+    if los_predicate is not None and (los_graph is not None or backend == 'python'):
+        raise ValueError("los_predicate needs a vectorized backend and no los_graph")
+
+    # Build graph: adjacency list by LOS
+    with metrics.timer("graph_build"):
+        if los_graph is not None:
+            los_graph.apply_snapshot(nodes)
+            graph = los_graph.adjacency(metric, extra_delay)
+        elif backend == 'python':
+            graph = build_graph_python(nodes, extra_delay, metric)
+        else:
+            graph = los_adjacency(nodes, metric, extra_delay, backend, los_predicate)
+    record_graph(graph)
 
     # Compute path as list of icao24 IDs
-    if metric == 'hops':
-        path_ids = bfs_shortest_hops(graph, start_icao, end_icao)
-    else:
-        path_ids = dijkstra(graph, start_icao, end_icao)
+    path_ids = find_path(graph, start_icao, end_icao, metric, search, nodes, extra_delay)
 
     if path_ids is None:
         return None
 
-    # Convert path IDs to full node dicts
-    id_to_node = {p['icao24']: p for p in nodes}
-    path_nodes = [id_to_node[icao] for icao in path_ids]
+    # Convert path IDs to the caller's node objects
+    path_nodes = [planes_list[nodes.row_of(icao)] for icao in path_ids]
 
     return path_nodes
+
+# ---------------------------
+# Multi-horizon routing
+# ---------------------------
+def compute_los_paths_over_horizons(planes_list, start_icao, end_icao, horizons, extra_delay=0.0,
+                                    metric='delay', backend='grid', search='dijkstra', model='flat'):
+    """
+    Route start -> end at several forecast horizons from one snapshot.
+    All positions for all horizons are extrapolated in one vectorized pass.
+    Graphs come from visibility_graph.horizon_adjacencies: neighboring
+    horizons share one candidate pair set and CSR layout, so each horizon
+    only re-tests candidates before its own search. The searches are not
+    shared: with 21 horizons this is about 2.5x faster than a
+    compute_los_path call per horizon for 5,000 aircraft, but under 2x
+    for 1,000, where the searches take most of the time.
+
+    horizons: sequence of forecast offsets in seconds (e.g. range(0, 3601, 60))
+    backend: 'grid' (default) or 'bruteforce', to find the candidates
+    search: 'dijkstra' (default) or 'astar' (see compute_los_path)
+    model: forecast model, see extrapolate_positions
+
+    Returns: list with one entry per horizon: the path as a list of
+             PlaneViews of the forecasted fleet, or None if unreachable
+    """
+    fleet = as_snapshot(planes_list)
+    horizons = np.asarray(list(horizons), dtype=float)
+    if fleet.row_of(start_icao) is None or fleet.row_of(end_icao) is None:
+        return [None] * len(horizons)
+
+    # (H, N) forecast arrays
+    lats, lons = extrapolate_positions(
+        fleet.lat[None, :], fleet.lon[None, :],
+        fleet.velocity[None, :], fleet.track[None, :],
+        horizons[:, None], model
+    )
+
+    paths = []
+    graphs = horizon_adjacencies(fleet, lats, lons, metric, extra_delay, backend)
+    for lat, lon in zip(lats, lons):
+        forecast = fleet.with_positions(lat, lon)
+        with metrics.timer("graph_build"):
+            graph = next(graphs)
+        record_graph(graph)
+        path_ids = find_path(graph, start_icao, end_icao, metric, search, forecast, extra_delay)
+        paths.append(None if path_ids is None else [forecast[forecast.row_of(icao)] for icao in path_ids])
+    return paths
+
+# ---------------------------
+# Shared-graph routing queries
+# ---------------------------
+class LOSRouter:
+    """
+    Builds the visibility graph of one snapshot once and answers many
+    routing queries on it: single-source shortest-path trees (delay and
+    hop metrics) and batches of (start, end) pairs that reuse those trees.
+
+    Links are symmetric, so a tree rooted at either endpoint answers a pair;
+    batches are grouped around the endpoints that recur most often.
+    """
+
+    METRICS = ('delay', 'hops')
+
+    def __init__(self, planes_list, extra_delay=0.0, backend='grid', los_predicate=None):
+        self.planes = planes_list
+        self.fleet = as_snapshot(planes_list)
+        self.extra_delay = extra_delay
+        with metrics.timer("graph_build"):
+            delay_graph = los_adjacency(self.fleet, 'delay', extra_delay, backend, los_predicate)
+        record_graph(delay_graph)
+        self._graphs = {'delay': delay_graph, 'hops': delay_graph.with_metric('hops')}
+        self._trees = {}
+
+    def graph(self, metric='delay'):
+        if metric not in self._graphs:
+            raise ValueError(f"Unknown metric: {metric}")
+        return self._graphs[metric]
+
+    def shortest_path_tree(self, start_icao, metric='delay'):
+        """
+        (cost, prev) dicts from start_icao to every reachable aircraft.
+        cost is total delay for 'delay' and hop count for 'hops'.
+        Trees are computed once per (start, metric) and reused.
+        """
+        key = (start_icao, metric)
+        if key not in self._trees:
+            graph = self.graph(metric)
+            if start_icao not in graph:
+                self._trees[key] = ({}, {})
+            elif metric == 'hops':
+                self._trees[key] = bfs_tree(graph, start_icao)
+            else:
+                self._trees[key] = dijkstra_tree(graph, start_icao)
+        return self._trees[key]
+
+    def path_ids(self, start_icao, end_icao, metric='delay'):
+        """
+        Path as a list of icao24s, or None if end is unreachable.
+        """
+        _, prev = self.shortest_path_tree(start_icao, metric)
+        if end_icao not in prev:
+            return None
+        return _walk_back(prev, end_icao)
+
+    def route(self, start_icao, end_icao, metric='delay'):
+        """
+        Path as a list of the caller's plane objects, like compute_los_path.
+        """
+        return self._to_nodes(self.path_ids(start_icao, end_icao, metric))
+
+    def route_many(self, pairs, metric='delay'):
+        """
+        Paths for a batch of (start, end) pairs, in input order (None where
+        unreachable). Each pair is answered from the tree of whichever
+        endpoint appears most often in the batch.
+        """
+        return [self._to_nodes(ids) for ids, _ in self.paths_with_costs(pairs, metric)]
+
+    def paths_with_costs(self, pairs, metric='delay'):
+        """
+        Like route_many, but returns (path_ids, cost) per pair: icao24 lists
+        and the total delay (or hop count); (None, None) where unreachable.
+        """
+        pairs = list(pairs)
+        counts = {}
+        for start, end in pairs:
+            counts[start] = counts.get(start, 0) + 1
+            counts[end] = counts.get(end, 0) + 1
+
+        graph = self.graph(metric)
+        results = []
+        for start, end in pairs:
+            if not graph.connected(start, end):
+                # Different relay islands: no tree needed
+                metrics.count("search.rejected")
+                results.append((None, None))
+                continue
+            has_start = (start, metric) in self._trees
+            has_end = (end, metric) in self._trees
+            if (has_end and not has_start) or (has_start == has_end and counts[end] > counts[start]):
+                root, leaf = end, start
+            else:
+                root, leaf = start, end
+            cost, prev = self.shortest_path_tree(root, metric)
+            if leaf not in prev:
+                results.append((None, None))
+                continue
+            ids = _walk_back(prev, leaf)
+            if root != start:
+                ids.reverse()
+            results.append((ids, cost[leaf]))
+        return results
+
+    def _to_nodes(self, path_ids):
+        if path_ids is None:
+            return None
+        return [self.planes[self.fleet.row_of(icao)] for icao in path_ids]
@@ -0,0 +1,227 @@
+import hashlib
+import itertools
+from collections.abc import Mapping
+
+import numpy as np
+
+# Per-aircraft fields, in the order get_planes has always produced them
+FIELDS = ("icao24", "callsign", "lat", "lon", "geo_alt", "velocity", "track")
+NUMERIC_FIELDS = ("lat", "lon", "geo_alt", "velocity", "track")
+
+# Source of snapshot_id values (unique per process, unlike id())
+_snapshot_ids = itertools.count(1)
+
+# ---------------------------
+# Dict view of one row
+# ---------------------------
+class PlaneView(Mapping):
+    """
+    Read-only dict view of one aircraft in a FleetSnapshot. Nothing is
+    copied: values are read from the snapshot columns on access, so callers
+    written for plane dicts (p['lat'], p.get('geo_alt', 0)) keep working.
+    """
+
+    __slots__ = ("_fleet", "row")
+
+    def __init__(self, fleet, row):
+        self._fleet = fleet
+        self.row = row
+
+    def __getitem__(self, key):
+        if key not in FIELDS:
+            raise KeyError(key)
+        value = getattr(self._fleet, key)[self.row]
+        if key in NUMERIC_FIELDS:
+            return None if np.isnan(value) else float(value)
+        # Empty strings stand in for missing callsigns in the string column
+        return str(value) or None
+
+    def __iter__(self):
+        return iter(FIELDS)
+
+    def __len__(self):
+        return len(FIELDS)
+
+    def copy(self):
+        return dict(self)
+
+    def __repr__(self):
+        return f"PlaneView({dict(self)!r})"
+
+# ---------------------------
+# Columnar snapshot
+# ---------------------------
+class FleetSnapshot:
+    """
+    Struct-of-arrays fleet state: one contiguous array per field plus an
+    icao24 -> row index. Iterating or indexing yields PlaneView rows, so a
+    snapshot can be passed anywhere a list of plane dicts was expected.
+
+    Missing numeric values are stored as NaN and missing callsigns as ''.
+    Every snapshot (including derived ones) gets a fresh snapshot_id that
+    in-process caches can key on; fingerprint identifies the content and
+    is the same in every process.
+    """
+
+    def __init__(self, icao24, callsign, lat, lon, geo_alt, velocity, track, timestamp=None):
+        self.icao24 = np.asarray(icao24, dtype=str)
+        self.callsign = _str_column(callsign)
+        self.lat = _float_column(lat)
+        self.lon = _float_column(lon)
+        self.geo_alt = _float_column(geo_alt)
+        self.velocity = _float_column(velocity)
+        self.track = _float_column(track)
+        self.timestamp = timestamp
+        self.snapshot_id = next(_snapshot_ids)
+        self._index = None
+        self._fingerprint = None
+
+        n = len(self.icao24)
+        for name in FIELDS:
+            if len(getattr(self, name)) != n:
+                raise ValueError(f"Column '{name}' has {len(getattr(self, name))} rows, expected {n}")
+
+    @classmethod
+    def from_dicts(cls, planes, timestamp=None):
+        """
+        Build a snapshot from a list of plane dicts (keys as in FIELDS;
+        missing keys are treated as missing values).
+        """
+        planes = list(planes)
+        return cls(
+            [p["icao24"] for p in planes],
+            [p.get("callsign") for p in planes],
+            [p["lat"] for p in planes],
+            [p["lon"] for p in planes],
+            [p.get("geo_alt") for p in planes],
+            [p.get("velocity") for p in planes],
+            [p.get("track") for p in planes],
+            timestamp=timestamp
+        )
+
+    @classmethod
+    def from_states(cls, states, timestamp=None):
+        """
+        Build a snapshot of airborne aircraft from OpenSky state vectors
+        (the "states" list of /states/all), normalized like get_planes.
+        """
+        columns = {name: [] for name in FIELDS}
+        for plane in states or []:
+            if plane[8]:  # skip if on-ground
+                continue
+            columns["icao24"].append(plane[0])
+            columns["callsign"].append(plane[1])
+            columns["lat"].append(plane[6])
+            columns["lon"].append(plane[5])
+            columns["geo_alt"].append(plane[13] if plane[13] else 0)
+            columns["velocity"].append(plane[9] if plane[9] and plane[10] else 0)
+            columns["track"].append(plane[10] if plane[10] else 0)
+        return cls(**columns, timestamp=timestamp)
+
+    @classmethod
+    def empty(cls, timestamp=None):
+        return cls([], [], [], [], [], [], [], timestamp=timestamp)
+
+    def __len__(self):
+        return len(self.icao24)
+
+    def __getitem__(self, row):
+        n = len(self)
+        if row < 0:
+            row += n
+        if not 0 <= row < n:
+            raise IndexError("FleetSnapshot row out of range")
+        return PlaneView(self, row)
+
+    def __iter__(self):
+        for row in range(len(self)):
+            yield PlaneView(self, row)
+
+    @property
+    def index(self):
+        """
+        icao24 -> row mapping, built on first use.
+        """
+        if self._index is None:
+            self._index = {icao: row for row, icao in enumerate(self.icao24.tolist())}
+        return self._index
+
+    @property
+    def fingerprint(self):
+        """
+        Hex digest of the timestamp and every column (identity, position
+        and motion), computed on first use. Equal snapshots built in different processes (e.g. from
+        the same archive entry) have equal fingerprints.
+        """
+        if self._fingerprint is None:
+            digest = hashlib.blake2b(repr(self.timestamp).encode(), digest_size=16)
+            for name in FIELDS:
+                column = np.ascontiguousarray(getattr(self, name))
+                # The string width keeps "AB" + "C" apart from "A" + "BC"
+                digest.update(column.dtype.str.encode())
+                digest.update(column.tobytes())
+            self._fingerprint = digest.hexdigest()
+        return self._fingerprint
+
+    def row_of(self, icao24):
+        """
+        Row of the given aircraft, or None if it is not in the snapshot.
+        """
+        return self.index.get(icao24)
+
+    def get(self, icao24):
+        """
+        PlaneView of the given aircraft, or None if it is not in the snapshot.
+        """
+        row = self.row_of(icao24)
+        return None if row is None else PlaneView(self, row)
+
+    def labels(self):
+        """
+        Display label per aircraft: callsign if known, otherwise icao24.
+        """
+        return np.where(self.callsign != "", self.callsign, self.icao24)
+
+    def with_positions(self, lat, lon):
+        """
+        New snapshot with replaced positions. All other columns (and the
+        icao24 index) are shared with this snapshot, not copied.
+        """
+        moved = FleetSnapshot.__new__(FleetSnapshot)
+        moved.__dict__.update(self.__dict__)
+        moved.snapshot_id = next(_snapshot_ids)
+        moved._fingerprint = None
+        moved.lat = _float_column(lat)
+        moved.lon = _float_column(lon)
+        if len(moved.lat) != len(self) or len(moved.lon) != len(self):
+            raise ValueError("Position arrays must match the snapshot length")
+        # Share the lazily built index with the parent
+        moved._index = self.index
+        return moved
+
+    def to_dicts(self):
+        """
+        Plain list-of-dicts copy (e.g. for pickling in the legacy format).
+        """
+        return [dict(p) for p in self]
+
+
+def as_snapshot(planes):
+    """
+    Return planes as a FleetSnapshot, converting a list of dicts if needed.
+    """
+    if isinstance(planes, FleetSnapshot):
+        return planes
+    return FleetSnapshot.from_dicts(planes)
+
+
+def _str_column(values):
+    if isinstance(values, np.ndarray):
+        return values.astype(str, copy=False)
+    return np.array(["" if v is None else v for v in values], dtype=str)
+
+
+def _float_column(values):
+    if isinstance(values, np.ndarray):
+        return np.ascontiguousarray(values, dtype=float)
+    return np.array([np.nan if v is None else v for v in values], dtype=float)
@@ -0,0 +1,109 @@
+import threading
+
+from fleet import FleetSnapshot
+
+# ---------------------------
+# Shared snapshot feed
+# ---------------------------
+class FleetFeed:
+    """
+    The one FleetSnapshot a server process shows to every user.
+
+    Snapshots are never modified in place, so a refresh just swaps the
+    reference: readers call current() once per request and keep that
+    snapshot for the whole request, without taking a lock. A single
+    background thread refreshes every interval seconds; refresh() can also
+    be called directly (e.g. from an "Update Positions" click), and
+    concurrent calls share one fetch instead of fetching once each.
+
+    fetch: zero-argument callable returning a new FleetSnapshot, or None
+           when there is nothing new
+    interval: seconds between background refreshes (None: only the first)
+    """
+
+    def __init__(self, fetch, interval=None, initial=None):
+        self.fetch = fetch
+        self.interval = interval
+        self._snapshot = initial if initial is not None else FleetSnapshot.empty()
+        self._refresh_lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._refreshes = 0
+        self._thread = None
+        self._stop = threading.Event()
+        self.ready = threading.Event()  # set once the first refresh finished (even if it failed)
+        self.last_error = None
+
+    def current(self):
+        return self._snapshot
+
+    def publish(self, snapshot):
+        """
+        Make snapshot the current one (e.g. the last archived snapshot
+        while the first live fetch is running).
+        """
+        self._snapshot = snapshot
+
+    def refresh(self):
+        """
+        Fetch and publish a new snapshot; returns the current snapshot.
+        A call that arrives while another refresh is running waits for it
+        and returns its result.
+        """
+        seen = self._refreshes
+        with self._refresh_lock:
+            if self._refreshes != seen:
+                return self._snapshot
+            try:
+                snapshot = self.fetch()
+                if snapshot is not None:
+                    self.publish(snapshot)
+                self.last_error = None
+            except Exception as e:
+                self.last_error = e
+                print(f"Fleet refresh failed: {e}")
+            finally:
+                self._refreshes += 1
+                self.ready.set()
+        return self._snapshot
+
+    def start(self):
+        """
+        Start the background refresher (once per process; later calls are
+        no-ops). The first refresh runs immediately.
+        """
+        with self._start_lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name="fleet-feed", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    @property
+    def running(self):
+        return self._thread is not None
+
+    def _run(self):
+        self.refresh()
+        while self.interval and not self._stop.wait(self.interval):
+            self.refresh()
+
+
+def archive_follower(archive):
+    """
+    fetch function for FleetFeed that reads the newest snapshot of a
+    SnapshotArchive written by another process (None while it has not
+    grown), so several server processes can share one OpenSky poller.
+    """
+    seen = 0
+
+    def fetch():
+        nonlocal seen
+        count = len(archive)
+        if count == seen:
+            return None
+        seen = count
+        return archive.latest()
+
+    return fetch
@@ -0,0 +1,173 @@
+import threading
+from collections import OrderedDict
+
+from calculate_path import extrapolate_fleet, find_path
+from instrumentation import metrics, record_graph
+from visibility_graph import los_adjacency
+
+# ---------------------------
+# Forecast / graph / route cache
+# ---------------------------
+class ForecastCache:
+    """
+    LRU cache for the Dash callback path, keyed by (snapshot_id, horizon).
+
+    Each entry holds the forecasted FleetSnapshot, its LOS graph (built once
+    and re-weighted per metric) and the routes computed on it. Entries are
+    evicted least-recently-used once max_entries is exceeded, so scrubbing
+    the forecast slider back and forth and repeated Calculate clicks are
+    served from memory.
+
+    los_graph: optional IncrementalLOSGraph used to build graphs on a miss
+               (cheaper than a rebuild for small steps between snapshots;
+               see the graph_update benchmark)
+
+    Safe to share between request threads. The cache lock only guards the
+    entries: forecasts and graphs are computed outside it, a graph once
+    per entry (later requests for the same entry wait for that build), so
+    misses on different entries run concurrently. Only updates of the
+    shared los_graph are serialized. Searches run concurrently.
+    model: forecast model, see calculate_path.extrapolate_positions
+    """
+
+    def __init__(self, max_entries=64, los_graph=None, backend='grid', model='flat'):
+        self.max_entries = max_entries
+        self.los_graph = los_graph
+        self.backend = backend
+        self.model = model
+        self._entries = OrderedDict()
+        self._lock = threading.RLock()
+        self._los_graph_lock = threading.Lock()
+        self.counters = {
+            "forecast_hits": 0, "forecast_misses": 0,
+            "graph_hits": 0, "graph_misses": 0,
+            "route_hits": 0, "route_misses": 0,
+            "evictions": 0,
+        }
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _entry(self, fleet, seconds):
+        key = (fleet.snapshot_id, seconds)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.counters["forecast_hits"] += 1
+                return entry
+            self.counters["forecast_misses"] += 1
+
+        # Extrapolated outside the lock; if another thread got there first
+        # its entry (and any graph built on it) is kept
+        forecast = extrapolate_fleet(fleet, seconds, self.model)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                return entry
+            entry = {"fleet": forecast, "graph": None, "routes": {}, "components": None, "building": None}
+            self._entries[key] = entry
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.counters["evictions"] += 1
+            return entry
+
+    def forecast(self, fleet, seconds):
+        """
+        Forecasted snapshot of fleet at +seconds.
+        """
+        return self._entry(fleet, seconds)["fleet"]
+
+    def graph(self, fleet, seconds, metric='delay', extra_delay=0.0):
+        """
+        LOS adjacency of the forecasted fleet, weighted for metric.
+        """
+        return self._graph(self._entry(fleet, seconds), metric, extra_delay)
+
+    def _graph(self, entry, metric, extra_delay):
+        with self._lock:
+            graph, building = entry["graph"], entry["building"]
+            owner = graph is None and building is None
+            if owner:
+                # This thread builds; others asking for the entry wait on the event
+                building = entry["building"] = threading.Event()
+                self.counters["graph_misses"] += 1
+            else:
+                self.counters["graph_hits"] += 1
+
+        if owner:
+            try:
+                graph = self._build(entry["fleet"])
+                entry["graph"] = graph
+            finally:
+                with self._lock:
+                    entry["building"] = None
+                building.set()
+        elif graph is None:
+            building.wait()
+            if entry["graph"] is None:
+                # The build failed; try again (and raise its error here)
+                return self._graph(entry, metric, extra_delay)
+            graph = entry["graph"]
+        return graph.with_metric(metric, extra_delay)
+
+    def _build(self, fleet):
+        with metrics.timer("graph_build"):
+            if self.los_graph is not None:
+                with self._los_graph_lock:
+                    self.los_graph.apply_snapshot(fleet)
+                    graph = self.los_graph.adjacency(frozen=True)
+            else:
+                graph = los_adjacency(fleet, backend=self.backend)
+        record_graph(graph)
+        return graph
+
+    def components(self, fleet, seconds):
+        """
+        Relay island (connected component) label of every aircraft of the
+        forecasted fleet, in its row order; aircraft with equal labels can
+        reach each other.
+        """
+        entry = self._entry(fleet, seconds)
+        if entry["components"] is None:
+            graph = self._graph(entry, 'delay', 0.0)
+            entry["components"] = graph.labels_of(entry["fleet"].icao24)
+        return entry["components"]
+
+    def connected(self, fleet, seconds, start_icao, end_icao):
+        """
+        True if start and end are on the same relay island at +seconds.
+        """
+        return self._graph(self._entry(fleet, seconds), 'delay', 0.0).connected(start_icao, end_icao)
+
+    def route(self, fleet, seconds, start_icao, end_icao, metric='delay', extra_delay=0.0, search='dijkstra'):
+        """
+        Path start -> end on the forecasted fleet as a list of PlaneViews,
+        or None if there is no LOS path. search as in compute_los_path.
+        """
+        entry = self._entry(fleet, seconds)
+        key = (start_icao, end_icao, metric, extra_delay)
+        if key in entry["routes"]:
+            self.counters["route_hits"] += 1
+            path_ids = entry["routes"][key]
+        else:
+            self.counters["route_misses"] += 1
+            graph = self._graph(entry, metric, extra_delay)
+            path_ids = find_path(graph, start_icao, end_icao, metric, search, entry["fleet"], extra_delay)
+            entry["routes"][key] = path_ids
+
+        if path_ids is None:
+            return None
+        forecast = entry["fleet"]
+        return [forecast[forecast.row_of(icao)] for icao in path_ids]
+
+    def stats(self):
+        """
+        Hit/miss counters plus current size, for sizing max_entries.
+        """
+        return dict(self.counters, entries=len(self._entries), max_entries=self.max_entries)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
@@ -0,0 +1,323 @@
+import argparse
+import json
+import sys
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import flask
+import numpy as np
+
+from calculate_path import LOSRouter, extrapolate_fleet
+from fleet import FleetSnapshot
+from link_lifetime import link_expiry
+from snapshot_archive import SnapshotArchive, load_pickle
+from terrain import DEMTiles, TerrainLOS
+
+# Headless routing: a CLI and a small HTTP JSON API around LOSRouter.
+#
+#   python src/headless.py route --snapshot archive --queries queries.jsonl
+#   python src/headless.py serve --snapshot planes_canada.pkl --port 8060
+#
+# A query is a JSON object:
+#   {"id": ..., "start": icao24, "end": icao24,
+#    "metric": "delay" | "hops", "horizon": seconds, "extra_delay": seconds}
+# Only start and end are required. Results are JSON objects, one per query,
+# streamed as soon as their chunk finishes (so not in input order):
+#   {"id", "start", "end", "metric", "horizon", "path": [icao24...] | null,
+#    "cost": total delay or hop count | null,
+#    "valid_for": seconds until the first link breaks | null (unreachable,
+#                 or no link breaks within link_lifetime.MAX_LIFETIME)}
+# or {"id", "error"} for a malformed query.
+
+METRICS = ('delay', 'hops')
+
+# Routers (one LOS graph each) kept per worker, keyed by (horizon, extra_delay)
+ROUTERS_PER_WORKER = 8
+
+# ---------------------------
+# Snapshot sources
+# ---------------------------
+def load_snapshot(source, archive_path="archives", index=-1):
+    """
+    FleetSnapshot from 'live' (OpenSky fetch), 'archive' (snapshot number
+    index of the archive at archive_path) or a file: a pickle, or JSON with
+    either a /states/all payload or a list of plane dicts.
+    """
+    if source == "live":
+        from update_planes import get_planes
+        return get_planes()
+    if source == "archive":
+        archive = SnapshotArchive(archive_path)
+        if not len(archive):
+            raise ValueError(f"Archive {archive_path} is empty")
+        return archive.load(index)
+    if source.endswith(".json"):
+        with open(source) as f:
+            data = json.load(f)
+        if isinstance(data, dict):
+            return FleetSnapshot.from_states(data.get("states"), timestamp=data.get("time"))
+        return FleetSnapshot.from_dicts(data)
+    return load_pickle(source)
+
+
+class MalformedQuery(ValueError):
+    """
+    A query that cannot be answered. read_queries also returns it (unraised)
+    in place of input that is not valid JSON; run_batch reports either as
+    an {"id", "error"} result like any other malformed query.
+    """
+
+
+def _decode(text, where):
+    try:
+        return json.loads(text)
+    except ValueError as e:
+        return MalformedQuery(f"{where}: invalid JSON ({e})")
+
+
+def read_queries(lines):
+    """
+    Queries from JSON text: one JSON list, or one object per line. A line
+    (or list) that does not decode becomes a MalformedQuery instead of
+    failing the whole batch.
+    """
+    text = "".join(lines).strip()
+    if text.startswith("["):
+        queries = _decode(text, "query list")
+        return queries if isinstance(queries, list) else [queries]
+    return [_decode(line, f"line {n}") for n, line in enumerate(text.splitlines(), 1) if line.strip()]
+
+# ---------------------------
+# Query execution
+# ---------------------------
+def _seconds(query, key):
+    try:
+        value = float(query.get(key, 0.0))
+    except (TypeError, ValueError):
+        raise MalformedQuery(f"{key} must be a number of seconds")
+    if not np.isfinite(value) or value < 0:
+        raise MalformedQuery(f"{key} must be finite and >= 0")
+    return value
+
+
+def normalize_query(query, position):
+    """
+    Fill in defaults; raises MalformedQuery for a malformed query.
+    """
+    if isinstance(query, MalformedQuery):
+        raise query
+    if not isinstance(query, dict) or not query.get("start") or not query.get("end"):
+        raise MalformedQuery("query needs 'start' and 'end'")
+    metric = query.get("metric", "delay")
+    if metric not in METRICS:
+        raise MalformedQuery(f"Unknown metric: {metric}")
+    return {
+        "id": query.get("id", position),
+        "start": str(query["start"]),
+        "end": str(query["end"]),
+        "metric": metric,
+        "horizon": _seconds(query, "horizon"),
+        "extra_delay": _seconds(query, "extra_delay"),
+    }
+
+
+class QueryRunner:
+    """
+    Answers query chunks on one snapshot. Graphs are built once per
+    (horizon, extra_delay) and kept in a small LRU, and pairs of a chunk
+    that share a metric are routed together (shared shortest-path trees).
+
+    dem_dir: optional directory of SRTM tiles; links blocked by terrain
+             are then dropped (terrain.TerrainLOS)
+    """
+
+    def __init__(self, fleet, max_routers=ROUTERS_PER_WORKER, dem_dir=None):
+        self.fleet = fleet
+        self.max_routers = max_routers
+        self.los_predicate = TerrainLOS(DEMTiles(dem_dir)) if dem_dir else None
+        self._routers = OrderedDict()
+
+    def router(self, horizon, extra_delay):
+        key = (horizon, extra_delay)
+        router = self._routers.get(key)
+        if router is None:
+            router = LOSRouter(extrapolate_fleet(self.fleet, horizon), extra_delay,
+                               los_predicate=self.los_predicate)
+            self._routers[key] = router
+            while len(self._routers) > self.max_routers:
+                self._routers.popitem(last=False)
+        else:
+            self._routers.move_to_end(key)
+        return router
+
+    def run(self, queries):
+        groups = OrderedDict()
+        for q in queries:
+            groups.setdefault((q["horizon"], q["extra_delay"], q["metric"]), []).append(q)
+
+        results = []
+        for (horizon, extra_delay, metric), group in groups.items():
+            router = self.router(horizon, extra_delay)
+            pairs = [(q["start"], q["end"]) for q in group]
+            routed = router.paths_with_costs(pairs, metric)
+            valid_for = path_lifetimes(router.fleet, [path for path, _ in routed])
+            for q, (path, cost), valid in zip(group, routed, valid_for):
+                results.append({
+                    "id": q["id"], "start": q["start"], "end": q["end"],
+                    "metric": metric, "horizon": horizon, "path": path, "cost": cost,
+                    "valid_for": valid
+                })
+        return results
+
+
+def path_lifetimes(fleet, paths):
+    """
+    Seconds until the first link of each path breaks (one link_expiry call
+    for all paths); None for unreachable pairs and for paths that hold
+    beyond MAX_LIFETIME.
+    """
+    i, j, owner = [], [], []
+    for k, path in enumerate(paths):
+        if path:
+            rows = [fleet.row_of(icao) for icao in path]
+            i.extend(rows[:-1])
+            j.extend(rows[1:])
+            owner.extend([k] * (len(rows) - 1))
+    first = np.full(len(paths), np.inf)
+    if i:
+        np.minimum.at(first, np.array(owner), link_expiry(fleet, i, j))
+    return [float(t) if path and np.isfinite(t) else None for path, t in zip(paths, first)]
+
+
+# Per-process runner, set by the pool initializer
+_worker_runner = None
+
+def _init_worker(fleet, dem_dir=None):
+    global _worker_runner
+    _worker_runner = QueryRunner(fleet, dem_dir=dem_dir)
+
+def _run_chunk(queries):
+    return _worker_runner.run(queries)
+
+
+def chunk_queries(queries, chunk_size):
+    """
+    Split normalized queries into chunks, sorted so a chunk mostly shares
+    one horizon (one graph per worker) and queries from the same start
+    land together (one shortest-path tree).
+    """
+    ordered = sorted(queries, key=lambda q: (q["horizon"], q["extra_delay"], q["metric"], q["start"]))
+    return [ordered[k:k + chunk_size] for k in range(0, len(ordered), chunk_size)]
+
+
+def run_batch(fleet, queries, workers=None, chunk_size=64, executor=None, dem_dir=None):
+    """
+    Yield one result per query as chunks complete.
+
+    workers: process count (default os.cpu_count()); 1 runs in-process
+    executor: optional ProcessPoolExecutor already initialized with
+              _init_worker(fleet, dem_dir) (used by the HTTP server)
+    dem_dir: optional SRTM tile directory for terrain-aware LOS
+    """
+    valid = []
+    for position, query in enumerate(queries):
+        try:
+            valid.append(normalize_query(query, position))
+        except MalformedQuery as e:
+            yield {"id": query.get("id", position) if isinstance(query, dict) else position, "error": str(e)}
+    if not valid:
+        return
+
+    chunks = chunk_queries(valid, chunk_size)
+    if executor is None and (workers == 1 or len(chunks) == 1):
+        runner = QueryRunner(fleet, dem_dir=dem_dir)
+        for chunk in chunks:
+            yield from runner.run(chunk)
+        return
+
+    own = executor is None
+    if own:
+        executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(fleet, dem_dir))
+    try:
+        pending = {executor.submit(_run_chunk, chunk) for chunk in chunks}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield from future.result()
+    finally:
+        if own:
+            executor.shutdown(cancel_futures=True)
+
+# ---------------------------
+# HTTP JSON API
+# ---------------------------
+def create_app(fleet, workers=None, chunk_size=64, dem_dir=None):
+    """
+    Flask app serving one snapshot:
+        GET  /snapshot  size and timestamp of the loaded snapshot
+        POST /route     {"queries": [...]} or a bare list; streams
+                        newline-delimited JSON results
+    """
+    app = flask.Flask(__name__)
+    executor = None
+    if workers != 1:
+        executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(fleet, dem_dir))
+    app.config["executor"] = executor
+
+    @app.route("/snapshot")
+    def snapshot_info():
+        return flask.jsonify(aircraft=len(fleet), timestamp=fleet.timestamp)
+
+    @app.route("/route", methods=["POST"])
+    def route():
+        body = flask.request.get_json(silent=True)
+        queries = body.get("queries") if isinstance(body, dict) else body
+        if not isinstance(queries, list):
+            return flask.jsonify(error="expected a list of queries"), 400
+
+        def stream():
+            for result in run_batch(fleet, queries, workers, chunk_size, executor, dem_dir):
+                yield json.dumps(result) + "\n"
+
+        return flask.Response(stream(), mimetype="application/x-ndjson")
+
+    return app
+
+# ---------------------------
+# CLI
+# ---------------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Headless LOS routing.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    for name in ("route", "serve"):
+        p = sub.add_parser(name)
+        p.add_argument("--snapshot", default="archive", help="'live', 'archive' or a .pkl/.json file")
+        p.add_argument("--archive", default="archives", help="archive directory for --snapshot archive")
+        p.add_argument("--index", type=int, default=-1, help="archived snapshot number (default: latest)")
+        p.add_argument("--workers", type=int, default=None, help="worker processes (default: all cores)")
+        p.add_argument("--chunk-size", type=int, default=64, help="queries per task")
+        p.add_argument("--dem", help="directory of SRTM .hgt tiles for terrain-aware LOS")
+    sub.choices["route"].add_argument("--queries", default="-", help="JSON/JSONL query file ('-' for stdin)")
+    sub.choices["serve"].add_argument("--host", default="127.0.0.1")
+    sub.choices["serve"].add_argument("--port", type=int, default=8060)
+    args = parser.parse_args(argv)
+
+    fleet = load_snapshot(args.snapshot, args.archive, args.index)
+    print(f"Loaded {len(fleet)} planes", file=sys.stderr)
+
+    if args.command == "serve":
+        create_app(fleet, args.workers, args.chunk_size, args.dem).run(host=args.host, port=args.port, threaded=True)
+        return
+
+    if args.queries == "-":
+        queries = read_queries(sys.stdin)
+    else:
+        with open(args.queries) as f:
+            queries = read_queries(f)
+    for result in run_batch(fleet, queries, args.workers, args.chunk_size, dem_dir=args.dem):
+        sys.stdout.write(json.dumps(result) + "\n")
+        sys.stdout.flush()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,233 @@
+import cProfile
+import functools
+import io
+import os
+import pstats
+import secrets
+import threading
+import time
+from collections import OrderedDict, deque
+
+# ---------------------------
+# Stage timers and counters
+# ---------------------------
+class _NullTimer:
+    """
+    Shared no-op context manager handed out while metrics are disabled.
+    """
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class _Timer:
+    __slots__ = ("_metrics", "_name", "_t0")
+
+    def __init__(self, metrics, name):
+        self._metrics = metrics
+        self._name = name
+
+    def __enter__(self):
+        self._t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self._metrics.add_time(self._name, time.perf_counter() - self._t0)
+        return False
+
+
+class Metrics:
+    """
+    Process-wide stage timers, counters and gauges.
+
+    with metrics.timer("graph_build"): ...   time a stage
+    metrics.count("search.expanded", n)      accumulate a counter
+    metrics.gauge("graph.edges", e)          keep the last value
+
+    While disabled every call returns immediately (timer() hands back a
+    shared no-op context manager), so hooks can stay in hot paths.
+    """
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self.reset()
+
+    def timer(self, name):
+        if not self.enabled:
+            return _NULL_TIMER
+        return _Timer(self, name)
+
+    def add_time(self, name, seconds):
+        if not self.enabled:
+            return
+        with self._lock:
+            t = self._timers.get(name)
+            if t is None:
+                t = self._timers[name] = {"count": 0, "total": 0.0, "max": 0.0, "last": 0.0}
+            t["count"] += 1
+            t["total"] += seconds
+            t["last"] = seconds
+            if seconds > t["max"]:
+                t["max"] = seconds
+
+    def count(self, name, n=1):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + n
+
+    def gauge(self, name, value):
+        if not self.enabled:
+            return
+        self._gauges[name] = value
+
+    def snapshot(self):
+        """
+        JSON-ready copy: timers (seconds, with mean), counters and gauges.
+        """
+        with self._lock:
+            timers = {
+                name: dict(t, mean=t["total"] / t["count"])
+                for name, t in self._timers.items()
+            }
+            return {
+                "enabled": self.enabled,
+                "timers": timers,
+                "counters": dict(self._counters),
+                "gauges": dict(self._gauges),
+            }
+
+    def reset(self):
+        with self._lock:
+            self._timers = {}
+            self._counters = {}
+            self._gauges = {}
+
+
+def timed(name):
+    """
+    Decorator form of metrics.timer(name).
+    """
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with metrics.timer(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def graph_size(graph):
+    """
+    (nodes, edges) of an adjacency dict or CSRAdjacency view.
+    """
+    if hasattr(graph, "edge_count"):
+        return len(graph), graph.edge_count()
+    return len(graph), sum(len(nbrs) for nbrs in graph.values()) // 2
+
+
+def record_graph(graph):
+    """
+    Gauge the size of a freshly built graph.
+    """
+    if metrics.enabled:
+        nodes, edges = graph_size(graph)
+        metrics.gauge("graph.nodes", nodes)
+        metrics.gauge("graph.edges", edges)
+
+# ---------------------------
+# Per-request profiling
+# ---------------------------
+class RequestProfiler:
+    """
+    Optional cProfile capture of single requests. arm() hands out a token
+    good for the next `requests` requests that present it; start(token)
+    returns a running profiler for those (None for every other request)
+    and finish() keeps the top functions by cumulative time for the last
+    `keep` profiled requests. Only one request is profiled at a time
+    (cProfile cannot nest); concurrent ones run unprofiled.
+
+    Disabled unless enabled=True (LOS_PROFILE=1 for the shared profiler):
+    arm() then raises RuntimeError.
+    """
+
+    def __init__(self, enabled=False, keep=10, top=30, max_tokens=16):
+        self.enabled = enabled
+        self.top = top
+        self.max_tokens = max_tokens
+        self.profiles = deque(maxlen=keep)
+        self._tokens = OrderedDict()  # token -> requests left
+        self._lock = threading.Lock()
+        self._busy = threading.Lock()
+
+    def arm(self, requests=1):
+        """
+        New token that profiles the next `requests` requests presenting it.
+        """
+        if not self.enabled:
+            raise RuntimeError("Request profiling is disabled (set LOS_PROFILE=1)")
+        token = secrets.token_urlsafe(16)
+        with self._lock:
+            self._tokens[token] = max(int(requests), 1)
+            while len(self._tokens) > self.max_tokens:
+                self._tokens.popitem(last=False)
+        return token
+
+    def disarm(self, token):
+        with self._lock:
+            self._tokens.pop(token, None)
+
+    def _take(self, token):
+        with self._lock:
+            left = self._tokens.get(token)
+            if not left:
+                return False
+            if left == 1:
+                del self._tokens[token]
+            else:
+                self._tokens[token] = left - 1
+            return True
+
+    def start(self, token=None):
+        if token is None or not self.enabled or not self._busy.acquire(blocking=False):
+            return None
+        if not self._take(token):
+            self._busy.release()
+            return None
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # Another profiler (e.g. a debugger) already owns the hook
+            self._busy.release()
+            return None
+        return profile
+
+    def finish(self, profile, label):
+        if profile is None:
+            return
+        try:
+            profile.disable()
+            out = io.StringIO()
+            stats = pstats.Stats(profile, stream=out)
+            stats.sort_stats("cumulative").print_stats(self.top)
+            self.profiles.append({"label": label, "time": time.time(), "total": stats.total_tt,
+                                  "stats": out.getvalue()})
+        finally:
+            self._busy.release()
+
+
+# Off by default: LOS_METRICS=1 turns the hooks on (a few microseconds per
+# timed stage or counter, against well under one while off)
+metrics = Metrics(enabled=os.environ.get("LOS_METRICS", "0") == "1")
+# LOS_PROFILE=1 allows callback requests to be profiled (see map_GUI)
+profiler = RequestProfiler(enabled=os.environ.get("LOS_PROFILE", "0") == "1")
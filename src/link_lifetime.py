@@ -0,0 +1,202 @@
+import threading
+import time
+
+import numpy as np
+
+from calculate_path import extrapolate_positions, find_path
+from fleet import as_snapshot
+from visibility_graph import haversine_pairs, horizon_radii, los_adjacency, los_edges
+
+# Links that survive this long (seconds) are reported as never expiring
+MAX_LIFETIME = 3600.0
+
+# Expiry times are resolved to within this many seconds
+TOLERANCE = 0.5
+
+# ---------------------------
+# Link expiry
+# ---------------------------
+def link_expiry(fleet, i, j, max_seconds=MAX_LIFETIME, tolerance=TOLERANCE, model='flat'):
+    """
+    Seconds until each link (i[k], j[k]) of fleet breaks, i.e. until the
+    great-circle distance first exceeds los_distance, with both aircraft
+    moving at constant velocity and track as in extrapolate_positions
+    (with the given forecast model).
+    np.inf where the link holds for max_seconds; 0 where it is already
+    out of range.
+
+    The links are marched forward in time from 0: a link with range
+    margin m (los_distance - distance) cannot break within m / (v_i + v_j)
+    seconds, so each step is the margin over the summed ground speeds (at
+    least tolerance). No break is skipped, even where the distance is not
+    monotonic (converging then diverging, or circling near a pole); the
+    step that ends out of range is then bisected.
+    """
+    i = np.asarray(i, dtype=np.int64)
+    j = np.asarray(j, dtype=np.int64)
+    lat, lon = fleet.lat, fleet.lon
+    vel, track = fleet.velocity, fleet.track
+    limit = horizon_radii(fleet.geo_alt[i]) + horizon_radii(fleet.geo_alt[j])
+    # Fastest the distance can change (stationary aircraft have NaN velocity)
+    rate = np.nan_to_num(vel[i]) + np.nan_to_num(vel[j])
+
+    def distance(t, k):
+        a, b = i[k], j[k]
+        lat_a, lon_a = extrapolate_positions(lat[a], lon[a], vel[a], track[a], t, model)
+        lat_b, lon_b = extrapolate_positions(lat[b], lon[b], vel[b], track[b], t, model)
+        return haversine_pairs(lat_a, lon_a, lat_b, lon_b)
+
+    everything = np.arange(len(i))
+    expiry = np.zeros(len(i))
+    d = distance(0.0, everything)
+    alive = d <= limit
+    expiry[alive] = np.inf
+
+    # March the links still up; [lo, hi] brackets the first break of each
+    # link that goes down
+    lo = np.zeros(len(i))
+    hi = np.zeros(len(i))
+    breaking = np.zeros(len(i), dtype=bool)
+    active = everything[alive]
+    d = d[alive]
+    while len(active):
+        with np.errstate(divide='ignore'):
+            step = np.maximum((limit[active] - d) / rate[active], tolerance)
+        t = np.minimum(lo[active] + step, max_seconds)
+        d = distance(t, active)
+        down = d > limit[active]
+        hi[active] = t
+        breaking[active[down]] = True
+        ahead = ~down & (t < max_seconds)
+        lo[active[ahead]] = t[ahead]
+        active, d = active[ahead], d[ahead]
+
+    # Bisect within the last step of the links that break
+    k = everything[breaking]
+    lo, hi, limit = lo[k], hi[k], limit[k]
+    while True:
+        open_ = hi - lo > tolerance
+        if not open_.any():
+            break
+        mid = (lo + hi) / 2
+        down = distance(mid, k) > limit
+        hi = np.where(open_ & down, mid, hi)
+        lo = np.where(open_ & ~down, mid, lo)
+
+    expiry[k] = hi
+    return expiry
+
+
+def _first_break(expiry):
+    return float(expiry.min()) if len(expiry) else np.inf
+
+
+def edge_expiry(fleet, backend='grid', max_seconds=MAX_LIFETIME, model='flat'):
+    """
+    All LOS edges of fleet with their predicted lifetimes:
+    (i, j, dist, expiry) with expiry as in link_expiry (forecast model).
+    """
+    fleet = as_snapshot(fleet)
+    i, j, d = los_edges(fleet.lat, fleet.lon, fleet.geo_alt, backend=backend)
+    return i, j, d, link_expiry(fleet, i, j, max_seconds, model=model)
+
+
+def path_link_expiry(fleet, path_ids, max_seconds=MAX_LIFETIME, model='flat'):
+    """
+    Lifetime (seconds) of each consecutive link of a path of icao24s.
+    """
+    rows = np.array([fleet.row_of(icao) for icao in path_ids], dtype=np.int64)
+    return link_expiry(fleet, rows[:-1], rows[1:], max_seconds, model=model)
+
+# ---------------------------
+# Route reuse
+# ---------------------------
+class RouteTracker:
+    """
+    Keeps computed routes and reuses each one until its earliest link is
+    predicted to break, instead of rerouting on every refresh.
+
+    A route computed on positions at time t0 is valid until
+    t0 + min(link expiry). A later query for the same endpoints (and
+    metric/extra_delay) at time t in [t0, valid_until) gets the same relay
+    chain back, provided all of its aircraft are still present and its
+    links are in range at the new positions (the expiry is then predicted
+    again from those positions); anything else is rerouted.
+
+    model: forecast model the expiry predictions assume (extrapolate_positions)
+
+    Safe to share between threads; concurrent queries for the same route
+    may both recompute it.
+    """
+
+    def __init__(self, max_seconds=MAX_LIFETIME, model='flat'):
+        self.max_seconds = max_seconds
+        self.model = model
+        self._routes = {}
+        self._lock = threading.Lock()
+        self.counters = {"reused": 0, "recomputed": 0}
+
+    def route(self, fleet, start_icao, end_icao, metric='delay', extra_delay=0.0, at=None, compute=None):
+        """
+        Route on fleet (positions at time `at`, default fleet.timestamp or
+        now). compute: optional zero-argument callable returning the path
+        as icao24s (or None), used instead of a fresh graph search when a
+        reroute is needed.
+
+        Returns None if unreachable, else a dict:
+            path         PlaneViews of fleet along the route
+            ids          icao24s along the route
+            link_expiry  seconds until each link breaks, from `at`
+            valid_for    seconds until the first link breaks (inf: beyond max_seconds)
+            reused       True if the cached route was returned
+        """
+        fleet = as_snapshot(fleet)
+        if at is None:
+            at = fleet.timestamp if fleet.timestamp is not None else time.time()
+        key = (start_icao, end_icao, metric, extra_delay)
+
+        cached = self._routes.get(key)
+        if cached is not None and cached["computed_at"] <= at < cached["valid_until"]:
+            ids = cached["ids"]
+            if all(fleet.row_of(icao) is not None for icao in ids):
+                expiry = path_link_expiry(fleet, ids, self.max_seconds, self.model)
+                if np.all(expiry > 0):
+                    # Re-predict from the new positions
+                    valid_until = at + _first_break(expiry)
+                    with self._lock:
+                        self._routes[key] = dict(cached, valid_until=valid_until)
+                        self.counters["reused"] += 1
+                    return self._result(fleet, ids, expiry, at, valid_until, True)
+
+        with self._lock:
+            self.counters["recomputed"] += 1
+        if compute is not None:
+            ids = compute()
+        else:
+            graph = los_adjacency(fleet, metric, extra_delay)
+            ids = find_path(graph, start_icao, end_icao, metric, 'astar', fleet, extra_delay)
+        if ids is None:
+            with self._lock:
+                self._routes.pop(key, None)
+            return None
+        expiry = path_link_expiry(fleet, ids, self.max_seconds, self.model)
+        valid_until = at + _first_break(expiry)
+        with self._lock:
+            self._routes[key] = {"ids": list(ids), "computed_at": at, "valid_until": valid_until}
+        return self._result(fleet, ids, expiry, at, valid_until, False)
+
+    def _result(self, fleet, ids, expiry, at, valid_until, reused):
+        return {
+            "path": [fleet[fleet.row_of(icao)] for icao in ids],
+            "ids": list(ids),
+            "link_expiry": expiry.tolist(),
+            "valid_for": valid_until - at,
+            "reused": reused,
+        }
+
+    def stats(self):
+        return dict(self.counters, routes=len(self._routes))
+
+    def clear(self):
+        with self._lock:
+            self._routes.clear()
@@ -1,3 +1,8 @@
+import time
+
+_start = time.perf_counter()
 from map_GUI import run
 
+# Startup budget: imports and layout only; the first OpenSky fetch runs in the background
+print(f"Startup: app ready in {time.perf_counter() - _start:.2f}s")
 run()
@@ -1,36 +1,102 @@
+import os
+import time
+
 import dash
+import flask
 from dash import dcc, html
 from dash.dependencies import Output, Input, State
 import plotly.graph_objects as go
-from calculate_path import extrapolate_position, compute_los_path
-from update_planes import get_planes
+from fleet_feed import FleetFeed, archive_follower
+from forecast_cache import ForecastCache
+from instrumentation import metrics, profiler
+from link_lifetime import RouteTracker
+from map_view import INITIAL_VIEW, cluster_sizes, decimate, island_colors
+from track_store import TrackStore
+from update_planes import archive, get_planes
+from visibility_graph import IncrementalLOSGraph
 
 # -------------------------------
-# Globals for selection
+# Shared state
 # -------------------------------
-selection_mode = None  # "start" or "end"
-selected_start_plane = None
-selected_end_plane = None
+# Per-user state (selection mode, start/end icao24, active route) lives in
+# the browser's stores; the server only holds what all users share.
+
+# Seconds between background OpenSky fetches
+REFRESH_SECONDS = float(os.environ.get("LOS_REFRESH_SECONDS", "60"))
+
+# "live": this process polls OpenSky itself; "archive": follow the snapshot
+# archive written by another process (one poller for many server workers)
+FEED_SOURCE = os.environ.get("LOS_FEED", "live")
+
+def fetch_planes():
+    return get_planes()
+
+# The fleet snapshot every session sees. Nothing is fetched at import time:
+# the feed starts on run() or on the first request
+feed = FleetFeed(fetch_planes if FEED_SOURCE == "live" else archive_follower(archive),
+                 interval=REFRESH_SECONDS)
+
+# Filtered tracks across polls: the map shows every aircraft moved along its
+# track to the current frame, so it keeps moving between (rarer) polls.
+# Forecasts, graphs and routes stay keyed on the polled snapshot; only the
+# drawn positions are shifted by the tracks' movement since the poll.
+# LOS_TRACKS=0 shows the raw polled snapshot instead
+USE_TRACKS = os.environ.get("LOS_TRACKS", "1") != "0"
+FRAME_SECONDS = float(os.environ.get("LOS_FRAME_SECONDS", "2"))
+tracks = TrackStore()
+
+def current_fleet():
+    """
+    The polled snapshot callbacks forecast and route on.
+    """
+    return feed.current()
+
 
-planes_list = get_planes()
+def frame_offsets(fleet):
+    """
+    (frame timestamp, dlat, dlon): how far the tracks have moved each
+    aircraft of fleet by the current frame (see TrackStore.offsets), or
+    None when positions are drawn as polled.
+    """
+    if not USE_TRACKS or not len(fleet):
+        return None
+    return tracks.offsets(fleet, time.time(), FRAME_SECONDS)
+
+# Great-circle forecasts: the flat-earth step drifts at hour-long horizons
+FORECAST_MODEL = 'spherical'
+
+# Forecasts, graphs and routes per (snapshot, horizon). Graphs are rebuilt
+# on the grid backend: the slider jumps minutes between horizons, past any
+# incremental slack. LOS_INCREMENTAL=1 keeps one IncrementalLOSGraph across
+# refreshes instead (faster for small steps, see the graph_update benchmark)
+USE_INCREMENTAL = os.environ.get("LOS_INCREMENTAL", "0") == "1"
+forecast_cache = ForecastCache(max_entries=64, los_graph=IncrementalLOSGraph() if USE_INCREMENTAL else None,
+                               model=FORECAST_MODEL)
+
+# Routes are kept up to date on every refresh and only rerouted when a link
+# breaks (shared: sessions with the same endpoints reuse each other's routes)
+route_tracker = RouteTracker(model=FORECAST_MODEL)
 
 # -------------------------------
 # Initialize Dash app
 # -------------------------------
 app = dash.Dash(__name__)
+# WSGI entry point for multi-worker servers, e.g. gunicorn map_GUI:server
+server = app.server
 
 # -------------------------------
 # Initial figure
 # -------------------------------
 fig = go.Figure()
 
-# Trace 0 → aircraft (forecasted)
+# Trace 0 → aircraft (forecasted, only those in view; customdata = icao24)
 fig.add_trace(go.Scattermap(
     lat=[],
     lon=[],
     mode='markers+text',
     marker=dict(size=9, color='blue'),
     text=[],
+    customdata=[],
     textposition="top right",
     name="Aircraft"
 ))
@@ -54,11 +120,23 @@ fig.add_trace(go.Scattermap(
     name="LOS Path"
 ))
 
+# Trace 3 → clusters of aircraft at low zoom (see map_view.decimate)
+fig.add_trace(go.Scattermap(
+    lat=[],
+    lon=[],
+    mode="markers+text",
+    marker=dict(size=[], color="steelblue", opacity=0.7),
+    text=[],
+    textfont=dict(color="white"),
+    hovertemplate="%{text} aircraft<extra></extra>",
+    name="Clusters"
+))
+
 fig.update_layout(
-    mapbox=dict(
+    map=dict(
         style="open-street-map",
-        center=dict(lat=45.0, lon=-76.0),
-        zoom=4
+        center=INITIAL_VIEW["center"],
+        zoom=INITIAL_VIEW["zoom"]
     ),
     margin=dict(l=0, r=0, t=0, b=0),
     uirevision="constant"
@@ -73,6 +151,19 @@ app.layout = html.Div([
         html.Button("Select End", id="end-btn", n_clicks=0),
         html.Button("Calculate", id="calc-btn", n_clicks=0),
         html.Button("Update Positions", id="update-btn", n_clicks=0),
+        html.Span(id="mode-info", style={"marginLeft": "10px"}),
+        html.Span(id="path-info", style={"marginLeft": "10px"}),
+        # "start" / "end": what the next click on an aircraft selects
+        dcc.Store(id="selection-mode"),
+        # Current map view (center, zoom, corners), merged from relayout events
+        dcc.Store(id="viewport"),
+        # This session's start/end icao24s and route (survive page reloads)
+        dcc.Store(id="session", storage_type="session"),
+        # Redraws the map when the shared snapshot (or track frame) changed
+        dcc.Interval(id="snapshot-poll", interval=int(FRAME_SECONDS * 1000)),
+        # Color aircraft by relay island (needs the LOS graph of every frame)
+        dcc.Checklist(id="island-colors", options=[{"label": "Color relay islands", "value": "on"}],
+                      value=[], inline=True, style={"display": "inline-block", "marginLeft": "10px"}),
         html.Label("Forecast (seconds)"),
         dcc.Slider(
             id='forecast-slider',
@@ -88,135 +179,346 @@ app.layout = html.Div([
     dcc.Graph(id='map', figure=fig)
 ])
 
+# -------------------------------
+# Fleet loading
+# -------------------------------
+def load_archived_planes():
+    """
+    Show the most recent archived snapshot (if any) until live data arrives.
+    """
+    latest = archive.latest()
+    if latest is not None:
+        feed.publish(latest)
+        print(f"Loaded {len(latest)} archived planes")
+
+
+def start_feed():
+    """
+    Start the shared background refresher (once per process).
+    """
+    if not feed.running:
+        if FEED_SOURCE == "live" and not len(feed.current()):
+            load_archived_planes()
+        feed.start()
+
+
+@server.before_request
+def ensure_feed_started():
+    # Under a WSGI server run() is never called
+    start_feed()
+
+# -------------------------------
+# Clientside callbacks (no server round trip)
+# -------------------------------
+app.clientside_callback(
+    """
+    function(startClicks, endClicks) {
+        var triggered = window.dash_clientside.callback_context.triggered;
+        if (!triggered.length) {
+            return [window.dash_clientside.no_update, window.dash_clientside.no_update];
+        }
+        var mode = triggered[0].prop_id.startsWith("start-btn") ? "start" : "end";
+        return [mode, "Click on a plane to select " + mode.toUpperCase()];
+    }
+    """,
+    Output('selection-mode', 'data'),
+    Output('mode-info', 'children'),
+    Input('start-btn', 'n_clicks'),
+    Input('end-btn', 'n_clicks'),
+    prevent_initial_call=True
+)
+
+app.clientside_callback(
+    """
+    function(relayout, view) {
+        if (!relayout) {
+            return window.dash_clientside.no_update;
+        }
+        var next = Object.assign({}, view || {});
+        var moved = false;
+        if (relayout["map.center"]) { next.center = relayout["map.center"]; moved = true; }
+        if (relayout["map.zoom"] !== undefined) { next.zoom = relayout["map.zoom"]; moved = true; }
+        if (!moved) {
+            return window.dash_clientside.no_update;
+        }
+        if (relayout["map._derived"]) {
+            next.coordinates = relayout["map._derived"].coordinates;
+        } else {
+            delete next.coordinates;
+        }
+        return next;
+    }
+    """,
+    Output('viewport', 'data'),
+    Input('map', 'relayoutData'),
+    State('viewport', 'data')
+)
+
 # -------------------------------
 # Callback
 # -------------------------------
+# Inputs that change which aircraft are drawn where; anything else (clicks,
+# Calculate) only patches the selection and path traces. A poll redraws the
+# aircraft when the polled snapshot changed, and otherwise only moves them to
+# the new track frame
+AIRCRAFT_TRIGGERS = {"", "update-btn", "forecast-slider", "viewport", "island-colors"}
+
+# Aircraft positions are sent rounded to this many decimals (about 1 m)
+POSITION_DECIMALS = 5
+
+def new_session():
+    return {"start": None, "end": None, "route": None, "snapshot": None, "frame": None}
+
+
+def on_frame(forecasted, frame):
+    """
+    forecasted with its positions moved by frame_offsets (as drawn).
+    """
+    if frame is None:
+        return forecasted
+    _, dlat, dlon = frame
+    return forecasted.with_positions(forecasted.lat + dlat, (forecasted.lon + dlon + 180) % 360 - 180)
+
 @app.callback(
     Output('map', 'figure'),
-    Input('start-btn', 'n_clicks'),
-    Input('end-btn', 'n_clicks'),
+    Output('path-info', 'children'),
+    Output('session', 'data'),
     Input('calc-btn', 'n_clicks'),
     Input('update-btn', 'n_clicks'),
     Input('map', 'clickData'),
     Input('forecast-slider', 'value'),
-    State('map', 'figure')
+    Input('snapshot-poll', 'n_intervals'),
+    Input('viewport', 'data'),
+    Input('island-colors', 'value'),
+    State('selection-mode', 'data'),
+    State('session', 'data')
 )
-def update_map(start_clicks, end_clicks, calc_clicks, update_clicks, clickData, forecast_seconds, fig):
-    global selection_mode, selected_start_plane, selected_end_plane, planes_list
+def update_map(calc_clicks, update_clicks, clickData, forecast_seconds, poll_count, view, islands,
+               selection_mode, session):
+    with metrics.timer("update_map"):
+        ctx = dash.callback_context
+        triggered = ctx.triggered[0]['prop_id'].split('.')[0] if ctx.triggered else ""
+        if triggered == "update-btn":
+            feed.refresh()
+
+        # One snapshot for the whole callback, whatever the refresher does
+        fleet = current_fleet()
+        frame = frame_offsets(fleet)
+        session = dict(new_session(), **(session or {}))
+        # Keyed on content, not snapshot_id: the next poll may be served by
+        # another worker process
+        if (triggered == "snapshot-poll" and session["snapshot"] == fleet.fingerprint
+                and session["frame"] == (frame and frame[0])):
+            raise dash.exceptions.PreventUpdate
+        return update_session_map(fleet, triggered, clickData, forecast_seconds, view, selection_mode, session,
+                                  color_islands=bool(islands), frame=frame)
 
-    ctx = dash.callback_context
-    triggered = ctx.triggered[0]['prop_id'].split('.')[0]
+
+def update_session_map(fleet, triggered, clickData, forecast_seconds, view, selection_mode, session,
+                       color_islands=False, frame=None):
+    """
+    Figure changes for one session's callback as a dash.Patch (only the
+    traces that changed are sent to the browser), the path info text and
+    the session's new state. fleet: the polled snapshot; frame: its
+    frame_offsets (None draws it as polled). color_islands: color aircraft
+    by relay island instead of one color. session is a dict of icao24s:
+    {"start", "end", "route": [start, end] or None, "snapshot": fingerprint
+    of the snapshot last drawn, "frame": timestamp of the frame last
+    drawn}. Nothing shared is modified.
+    """
+    patch = dash.Patch()
+    session = dict(session)
 
     # -----------------------
-    # Button handling
+    # Selection handling
     # -----------------------
-    if triggered == "start-btn":
-        selection_mode = "start"
-        print("Click on a plane to select START")
-
-    elif triggered == "end-btn":
-        selection_mode = "end"
-        print("Click on a plane to select END")
-
-    elif triggered == "map" and clickData is not None:
-        point_idx = clickData["points"][0]["pointIndex"]
-        if selection_mode == "start":
-            selected_start_plane = point_idx
-            print(f"Start selected: {planes_list[point_idx]['icao24']}")
-        elif selection_mode == "end":
-            selected_end_plane = point_idx
-            print(f"End selected: {planes_list[point_idx]['icao24']}")
-
-    elif triggered == "update-btn":
-        # Save ICAOs
-        start_icao = planes_list[selected_start_plane]["icao24"] if selected_start_plane is not None else None
-        end_icao = planes_list[selected_end_plane]["icao24"] if selected_end_plane is not None else None
-
-        # Reload planes
-        planes_list = get_planes()
-
-        # Restore selections
-        selected_start_plane = next(
-            (i for i, p in enumerate(planes_list) if p["icao24"] == start_icao),
-            None
-        ) if start_icao else None
-
-        selected_end_plane = next(
-            (i for i, p in enumerate(planes_list) if p["icao24"] == end_icao),
-            None
-        ) if end_icao else None
+    if triggered == "map" and clickData is not None:
+        point = clickData["points"][0]
+        # Only individual aircraft are selectable (not clusters or the path)
+        icao = point.get("customdata") if point.get("curveNumber") == 0 else None
+        if icao is not None and fleet.row_of(icao) is not None and selection_mode in ("start", "end"):
+            session[selection_mode] = icao
+            session["route"] = None
+            print(f"{selection_mode.capitalize()} selected: {icao}")
+        if session["route"] is None:
+            patch['data'][2]['lat'] = []
+            patch['data'][2]['lon'] = []
 
     # -----------------------
-    # Build forecasted planes list
+    # Build forecasted fleet (cached per snapshot and horizon)
     # -----------------------
-    forecasted_planes = []
-    for p in planes_list:
-        lat, lon = extrapolate_position(
-            p["lat"], p["lon"], p["velocity"], p["track"], forecast_seconds
-        )
-        newp = p.copy()
-        newp["lat"] = lat
-        newp["lon"] = lon
-        forecasted_planes.append(newp)
+    forecasted_planes = forecast_cache.forecast(fleet, forecast_seconds)
+    shown = on_frame(forecasted_planes, frame)
 
     # -----------------------
-    # Update aircraft trace
+    # Update aircraft and cluster traces (in view only)
     # -----------------------
-    fig['data'][0]['lat'] = [p["lat"] for p in forecasted_planes]
-    fig['data'][0]['lon'] = [p["lon"] for p in forecasted_planes]
-    fig['data'][0]['text'] = [p["callsign"] or p["icao24"] for p in forecasted_planes]
+    frame_time = frame and frame[0]
+    if triggered in AIRCRAFT_TRIGGERS or session["snapshot"] != fleet.fingerprint:
+        with metrics.timer("figure"):
+            # Decimated on the forecast, so the rows stay put between frames
+            rows, clusters = decimate(forecasted_planes.lat, forecasted_planes.lon, view)
+            patch['data'][0]['lat'] = shown.lat[rows].round(POSITION_DECIMALS).tolist()
+            patch['data'][0]['lon'] = shown.lon[rows].round(POSITION_DECIMALS).tolist()
+            patch['data'][0]['text'] = forecasted_planes.labels()[rows].tolist()
+            patch['data'][0]['customdata'] = forecasted_planes.icao24[rows].tolist()
+            if color_islands:
+                labels = forecast_cache.components(fleet, forecast_seconds)
+                patch['data'][0]['marker']['color'] = island_colors(labels, rows)
+            else:
+                patch['data'][0]['marker']['color'] = 'blue'
+            patch['data'][3]['lat'] = clusters["lat"].tolist()
+            patch['data'][3]['lon'] = clusters["lon"].tolist()
+            patch['data'][3]['text'] = clusters["count"].astype(str).tolist()
+            patch['data'][3]['marker']['size'] = cluster_sizes(clusters["count"]).tolist()
+        metrics.gauge("map.markers", len(rows))
+        metrics.gauge("map.clusters", len(clusters["count"]))
+        session["snapshot"] = fleet.fingerprint
+        session["frame"] = frame_time
+    elif session["frame"] != frame_time:
+        # Same aircraft, labels and clusters: only the positions move
+        with metrics.timer("figure"):
+            rows, _ = decimate(forecasted_planes.lat, forecasted_planes.lon, view)
+            patch['data'][0]['lat'] = shown.lat[rows].round(POSITION_DECIMALS).tolist()
+            patch['data'][0]['lon'] = shown.lon[rows].round(POSITION_DECIMALS).tolist()
+        session["frame"] = frame_time
 
     # -----------------------
-    # Update start/end markers
+    # Update start/end markers (by icao24, so they survive refreshes)
     # -----------------------
     markers_lat = []
     markers_lon = []
     colors = []
     sizes = []
 
-    if selected_start_plane is not None and selected_start_plane < len(forecasted_planes):
-        p = forecasted_planes[selected_start_plane]
-        markers_lat.append(p["lat"])
-        markers_lon.append(p["lon"])
-        colors.append("green")
-        sizes.append(14)
-
-    if selected_end_plane is not None and selected_end_plane < len(forecasted_planes):
-        p = forecasted_planes[selected_end_plane]
-        markers_lat.append(p["lat"])
-        markers_lon.append(p["lon"])
-        colors.append("red")
-        sizes.append(14)
-
-    fig['data'][1]['lat'] = markers_lat
-    fig['data'][1]['lon'] = markers_lon
-    fig['data'][1]['marker']['size'] = sizes
-    fig['data'][1]['marker']['color'] = colors
+    for icao, color in ((session["start"], "green"), (session["end"], "red")):
+        row = shown.row_of(icao) if icao else None
+        if row is not None:
+            p = shown[row]
+            markers_lat.append(p["lat"])
+            markers_lon.append(p["lon"])
+            colors.append(color)
+            sizes.append(14)
+
+    patch['data'][1]['lat'] = markers_lat
+    patch['data'][1]['lon'] = markers_lon
+    patch['data'][1]['marker']['size'] = sizes
+    patch['data'][1]['marker']['color'] = colors
 
     # -----------------------
     # Update LOS path (USING FORECASTED POSITIONS)
     # -----------------------
-    if triggered == "calc-btn" and selected_start_plane is not None and selected_end_plane is not None:
-        shortest_los_path = compute_los_path(
-            forecasted_planes,  # <<< critical fix
-            forecasted_planes[selected_start_plane]["icao24"],
-            forecasted_planes[selected_end_plane]["icao24"],
-            extra_delay=0.0
-        )
+    if triggered == "calc-btn" and session["start"] and session["end"]:
+        session["route"] = [session["start"], session["end"]]
+
+    path_info = dash.no_update
+    if session["route"] is not None:
+        start_icao, end_icao = session["route"]
 
-        if shortest_los_path:
-            fig['data'][2]['lat'] = [p["lat"] for p in shortest_los_path]
-            fig['data'][2]['lon'] = [p["lon"] for p in shortest_los_path]
+        def compute():
+            path = forecast_cache.route(
+                fleet,
+                forecast_seconds,  # <<< route on forecasted positions
+                start_icao,
+                end_icao,
+                extra_delay=0.0,
+                search='astar'
+            )
+            return None if path is None else [p["icao24"] for p in path]
+
+        # Reuses the last route while all of its links are predicted to hold
+        route = None
+        if fleet.row_of(start_icao) is not None and fleet.row_of(end_icao) is not None:
+            snapshot_time = fleet.timestamp if fleet.timestamp is not None else time.time()
+            route = route_tracker.route(forecasted_planes, start_icao, end_icao, extra_delay=0.0,
+                                        at=snapshot_time + forecast_seconds, compute=compute)
+
+        if route:
+            path = [shown.get(p["icao24"]) for p in route["path"]]
+            patch['data'][2]['lat'] = [p["lat"] for p in path]
+            patch['data'][2]['lon'] = [p["lon"] for p in path]
+            valid_for = route["valid_for"]
+            path_info = "Path valid for > 1 h" if valid_for == float("inf") else f"Path valid for {valid_for:.0f} s"
         else:
-            print("Cannot calculate LOS path")
+            patch['data'][2]['lat'] = []
+            patch['data'][2]['lon'] = []
+            path_info = "No LOS path"
+            if fleet.row_of(start_icao) is not None and fleet.row_of(end_icao) is not None:
+                # Answered from the component labels, no search
+                if not forecast_cache.connected(fleet, forecast_seconds, start_icao, end_icao):
+                    path_info = "No LOS path (start and end are on different relay islands)"
+
+    return patch, path_info, session
+
+# -------------------------------
+# Cache statistics and metrics
+# -------------------------------
+@app.server.route("/cache-stats")
+def cache_stats():
+    return flask.jsonify(forecast_cache.stats())
+
+
+# Cookie carrying a browser's profiling token (see /metrics/profile)
+PROFILE_COOKIE = "los_profile"
+
+@app.server.before_request
+def start_request_metrics():
+    # Only callback requests are timed/profiled (not assets or layout), and
+    # only those of a browser that asked for profiling
+    if flask.request.path.endswith("_dash-update-component"):
+        flask.g.request_t0 = time.perf_counter()
+        flask.g.request_profile = profiler.start(flask.request.cookies.get(PROFILE_COOKIE))
+
+
+@app.server.after_request
+def finish_request_metrics(response):
+    t0 = flask.g.pop("request_t0", None)
+    if t0 is not None:
+        # Includes Dash's JSON serialization of the returned figure
+        metrics.add_time("callback_request", time.perf_counter() - t0)
+        metrics.gauge("callback_response_bytes", response.calculate_content_length())
+        profiler.finish(flask.g.pop("request_profile", None), flask.request.path)
+    return response
+
+
+@app.server.route("/metrics")
+def metrics_report():
+    """
+    Stage timers (seconds), counters and gauges; ?reset=1 clears them
+    after reporting.
+    """
+    report = dict(metrics.snapshot(), cache=forecast_cache.stats())
+    if flask.request.args.get("reset") == "1":
+        metrics.reset()
+    return flask.jsonify(report)
+
 
-    return fig
+@app.server.route("/metrics/profile", methods=["GET", "POST", "DELETE"])
+def metrics_profile():
+    """
+    Only with LOS_PROFILE=1. POST (?requests=N, default 1) profiles the
+    next N callback requests of the browser that posted (a token cookie);
+    DELETE cancels that. Returns the most recent profiles.
+    """
+    if not profiler.enabled:
+        flask.abort(404)
+    response = flask.jsonify(profiles=list(profiler.profiles))
+    if flask.request.method == "POST":
+        requests = min(max(flask.request.args.get("requests", 1, type=int), 1), profiler.profiles.maxlen)
+        response.set_cookie(PROFILE_COOKIE, profiler.arm(requests), httponly=True, samesite="Strict")
+    elif flask.request.method == "DELETE":
+        profiler.disarm(flask.request.cookies.get(PROFILE_COOKIE))
+        response.delete_cookie(PROFILE_COOKIE)
+    return response
 
 # -------------------------------
 # Run app
 # -------------------------------
-def run():
-    app.run(debug=True)
+def run(debug=True):
+    # With the debug reloader only the serving child process should fetch
+    if not debug or os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        start_feed()
+    app.run(debug=debug)
 
 
 if __name__ == "__main__":
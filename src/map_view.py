@@ -0,0 +1,156 @@
+import math
+
+import numpy as np
+
+# Initial map view (matches the figure layout in map_GUI)
+INITIAL_VIEW = {"center": {"lat": 45.0, "lon": -76.0}, "zoom": 4}
+
+# Assumed map size in pixels until the browser reports the real corners
+VIEW_WIDTH = 1200
+VIEW_HEIGHT = 700
+
+# Fraction of the view added on every side, so short pans stay populated
+VIEW_MARGIN = 0.25
+
+# Above this many aircraft in view, nearby aircraft are drawn as clusters
+MAX_MARKERS = 1500
+
+# Cluster cell size in screen pixels
+CELL_PIXELS = 40
+
+# Colors of the largest relay islands (cycled); lone aircraft are ISOLATED_COLOR
+ISLAND_COLORS = ("#1f77b4", "#2ca02c", "#9467bd", "#8c564b", "#e377c2", "#17becf", "#bcbd22", "#d62728")
+ISOLATED_COLOR = "#9e9e9e"
+
+# Web Mercator latitude limit
+MAX_LAT = 85.05112878
+
+# ---------------------------
+# Viewport
+# ---------------------------
+def view_bounds(view=None, margin=VIEW_MARGIN):
+    """
+    (south, north, west, east) of a map view in degrees, grown by margin
+    of its size on every side. west > east means the view crosses the
+    antimeridian; (-180, 180) longitudes mean the whole world is in view.
+
+    view: dict from the browser's relayout events, with center {lat, lon}
+          and zoom, and optionally coordinates (the [lon, lat] corners)
+    """
+    view = view or INITIAL_VIEW
+    corners = view.get("coordinates")
+    if corners:
+        lons = [c[0] for c in corners]
+        lats = [c[1] for c in corners]
+        west, east = min(lons), max(lons)
+        south, north = min(lats), max(lats)
+    else:
+        center, zoom = view.get("center", INITIAL_VIEW["center"]), view.get("zoom", INITIAL_VIEW["zoom"])
+        # 256-pixel tiles: the world is 256 * 2**zoom pixels wide
+        world = 256 * 2 ** zoom
+        half_lon = VIEW_WIDTH / world * 180
+        west, east = center["lon"] - half_lon, center["lon"] + half_lon
+        y = _mercator_y(center["lat"])
+        half_y = VIEW_HEIGHT / world * math.pi
+        south, north = _mercator_lat(y - half_y), _mercator_lat(y + half_y)
+
+    grow_lon = (east - west) * margin
+    grow_lat = (north - south) * margin
+    west, east = west - grow_lon, east + grow_lon
+    south, north = max(south - grow_lat, -90.0), min(north + grow_lat, 90.0)
+    if east - west >= 360:
+        return south, north, -180.0, 180.0
+    return south, north, _wrap(west), _wrap(east)
+
+
+def in_view(lat, lon, bounds):
+    """
+    Boolean mask of the points inside (south, north, west, east).
+    """
+    south, north, west, east = bounds
+    inside = (lat >= south) & (lat <= north)
+    if west == -180.0 and east == 180.0:
+        return inside
+    width = (east - west) % 360
+    return inside & ((lon - west) % 360 <= width)
+
+
+def _mercator_y(lat):
+    lat = max(min(lat, MAX_LAT), -MAX_LAT)
+    return math.log(math.tan(math.pi / 4 + math.radians(lat) / 2))
+
+
+def _mercator_lat(y):
+    return math.degrees(2 * math.atan(math.exp(y)) - math.pi / 2)
+
+
+def _wrap(lon):
+    return (lon + 180) % 360 - 180
+
+# ---------------------------
+# Decimation
+# ---------------------------
+def decimate(lat, lon, view=None, max_markers=MAX_MARKERS, cell_pixels=CELL_PIXELS):
+    """
+    Aircraft to draw for a map view.
+
+    Aircraft outside the view (plus margin) are dropped. If more than
+    max_markers remain, they are binned into cells of about cell_pixels
+    on screen; cells holding a single aircraft still show it, the others
+    become one cluster marker at the cells' mean position.
+
+    Returns (rows, clusters): rows of the aircraft drawn individually, and
+    a dict with lat, lon and count arrays of the clusters.
+    """
+    lat = np.asarray(lat, dtype=float)
+    lon = np.asarray(lon, dtype=float)
+    rows = np.nonzero(in_view(lat, lon, view_bounds(view)))[0]
+    no_clusters = {"lat": np.empty(0), "lon": np.empty(0), "count": np.empty(0, dtype=np.int64)}
+    if len(rows) <= max_markers:
+        return rows, no_clusters
+
+    zoom = (view or INITIAL_VIEW).get("zoom", INITIAL_VIEW["zoom"])
+    cell = 360.0 / 2 ** zoom * cell_pixels / 256
+    cells = np.column_stack([np.floor(lat[rows] / cell), np.floor(lon[rows] / cell)]).astype(np.int64)
+    _, inverse, counts = np.unique(cells, axis=0, return_inverse=True, return_counts=True)
+    inverse = inverse.ravel()
+
+    single = counts[inverse] == 1
+    grouped = np.nonzero(counts > 1)[0]
+    multi = ~single
+    # Mean position per cell (cells never span the antimeridian)
+    sum_lat = np.bincount(inverse[multi], weights=lat[rows[multi]], minlength=len(counts))
+    sum_lon = np.bincount(inverse[multi], weights=lon[rows[multi]], minlength=len(counts))
+    clusters = {
+        "lat": sum_lat[grouped] / counts[grouped],
+        "lon": sum_lon[grouped] / counts[grouped],
+        "count": counts[grouped],
+    }
+    return rows[single], clusters
+
+
+def cluster_sizes(count):
+    """
+    Marker size (pixels) of clusters of count aircraft.
+    """
+    return np.clip(10 + 4 * np.log2(np.asarray(count, dtype=float)), 10, 40)
+
+# ---------------------------
+# Relay islands
+# ---------------------------
+def island_colors(labels, rows=None, palette=ISLAND_COLORS, isolated=ISOLATED_COLOR):
+    """
+    Marker color per aircraft from its connected component label: islands
+    get palette colors by size (largest first, cycled), aircraft without
+    any link get the isolated color. rows: the aircraft drawn (default
+    all); islands are sized over the whole fleet.
+    """
+    labels = np.asarray(labels)
+    _, inverse, counts = np.unique(labels, return_inverse=True, return_counts=True)
+    inverse = inverse.ravel()
+    rank = np.empty(len(counts), dtype=np.int64)
+    rank[np.argsort(-counts, kind="stable")] = np.arange(len(counts))
+    colors = np.array(palette, dtype=object)[rank % len(palette)]
+    colors[counts == 1] = isolated
+    picked = inverse if rows is None else inverse[rows]
+    return colors[picked].tolist()
@@ -0,0 +1,123 @@
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Token endpoint
+TOKEN_URL = "https://auth.opensky-network.org/auth/realms/opensky-network/protocol/openid-connect/token"
+
+# REST API root (/states/all lives under it)
+API_URL = "https://opensky-network.org/api"
+
+# Transient statuses worth retrying (rate limiting and server errors)
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+# ---------------------------
+# OpenSky REST client
+# ---------------------------
+class OpenSkyClient:
+    """
+    OpenSky API client with OAuth token caching and a pooled HTTP session.
+
+    The client-credentials token is reused until expiry_margin seconds
+    before it expires, so a refresh costs one round trip instead of two.
+    All requests go through one requests.Session (keep-alive, connection
+    pool) with timeouts and retry/backoff on transient failures. Safe to
+    share between threads (concurrent callers share one token fetch).
+    """
+
+    def __init__(self, client_id, client_secret, token_url=TOKEN_URL, api_url=API_URL,
+                 timeout=(5, 30), retries=3, backoff_factor=0.5, expiry_margin=30, pool_size=4):
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.token_url = token_url
+        self.api_url = api_url.rstrip("/")
+        self.timeout = timeout
+        self.expiry_margin = expiry_margin
+        self.session = _pooled_session(retries, backoff_factor, pool_size)
+        self._token = None
+        self._token_expires = 0.0
+        self._token_lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.session.close()
+
+    def access_token(self):
+        """
+        Cached access token, fetched again only when (nearly) expired.
+        """
+        with self._token_lock:
+            if self._token is None or time.monotonic() >= self._token_expires:
+                r = self.session.post(self.token_url, data={
+                    "grant_type": "client_credentials",
+                    "client_id": self.client_id,
+                    "client_secret": self.client_secret
+                }, timeout=self.timeout)
+                r.raise_for_status()
+                payload = r.json()
+                self._token = payload["access_token"]
+                lifetime = float(payload.get("expires_in", 0))
+                self._token_expires = time.monotonic() + max(lifetime - self.expiry_margin, 0.0)
+            return self._token
+
+    def invalidate_token(self):
+        self._token = None
+
+    def get_states(self, params=None):
+        """
+        GET /states/all with the given query parameters (e.g. a bounding
+        box); returns the decoded JSON payload. A 401 (token revoked or
+        expired early) triggers one token refresh and retry.
+        """
+        response = self._get("/states/all", params)
+        if response.status_code == 401:
+            self.invalidate_token()
+            response = self._get("/states/all", params)
+        response.raise_for_status()
+        return response.json()
+
+    def states_stream(self, params=None):
+        """
+        GET /states/all without reading the body: returns the open
+        response, to be read incrementally (response.iter_content, e.g. by
+        state_stream.parse_states) and closed by the caller (use it as a
+        context manager). 401 handling as in get_states.
+        """
+        response = self._get("/states/all", params, stream=True)
+        if response.status_code == 401:
+            response.close()
+            self.invalidate_token()
+            response = self._get("/states/all", params, stream=True)
+        if not response.ok:
+            response.close()
+            response.raise_for_status()
+        return response
+
+    def _get(self, path, params, stream=False):
+        headers = {"Authorization": f"Bearer {self.access_token()}"}
+        return self.session.get(self.api_url + path, params=params, headers=headers, timeout=self.timeout,
+                                stream=stream)
+
+
+def _pooled_session(retries, backoff_factor, pool_size):
+    retry = Retry(
+        total=retries,
+        backoff_factor=backoff_factor,
+        status_forcelist=RETRY_STATUSES,
+        allowed_methods=frozenset({"GET", "POST"}),
+        respect_retry_after_header=True,
+        raise_on_status=False
+    )
+    adapter = HTTPAdapter(max_retries=retry, pool_connections=pool_size, pool_maxsize=pool_size)
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
@@ -0,0 +1,350 @@
+import argparse
+import json
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from calculate_path import extrapolate_positions, find_path
+from fleet import FleetSnapshot
+from snapshot_archive import SnapshotArchive
+from visibility_graph import SIGNAL_SPEED, haversine_pairs, los_adjacency
+
+# Replay of archived snapshots: routes a fixed set of (start, end) pairs at
+# every tick of a time range and reports relay availability, hop counts and
+# delays.
+#
+#   python src/replay.py --archive archives --random-pairs 50 --step 10 --output day.json
+#   python src/replay.py --archive archives --pairs pairs.json --start 1700000000 --end 1700086400
+#
+# pairs.json: a list of [start_icao24, end_icao24] (or {"start", "end"}
+# objects). Legacy pickles are imported first with src/snapshot_archive.py.
+
+# Snapshots further apart than this (seconds) are not interpolated: the
+# earlier one is held until the next
+MAX_GAP = 120.0
+
+# Ticks per process-pool task
+SLICE_TICKS = 64
+
+# ---------------------------
+# Snapshots between archive records
+# ---------------------------
+def interpolate_snapshots(a, b, t, model='flat'):
+    """
+    FleetSnapshot at time t between snapshots a and b (a.timestamp <= t <=
+    b.timestamp). Aircraft in both are interpolated linearly (longitude
+    and track across the wrap); aircraft in only one are moved along their
+    own velocity and track from that snapshot to t.
+    """
+    ta, tb = float(a.timestamp), float(b.timestamp)
+    w = (t - ta) / (tb - ta) if tb > ta else 0.0
+    _, ia, ib = np.intersect1d(a.icao24, b.icao24, assume_unique=False, return_indices=True)
+
+    only_a = np.setdiff1d(np.arange(len(a)), ia, assume_unique=True)
+    only_b = np.setdiff1d(np.arange(len(b)), ib, assume_unique=True)
+    lat_a, lon_a = extrapolate_positions(a.lat[only_a], a.lon[only_a], a.velocity[only_a], a.track[only_a],
+                                         t - ta, model)
+    lat_b, lon_b = extrapolate_positions(b.lat[only_b], b.lon[only_b], b.velocity[only_b], b.track[only_b],
+                                         t - tb, model)
+
+    def blend(x, y):
+        return x + w * (y - x)
+
+    def blend_angle(x, y, period):
+        half = period / 2
+        return np.mod(x + w * (np.mod(y - x + half, period) - half) + half, period) - half
+
+    columns = {
+        "icao24": (a.icao24[ia], a.icao24[only_a], b.icao24[only_b]),
+        "callsign": (a.callsign[ia], a.callsign[only_a], b.callsign[only_b]),
+        "lat": (blend(a.lat[ia], b.lat[ib]), lat_a, lat_b),
+        "lon": (blend_angle(a.lon[ia], b.lon[ib], 360.0), lon_a, lon_b),
+        "geo_alt": (blend(a.geo_alt[ia], b.geo_alt[ib]), a.geo_alt[only_a], b.geo_alt[only_b]),
+        "velocity": (blend(a.velocity[ia], b.velocity[ib]), a.velocity[only_a], b.velocity[only_b]),
+        "track": (np.mod(blend_angle(a.track[ia], b.track[ib], 360.0), 360.0), a.track[only_a], b.track[only_b]),
+    }
+    return FleetSnapshot(**{name: np.concatenate(parts) for name, parts in columns.items()}, timestamp=t)
+
+
+class ArchiveCursor:
+    """
+    Snapshots of an archive at arbitrary times, for ticks visited mostly in
+    increasing order: the two records around the last tick stay loaded.
+
+    interpolate: False holds the latest snapshot at or before t; True
+                 interpolates between the snapshots around t (see
+                 interpolate_snapshots) when they are at most max_gap apart
+    """
+
+    def __init__(self, archive, interpolate=True, max_gap=MAX_GAP, model='flat'):
+        self.archive = archive
+        self.interpolate = interpolate
+        self.max_gap = max_gap
+        self.model = model
+        self._timestamps = archive.timestamps()
+        self._loaded = {}
+
+    def _load(self, k):
+        if k not in self._loaded:
+            # Keep only the neighbors of the current tick
+            self._loaded = {key: fleet for key, fleet in self._loaded.items() if abs(key - k) <= 1}
+            self._loaded[k] = self.archive.load(k)
+        return self._loaded[k]
+
+    def at(self, t):
+        """
+        FleetSnapshot at time t, or None before the first snapshot.
+        """
+        ts = self._timestamps
+        k = int(np.searchsorted(ts, t, side="right")) - 1
+        if k < 0:
+            return None
+        before = self._load(k)
+        if not self.interpolate or ts[k] == t or k + 1 >= len(ts) or ts[k + 1] - ts[k] > self.max_gap:
+            return before
+        return interpolate_snapshots(before, self._load(k + 1), t, self.model)
+
+
+def replay_ticks(timestamps, start=None, end=None, step=None):
+    """
+    Tick times in [start, end]: the snapshot timestamps themselves, or
+    every step seconds from start (default: first snapshot).
+    """
+    timestamps = np.asarray(timestamps, dtype=float)
+    if not len(timestamps):
+        return np.empty(0)
+    start = timestamps[0] if start is None else max(float(start), timestamps[0])
+    end = timestamps[-1] if end is None else min(float(end), timestamps[-1])
+    if step is None:
+        return timestamps[(timestamps >= start) & (timestamps <= end)]
+    return np.arange(start, end + step / 2, step)
+
+# ---------------------------
+# Routing per tick
+# ---------------------------
+def route_pairs(fleet, pairs, metric='delay', extra_delay=0.0):
+    """
+    Route every (start, end) pair on one snapshot. Returns (present, hops,
+    delay) arrays: whether both endpoints are in the snapshot, hop count
+    (-1 if unreachable) and total link delay (NaN if unreachable; the
+    'delay' metric's path cost) of the path found for metric.
+    """
+    present = np.array([fleet.row_of(s) is not None and fleet.row_of(e) is not None for s, e in pairs], dtype=bool)
+    hops = np.full(len(pairs), -1, dtype=np.int64)
+    delay = np.full(len(pairs), np.nan)
+    routable = [k for k in range(len(pairs)) if present[k]]
+    if not routable:
+        return present, hops, delay
+
+    # Per-pair searches: goal-directed A* (or BFS for hops) finishes long
+    # before a full shortest-path tree on dense graphs, and pairs on
+    # different relay islands are rejected from the component labels
+    graph = los_adjacency(fleet, metric, extra_delay)
+    search = 'astar' if metric == 'delay' else 'dijkstra'
+    for k in routable:
+        path = find_path(graph, pairs[k][0], pairs[k][1], metric, search, fleet, extra_delay)
+        if path is None:
+            continue
+        rows = np.array([fleet.row_of(icao) for icao in path], dtype=np.int64)
+        links = haversine_pairs(fleet.lat[rows[:-1]], fleet.lon[rows[:-1]], fleet.lat[rows[1:]], fleet.lon[rows[1:]])
+        hops[k] = len(path) - 1
+        delay[k] = float(np.sum(links / SIGNAL_SPEED + extra_delay))
+    return present, hops, delay
+
+
+def replay_slice(cursor, times, pairs, metric='delay', extra_delay=0.0):
+    """
+    route_pairs at each tick of times; (T, P) arrays present, hops, delay.
+    """
+    present = np.zeros((len(times), len(pairs)), dtype=bool)
+    hops = np.full((len(times), len(pairs)), -1, dtype=np.int64)
+    delay = np.full((len(times), len(pairs)), np.nan)
+    for n, t in enumerate(times):
+        fleet = cursor.at(t)
+        if fleet is not None:
+            present[n], hops[n], delay[n] = route_pairs(fleet, pairs, metric, extra_delay)
+    return present, hops, delay
+
+
+# Per-process cursor and settings, set by the pool initializer
+_worker = None
+
+def _init_worker(archive_path, pairs, metric, extra_delay, interpolate, model):
+    global _worker
+    cursor = ArchiveCursor(SnapshotArchive(archive_path), interpolate, model=model)
+    _worker = (cursor, pairs, metric, extra_delay)
+
+def _run_slice(times):
+    cursor, pairs, metric, extra_delay = _worker
+    return replay_slice(cursor, times, pairs, metric, extra_delay)
+
+# ---------------------------
+# Replay
+# ---------------------------
+class ReplayResult:
+    """
+    Outcome of a replay: (T, P) arrays over ticks x pairs.
+
+    present: both endpoints were in the snapshot
+    hops:    hop count of the path (-1: no path)
+    delay:   total link delay, in edge_weights units (NaN: no path)
+    """
+
+    def __init__(self, times, pairs, present, hops, delay):
+        self.times = times
+        self.pairs = [tuple(p) for p in pairs]
+        self.present = present
+        self.hops = hops
+        self.delay = delay
+
+    @property
+    def available(self):
+        return self.hops >= 0
+
+    def availability_series(self):
+        """
+        Share of the present pairs that had a path, per tick (NaN when no
+        pair was present).
+        """
+        present = self.present.sum(axis=1)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(present > 0, self.available.sum(axis=1) / present, np.nan)
+
+    def summary(self):
+        """
+        Availability, hop and delay statistics, overall and per pair.
+        Availability counts only ticks where both endpoints were present.
+        """
+        overall = _stats(self.present, self.available, self.hops, self.delay)
+        per_pair = [
+            dict(_stats(self.present[:, k], self.available[:, k], self.hops[:, k], self.delay[:, k]),
+                 start=start, end=end)
+            for k, (start, end) in enumerate(self.pairs)
+        ]
+        return {
+            "ticks": len(self.times),
+            "start": float(self.times[0]) if len(self.times) else None,
+            "end": float(self.times[-1]) if len(self.times) else None,
+            "overall": overall,
+            "pairs": per_pair,
+        }
+
+
+def _stats(present, available, hops, delay):
+    observed = int(present.sum())
+    routed = int(available.sum())
+    stats = {"observed": observed, "available": routed,
+             "availability": routed / observed if observed else None}
+    if routed:
+        h, d = hops[available], delay[available]
+        stats.update(
+            hops_mean=float(h.mean()), hops_median=float(np.median(h)), hops_max=int(h.max()),
+            delay_mean=float(d.mean()), delay_p50=float(np.percentile(d, 50)),
+            delay_p95=float(np.percentile(d, 95)), delay_max=float(d.max()),
+        )
+    return stats
+
+
+def run_replay(archive, pairs, start=None, end=None, step=None, interpolate=True, metric='delay',
+               extra_delay=0.0, workers=None, slice_ticks=SLICE_TICKS, model='flat'):
+    """
+    Replay archive over [start, end] and route pairs at every tick.
+
+    step: seconds between ticks (default: one tick per snapshot); with
+          interpolate, ticks between snapshots see interpolated positions
+    workers: process count (default os.cpu_count()); 1 runs in-process.
+             Ticks are split into contiguous slices of slice_ticks, each
+             replayed independently by one worker.
+    Returns a ReplayResult.
+    """
+    pairs = [(str(s), str(e)) for s, e in pairs]
+    times = replay_ticks(archive.timestamps(), start, end, step)
+    slices = [times[k:k + slice_ticks] for k in range(0, len(times), slice_ticks)]
+
+    if workers == 1 or len(slices) <= 1:
+        cursor = ArchiveCursor(archive, interpolate, model=model)
+        parts = [replay_slice(cursor, ticks, pairs, metric, extra_delay) for ticks in slices]
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(archive.path, pairs, metric, extra_delay, interpolate, model)) as pool:
+            parts = list(pool.map(_run_slice, slices))
+
+    if parts:
+        present, hops, delay = (np.concatenate(column) for column in zip(*parts))
+    else:
+        present = np.zeros((0, len(pairs)), dtype=bool)
+        hops = np.zeros((0, len(pairs)), dtype=np.int64)
+        delay = np.zeros((0, len(pairs)))
+    return ReplayResult(times, pairs, present, hops, delay)
+
+
+def choose_pairs(fleet, count, seed=0):
+    """
+    count random (start, end) pairs of distinct aircraft of fleet.
+    """
+    rng = np.random.default_rng(seed)
+    ids = fleet.icao24
+    if len(ids) < 2:
+        return []
+    starts = rng.integers(0, len(ids), count)
+    ends = (starts + rng.integers(1, len(ids), count)) % len(ids)
+    return [(str(ids[s]), str(ids[e])) for s, e in zip(starts, ends)]
+
+
+def read_pairs(path):
+    """
+    Pairs from a JSON list of [start, end] lists or {"start", "end"} objects.
+    """
+    with open(path) as f:
+        data = json.load(f)
+    return [(p["start"], p["end"]) if isinstance(p, dict) else tuple(p) for p in data]
+
+# ---------------------------
+# CLI
+# ---------------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay archived snapshots and report relay availability.")
+    parser.add_argument("--archive", default="archives", help="archive directory")
+    parser.add_argument("--pairs", help="JSON file of [start, end] icao24 pairs")
+    parser.add_argument("--random-pairs", type=int, default=20, help="random pairs from the first snapshot "
+                                                                     "when --pairs is not given")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--start", type=float, help="first tick (epoch seconds; default: first snapshot)")
+    parser.add_argument("--end", type=float, help="last tick (default: last snapshot)")
+    parser.add_argument("--step", type=float, help="seconds between ticks (default: every snapshot)")
+    parser.add_argument("--no-interpolate", action="store_true", help="hold snapshots instead of interpolating")
+    parser.add_argument("--metric", choices=("delay", "hops"), default="delay")
+    parser.add_argument("--extra-delay", type=float, default=0.0)
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument("--slice-ticks", type=int, default=SLICE_TICKS, help="ticks per task")
+    parser.add_argument("--output", help="write the full JSON report here")
+    args = parser.parse_args(argv)
+
+    archive = SnapshotArchive(args.archive)
+    if not len(archive):
+        raise SystemExit(f"Archive {args.archive} is empty")
+    if args.pairs:
+        pairs = read_pairs(args.pairs)
+    else:
+        first = next(archive.range(args.start, args.end), None)
+        if first is None:
+            first = archive.load(0)
+        pairs = choose_pairs(first, args.random_pairs, args.seed)
+
+    result = run_replay(archive, pairs, args.start, args.end, args.step, not args.no_interpolate,
+                        args.metric, args.extra_delay, args.workers, args.slice_ticks)
+    report = result.summary()
+    overall = report["overall"]
+    print(f"{report['ticks']} ticks, {len(pairs)} pairs: availability "
+          f"{overall['availability'] if overall['availability'] is not None else 'n/a'}", file=sys.stderr)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(overall, sys.stdout, indent=2)
+        sys.stdout.write("\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,211 @@
+import json
+import math
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from fleet import FleetSnapshot
+from instrumentation import metrics
+from state_stream import CHUNK_BYTES, StateStreamParser
+
+# OpenSky API credits per day for a standard account
+DAILY_CREDITS = 4000
+
+# Credits charged per /states/all call by bounding box area (square degrees):
+# (upper area bound, cost); larger boxes (or none) cost 4
+CREDIT_TIERS = ((25.0, 1), (100.0, 2), (400.0, 3))
+MAX_CREDIT_COST = 4
+
+# A shard skipped (budget) or failed keeps contributing its last result for
+# at most this many seconds
+MAX_STALE = 300.0
+
+# ---------------------------
+# Shards
+# ---------------------------
+def credit_cost(bbox):
+    """
+    Credits one /states/all call over bbox costs.
+    """
+    if not bbox:
+        return MAX_CREDIT_COST
+    area = (bbox["lamax"] - bbox["lamin"]) * (bbox["lomax"] - bbox["lomin"])
+    for bound, cost in CREDIT_TIERS:
+        if area <= bound:
+            return cost
+    return MAX_CREDIT_COST
+
+
+def split_bbox(bbox, rows, cols):
+    """
+    bbox split into a rows x cols grid of shards (row-major). Smaller
+    shards cost fewer credits each, but more of them per refresh.
+    """
+    lats = np.linspace(bbox["lamin"], bbox["lamax"], rows + 1).tolist()
+    lons = np.linspace(bbox["lomin"], bbox["lomax"], cols + 1).tolist()
+    return [{"lamin": lats[r], "lamax": lats[r + 1], "lomin": lons[c], "lomax": lons[c + 1]}
+            for r in range(rows) for c in range(cols)]
+
+
+def parse_shards(text):
+    """
+    Shards from JSON: a list of [lamin, lamax, lomin, lomax] lists or of
+    bbox objects. None/empty text gives None.
+    """
+    if not text:
+        return None
+    shards = []
+    for box in json.loads(text):
+        if not isinstance(box, dict):
+            box = dict(zip(("lamin", "lamax", "lomin", "lomax"), box))
+        shards.append({key: float(box[key]) for key in ("lamin", "lamax", "lomin", "lomax")})
+    return shards
+
+
+class ShardBudget:
+    """
+    Credit budget of one shard: a token bucket holding up to `credits`,
+    refilled evenly over `period` seconds (OpenSky's daily allowance), and
+    a minimum interval between two fetches. Thread-safe.
+    """
+
+    def __init__(self, credits=DAILY_CREDITS, period=86400.0, min_interval=0.0, clock=time.monotonic):
+        self.credits = float(credits)
+        self.period = float(period)
+        self.min_interval = float(min_interval)
+        self.clock = clock
+        self.available = self.credits
+        self._refilled = clock()
+        self._last_fetch = -math.inf
+        self._lock = threading.Lock()
+
+    def try_spend(self, cost):
+        """
+        Take cost credits and return True if the shard may fetch now.
+        """
+        with self._lock:
+            now = self.clock()
+            self.available = min(self.credits, self.available + (now - self._refilled) * self.credits / self.period)
+            self._refilled = now
+            if cost > self.available or now - self._last_fetch < self.min_interval:
+                return False
+            self.available -= cost
+            self._last_fetch = now
+            return True
+
+# ---------------------------
+# Fetching and merging
+# ---------------------------
+def fetch_shard(client, bbox):
+    """
+    Airborne aircraft over one bbox, streamed and parsed (see
+    state_stream). Returns (FleetSnapshot, time_position, parse_seconds).
+    """
+    with client.states_stream(bbox) as response:
+        parser = StateStreamParser(expected_bytes=int(response.headers.get("Content-Length") or 0))
+        for chunk in response.iter_content(chunk_size=CHUNK_BYTES):
+            parser.feed(chunk)
+        fleet = parser.close()
+    return fleet, parser.time_position, parser.parse_seconds
+
+
+def merge_shards(parts):
+    """
+    One snapshot from per-shard (FleetSnapshot, time_position) results.
+    An aircraft seen by several (overlapping) shards keeps the row with
+    the latest time_position (unknown counts as oldest; on ties the
+    earlier shard wins). Returns (FleetSnapshot, time_position).
+    """
+    if not parts:
+        return FleetSnapshot.empty(), np.empty(0)
+    fleets = [fleet for fleet, _ in parts]
+    icao24 = np.concatenate([fleet.icao24 for fleet in fleets])
+    time_position = np.concatenate([tp for _, tp in parts])
+
+    # Freshest first within each icao24 (lexsort is stable)
+    freshness = np.where(np.isnan(time_position), -np.inf, time_position)
+    order = np.lexsort((-freshness, icao24))
+    _, first = np.unique(icao24[order], return_index=True)
+    rows = np.sort(order[first])
+
+    columns = {
+        name: np.concatenate([getattr(fleet, name) for fleet in fleets])[rows]
+        for name in ("callsign", "lat", "lon", "geo_alt", "velocity", "track")
+    }
+    stamps = [fleet.timestamp for fleet in fleets if fleet.timestamp is not None]
+    merged = FleetSnapshot(icao24[rows], **columns, timestamp=max(stamps) if stamps else None)
+    return merged, time_position[rows]
+
+
+class ShardedFetcher:
+    """
+    Fetches several bounding boxes concurrently (one thread per shard) and
+    merges them into one FleetSnapshot with aircraft de-duplicated by
+    icao24.
+
+    Every fetch() first asks each shard's ShardBudget; a shard over budget
+    (or whose request fails) is not fetched this time and its last result
+    is reused for up to max_stale seconds. fetch() raises only when no
+    shard has a usable result.
+
+    client: OpenSkyClient (or anything with states_stream(params))
+    shards: list of bbox dicts (lamin, lamax, lomin, lomax)
+    budgets: one ShardBudget per shard (default: DAILY_CREDITS shared evenly)
+    """
+
+    def __init__(self, client, shards, budgets=None, max_stale=MAX_STALE, workers=None):
+        self.client = client
+        self.shards = [dict(bbox) for bbox in shards]
+        if budgets is None:
+            budgets = [ShardBudget(DAILY_CREDITS / len(self.shards)) for _ in self.shards]
+        if len(budgets) != len(self.shards):
+            raise ValueError("Need one budget per shard")
+        self.budgets = budgets
+        self.max_stale = max_stale
+        self.time_position = np.empty(0)  # of the last merged snapshot
+        self.last_errors = {}
+        self._results = [None] * len(self.shards)  # (fleet, time_position, fetched_at)
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=workers or len(self.shards), thread_name_prefix="shard")
+
+    def close(self):
+        self._pool.shutdown(wait=False)
+
+    def fetch(self):
+        """
+        Fetch the shards allowed by their budgets and return the merged
+        snapshot. Only one fetch runs at a time.
+        """
+        with self._lock, metrics.timer("fetch"):
+            futures = {}
+            for k, bbox in enumerate(self.shards):
+                if self.budgets[k].try_spend(credit_cost(bbox)):
+                    futures[k] = self._pool.submit(fetch_shard, self.client, bbox)
+                else:
+                    metrics.count("fetch.shard_skipped")
+
+            errors = {}
+            parse_seconds = 0.0
+            for k, future in futures.items():
+                try:
+                    fleet, time_position, seconds = future.result()
+                except Exception as e:
+                    errors[k] = e
+                    metrics.count("fetch.shard_errors")
+                    continue
+                self._results[k] = (fleet, time_position, time.monotonic())
+                parse_seconds += seconds
+            self.last_errors = errors
+            metrics.add_time("parse", parse_seconds)
+
+            now = time.monotonic()
+            parts = [(fleet, tp) for fleet, tp, at in filter(None, self._results) if now - at <= self.max_stale]
+            if not parts:
+                if errors:
+                    raise next(iter(errors.values()))
+                raise RuntimeError("No shard within its credit budget")
+            merged, self.time_position = merge_shards(parts)
+        metrics.gauge("fetch.shards", len(futures))
+        return merged
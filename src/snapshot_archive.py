@@ -0,0 +1,212 @@
+import argparse
+import os
+import pickle
+import time
+
+import numpy as np
+
+from fleet import FIELDS, FleetSnapshot
+
+# On-disk dtype of each column. Strings are fixed-width ASCII (ICAO24 addresses
+# are 6 hex digits, callsigns at most 8 characters); positions keep full
+# precision, the other kinematics fit comfortably in float32.
+COLUMN_DTYPES = {
+    "icao24": "S8",
+    "callsign": "S8",
+    "lat": "<f8",
+    "lon": "<f8",
+    "geo_alt": "<f4",
+    "velocity": "<f4",
+    "track": "<f4",
+}
+
+# One index record per appended snapshot
+INDEX_DTYPE = np.dtype([
+    ("timestamp", "<f8"),
+    ("chunk", "<i4"),
+    ("offset", "<i8"),
+    ("count", "<i8"),
+])
+
+# ---------------------------
+# Columnar snapshot archive
+# ---------------------------
+class SnapshotArchive:
+    """
+    Append-only columnar store of FleetSnapshots.
+
+    Layout:
+        <path>/index.bin                 one INDEX_DTYPE record per snapshot
+        <path>/chunk_000000/<field>.bin  raw column data, rows appended
+
+    Rows of consecutive snapshots are appended to the current chunk until it
+    holds rows_per_chunk rows, then a new chunk starts. The index record is
+    written last, so a crash mid-append leaves the archive readable (the
+    partial rows are overwritten by the next append). Reads memory-map the
+    column files, so loading one snapshot or a time range never reads the
+    rest of the archive.
+    """
+
+    def __init__(self, path, rows_per_chunk=1_000_000):
+        self.path = path
+        self.rows_per_chunk = rows_per_chunk
+        self._index_path = os.path.join(path, "index.bin")
+
+    # -----------------------
+    # Index
+    # -----------------------
+    def index(self):
+        """
+        All index records (timestamp, chunk, offset, count), memory-mapped.
+        """
+        if not os.path.exists(self._index_path) or os.path.getsize(self._index_path) < INDEX_DTYPE.itemsize:
+            return np.empty(0, dtype=INDEX_DTYPE)
+        n = os.path.getsize(self._index_path) // INDEX_DTYPE.itemsize
+        return np.memmap(self._index_path, dtype=INDEX_DTYPE, mode="r", shape=(n,))
+
+    def __len__(self):
+        return len(self.index())
+
+    def timestamps(self):
+        return np.asarray(self.index()["timestamp"])
+
+    # -----------------------
+    # Writing
+    # -----------------------
+    def append(self, fleet, timestamp=None):
+        """
+        Append one snapshot. timestamp defaults to fleet.timestamp, then to
+        the current time; timestamps must not go backwards.
+        """
+        if timestamp is None:
+            timestamp = fleet.timestamp if fleet.timestamp is not None else time.time()
+        index = self.index()
+        if len(index):
+            last = index[-1]
+            if timestamp < last["timestamp"]:
+                raise ValueError("Snapshots must be appended in time order")
+            chunk, offset = int(last["chunk"]), int(last["offset"] + last["count"])
+            if offset and offset + len(fleet) > self.rows_per_chunk:
+                chunk, offset = chunk + 1, 0
+        else:
+            chunk, offset = 0, 0
+
+        # Encoded up front, so a rejected snapshot writes nothing
+        columns = {name: _encode_column(name, getattr(fleet, name)) for name in FIELDS}
+        chunk_dir = self._chunk_dir(chunk)
+        os.makedirs(chunk_dir, exist_ok=True)
+        for name in FIELDS:
+            dtype = np.dtype(COLUMN_DTYPES[name])
+            column = columns[name]
+            with open(os.path.join(chunk_dir, f"{name}.bin"), "ab") as f:
+                # Drop rows left behind by an append that never reached the index
+                f.truncate(offset * dtype.itemsize)
+                f.write(np.ascontiguousarray(column, dtype=dtype).tobytes())
+
+        record = np.array([(timestamp, chunk, offset, len(fleet))], dtype=INDEX_DTYPE)
+        os.makedirs(self.path, exist_ok=True)
+        with open(self._index_path, "ab") as f:
+            f.truncate(len(index) * INDEX_DTYPE.itemsize)
+            f.write(record.tobytes())
+
+    # -----------------------
+    # Reading
+    # -----------------------
+    def load(self, i):
+        """
+        Snapshot number i (negative indices count from the end). Float
+        position columns are memory-mapped rather than read into memory.
+        """
+        index = self.index()
+        record = index[i]
+        return self._load_record(record)
+
+    def latest(self):
+        """
+        Most recent snapshot, or None if the archive is empty.
+        """
+        return self.load(-1) if len(self) else None
+
+    def range(self, start=None, end=None):
+        """
+        Yield snapshots with start <= timestamp <= end in time order
+        (either bound may be None).
+        """
+        index = self.index()
+        ts = index["timestamp"]
+        lo = 0 if start is None else int(np.searchsorted(ts, start, side="left"))
+        hi = len(index) if end is None else int(np.searchsorted(ts, end, side="right"))
+        for k in range(lo, hi):
+            yield self._load_record(index[k])
+
+    def _load_record(self, record):
+        chunk_dir = self._chunk_dir(int(record["chunk"]))
+        offset, count = int(record["offset"]), int(record["count"])
+        columns = {}
+        for name in FIELDS:
+            dtype = np.dtype(COLUMN_DTYPES[name])
+            if count == 0:
+                values = np.empty(0, dtype=dtype)
+            else:
+                values = np.memmap(os.path.join(chunk_dir, f"{name}.bin"), dtype=dtype, mode="r",
+                                   offset=offset * dtype.itemsize, shape=(count,))
+            if dtype.kind == "S":
+                values = np.char.decode(values, "ascii")
+            columns[name] = values
+        return FleetSnapshot(**columns, timestamp=float(record["timestamp"]))
+
+    def _chunk_dir(self, chunk):
+        return os.path.join(self.path, f"chunk_{chunk:06d}")
+
+
+def _encode_column(name, column):
+    """
+    Column as stored on disk. Non-ASCII characters are replaced by '?';
+    strings longer than the column width raise ValueError rather than being
+    truncated (two icao24s could otherwise collide).
+    """
+    dtype = np.dtype(COLUMN_DTYPES[name])
+    if dtype.kind != "S":
+        return column
+    encoded = np.char.encode(column, "ascii", errors="replace")
+    too_long = np.char.str_len(encoded) > dtype.itemsize
+    if too_long.any():
+        raise ValueError(f"{name} {encoded[too_long][0].decode()!r} is longer than {dtype.itemsize} characters")
+    return encoded
+
+
+def load_pickle(path):
+    """
+    Read a legacy pickle (a raw /states/all payload such as planes_canada.pkl,
+    or a list of plane dicts from archives/planes_*.pkl) as a FleetSnapshot.
+    """
+    with open(path, "rb") as f:
+        data = pickle.load(f)
+    if isinstance(data, dict):
+        return FleetSnapshot.from_states(data.get("states"), timestamp=data.get("time"))
+    return FleetSnapshot.from_dicts(data)
+
+
+def import_pickles(archive, paths):
+    """
+    Append legacy pickles to archive in timestamp order. Pickles without a
+    timestamp use their file modification time.
+    """
+    snapshots = []
+    for path in paths:
+        fleet = load_pickle(path)
+        timestamp = fleet.timestamp if fleet.timestamp is not None else os.path.getmtime(path)
+        snapshots.append((timestamp, path, fleet))
+    snapshots.sort(key=lambda item: item[0])
+    for timestamp, _, fleet in snapshots:
+        archive.append(fleet, timestamp)
+    return len(snapshots)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Import legacy plane pickles into a columnar snapshot archive.")
+    parser.add_argument("pickles", nargs="+", help="pickle files to import")
+    parser.add_argument("--archive", default="archives", help="archive directory (default: archives)")
+    args = parser.parse_args()
+    n = import_pickles(SnapshotArchive(args.archive), args.pickles)
+    print(f"Imported {n} snapshots into {args.archive}")
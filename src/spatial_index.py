@@ -0,0 +1,162 @@
+import numpy as np
+
+# Earth radius in meters (same value as calculate_path)
+R = 6371000
+
+# Neighbor cell offsets covering each unordered pair of adjacent cells once:
+# the cell itself plus the 13 offsets that are lexicographically positive.
+_HALF_OFFSETS = [(0, 0, 0)] + [
+    (dx, dy, dz)
+    for dx in (-1, 0, 1)
+    for dy in (-1, 0, 1)
+    for dz in (-1, 0, 1)
+    if (dx, dy, dz) > (0, 0, 0)
+]
+
+# All 27 offsets of a cell's neighborhood (itself included)
+_ALL_OFFSETS = [(dx, dy, dz) for dx in (-1, 0, 1) for dy in (-1, 0, 1) for dz in (-1, 0, 1)]
+
+# ---------------------------
+# Coordinate helpers
+# ---------------------------
+def to_ecef(lat, lon):
+    """
+    Spherical earth-centered coordinates (meters) for lat/lon in degrees.
+    Returns an array of shape (N, 3).
+    """
+    phi = np.radians(np.asarray(lat, dtype=float))
+    lam = np.radians(np.asarray(lon, dtype=float))
+    cos_phi = np.cos(phi)
+    return R * np.column_stack([cos_phi * np.cos(lam), cos_phi * np.sin(lam), np.sin(phi)])
+
+
+def chord_length(arc_distance):
+    """
+    Straight-line distance between two surface points that are
+    arc_distance meters apart along the great circle.
+    """
+    return 2 * R * np.sin(np.minimum(arc_distance / (2 * R), np.pi / 2))
+
+
+def arc_length(chord):
+    """
+    Great-circle distance between two surface points chord meters apart
+    in a straight line (inverse of chord_length).
+    """
+    return 2 * R * np.arcsin(np.minimum(chord / (2 * R), 1.0))
+
+# ---------------------------
+# ECEF uniform grid
+# ---------------------------
+class ECEFGrid:
+    """
+    Uniform hash grid over ECEF positions.
+
+    Cells are cubes whose side is the chord of the cutoff radius, so every
+    pair within `radius` meters of great-circle distance lies in the same or
+    an adjacent cell. Working in ECEF avoids the lon-wrap and polar
+    singularities of a lat/lon grid.
+    """
+
+    def __init__(self, lat, lon, radius):
+        self.radius = float(radius)
+        self.cell = max(float(chord_length(self.radius)), 1.0)
+        xyz = to_ecef(lat, lon)
+        self.n = len(xyz)
+
+        # Integer cell coordinates shifted to be non-negative, packed into one key
+        span = int(np.ceil(R / self.cell)) + 2
+        self._base = 2 * span + 1
+        cells = np.floor(xyz / self.cell).astype(np.int64) + span
+        keys = (cells[:, 0] * self._base + cells[:, 1]) * self._base + cells[:, 2]
+        self._point_keys = keys
+
+        self._order = np.argsort(keys, kind='stable')
+        sorted_keys = keys[self._order]
+        self._keys, self._starts, self._counts = np.unique(
+            sorted_keys, return_index=True, return_counts=True
+        )
+
+    def _offset_key(self, dx, dy, dz):
+        return (dx * self._base + dy) * self._base + dz
+
+    def members(self, cell):
+        """
+        Point indices that fall in the given cell (position in sorted keys).
+        """
+        start = self._starts[cell]
+        return self._order[start:start + self._counts[cell]]
+
+    def _neighbors(self, offset, lo, hi):
+        """
+        For source cells lo..hi-1: (source cells, neighbor cells) at offset,
+        only where the neighbor cell is occupied.
+        """
+        n_cells = len(self._keys)
+        target = self._keys[lo:hi] + self._offset_key(*offset)
+        pos = np.searchsorted(self._keys, target)
+        pos_clipped = np.minimum(pos, n_cells - 1)
+        hit = (pos < n_cells) & (self._keys[pos_clipped] == target)
+        return np.nonzero(hit)[0] + lo, pos[hit]
+
+    def __len__(self):
+        return len(self._keys)
+
+    def cell_pairs(self, lo=0, hi=None):
+        """
+        Yield (members_a, members_b, same_cell) for every pair of adjacent
+        occupied cells, each unordered pair once. When same_cell is True both
+        arrays are the same cell and callers keep only i < j.
+
+        lo/hi restrict the first cell of each pair to positions lo..hi-1 of
+        the sorted cells, so disjoint ranges split the pairs between tiles
+        (the second cell may lie outside the range).
+        """
+        hi = len(self._keys) if hi is None else hi
+        for offset in _HALF_OFFSETS:
+            same_cell = offset == (0, 0, 0)
+            a_cells, b_cells = self._neighbors(offset, lo, hi)
+            for a, b in zip(a_cells.tolist(), b_cells.tolist()):
+                yield self.members(a), self.members(b), same_cell
+
+    def near(self, points):
+        """
+        Candidate neighbors of some of the grid's points: (p, q) index
+        arrays with one entry for every point q in the same or an adjacent
+        cell as query point p (p itself included). Covers every q within
+        `radius` of p; the work scales with the query points, not the grid.
+        """
+        points = np.asarray(points, dtype=np.int64)
+        keys = self._point_keys[points]
+        n_cells = len(self._keys)
+        out_p, out_q = [], []
+        for offset in _ALL_OFFSETS:
+            target = keys + self._offset_key(*offset)
+            pos = np.searchsorted(self._keys, target)
+            pos_clipped = np.minimum(pos, n_cells - 1)
+            hit = (pos < n_cells) & (self._keys[pos_clipped] == target)
+            cells = pos[hit]
+            counts = self._counts[cells]
+            total = int(counts.sum())
+            if not total:
+                continue
+            # Position in the sorted order of each member: its cell's start
+            # plus its rank within the cell
+            first = np.cumsum(counts) - counts
+            rank = np.arange(total) - np.repeat(first, counts)
+            out_p.append(np.repeat(points[hit], counts))
+            out_q.append(self._order[np.repeat(self._starts[cells], counts) + rank])
+        if not out_p:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+        return np.concatenate(out_p), np.concatenate(out_q)
+
+    def cell_work(self):
+        """
+        Estimated pair tests owned by each occupied cell (sum over its
+        cell_pairs of |a| * |b|), for balancing tiles.
+        """
+        work = np.zeros(len(self._keys))
+        for offset in _HALF_OFFSETS:
+            a_cells, b_cells = self._neighbors(offset, 0, len(self._keys))
+            work[a_cells] += self._counts[a_cells] * self._counts[b_cells]
+        return work
@@ -0,0 +1,313 @@
+import json
+import re
+import time
+
+import numpy as np
+
+from fleet import FleetSnapshot
+
+# Fields of an OpenSky state vector used here (index into each state)
+ICAO24, CALLSIGN, TIME_POSITION, LON, LAT, ON_GROUND, VELOCITY, TRACK, GEO_ALT = 0, 1, 3, 5, 6, 8, 9, 10, 13
+
+# Payload bytes decoded per batch; bounds the transient Python objects
+CHUNK_BYTES = 1 << 18
+
+# Payloads up to this size are decoded whole (one json.loads, as
+# response.json()). On the synthetic fixture streaming is no faster below
+# ~20,000 states (about 2.7 MB); it traces less memory from ~5,000 states,
+# but under 2 MB the whole decode peaks at about 12 MB anyway
+WHOLE_PAYLOAD_BYTES = 1 << 21
+
+# Slightly less than the size of one compact state vector in the payload,
+# so columns sized from Content-Length rarely need to grow
+STATE_BYTES = 120
+
+STATES_KEY = re.compile(rb'"states"\s*:\s*')
+TIME_KEY = re.compile(rb'"time"\s*:\s*(-?\d+)')
+# Boundary between two consecutive state vectors. A state holds scalars
+# and one flat list of sensor ids followed by a number, and strings
+# (icao24, callsign, country) never contain brackets, so this only
+# matches between states
+SEPARATOR = re.compile(rb'\]\s*,\s*\[')
+# End of the states array (end of the last state, then of the array)
+STATES_END = re.compile(rb'\]\s*\]')
+
+# ---------------------------
+# Column buffers
+# ---------------------------
+class StateColumns:
+    """
+    Preallocated FleetSnapshot columns (plus each state's time_position),
+    grown by doubling. Batches are written straight into them, so no
+    per-aircraft objects outlive their batch.
+    """
+
+    def __init__(self, capacity=1024):
+        capacity = max(int(capacity), 1)
+        self.n = 0
+        self.icao24 = np.empty(capacity, dtype="U6")
+        self.callsign = np.empty(capacity, dtype="U8")
+        self.floats = {name: np.empty(capacity)
+                       for name in ("lat", "lon", "geo_alt", "velocity", "track", "time_position")}
+
+    def append(self, icao24, callsign, **floats):
+        end = self.n + len(icao24)
+        if end > len(self.icao24):
+            self._grow(max(end, 2 * len(self.icao24)))
+        self.icao24 = _fit(self.icao24, icao24)
+        self.callsign = _fit(self.callsign, callsign)
+        self.icao24[self.n:end] = icao24
+        self.callsign[self.n:end] = callsign
+        for name, values in floats.items():
+            self.floats[name][self.n:end] = values
+        self.n = end
+
+    def _grow(self, capacity):
+        def grown(column):
+            new = np.empty(capacity, dtype=column.dtype)
+            new[:self.n] = column[:self.n]
+            return new
+        self.icao24 = grown(self.icao24)
+        self.callsign = grown(self.callsign)
+        self.floats = {name: grown(column) for name, column in self.floats.items()}
+
+    def _trim(self, column):
+        # View of the filled rows; copied (releasing the spare capacity)
+        # only when more than a quarter of it is unused
+        if 4 * self.n < 3 * len(self.icao24):
+            return column[:self.n].copy()
+        return column[:self.n]
+
+    def snapshot(self, timestamp=None):
+        return FleetSnapshot(
+            self._trim(self.icao24), self._trim(self.callsign),
+            **{name: self._trim(column) for name, column in self.floats.items() if name != "time_position"},
+            timestamp=timestamp
+        )
+
+    def time_position(self):
+        """
+        Seconds since the epoch of each row's last position report (NaN
+        if unknown).
+        """
+        return self._trim(self.floats["time_position"])
+
+
+def _fit(column, values):
+    """
+    column widened to hold the strings in values (a rare icao24/callsign
+    longer than usual), else column itself.
+    """
+    if values.dtype.itemsize > column.dtype.itemsize:
+        return column.astype(values.dtype)
+    return column
+
+# ---------------------------
+# Batch normalization
+# ---------------------------
+def _objects(values):
+    return np.array(values, dtype=object)
+
+
+def _floats(values):
+    """
+    Float column with null as NaN.
+    """
+    try:
+        return np.array(values, dtype=float)
+    except TypeError:
+        column = _objects(values)
+        column[np.equal(column, None)] = np.nan
+        return column.astype(float)
+
+
+def batch_columns(states):
+    """
+    Normalized columns of the airborne states in one batch, with the same
+    rules as FleetSnapshot.from_states.
+    """
+    fields = list(zip(*states))
+    airborne = ~_objects(fields[ON_GROUND]).astype(bool)
+
+    callsign = _objects(fields[CALLSIGN])
+    callsign[np.equal(callsign, None)] = ""
+    geo_alt = _floats(fields[GEO_ALT])
+    velocity = _floats(fields[VELOCITY])
+    track = _floats(fields[TRACK])
+    # Missing (or zero) altitude and track read as 0; no speed without a track
+    geo_alt[np.isnan(geo_alt)] = 0
+    velocity[np.isnan(velocity) | np.isnan(track) | (track == 0)] = 0
+    track[np.isnan(track)] = 0
+
+    return {
+        "icao24": np.array(fields[ICAO24], dtype=str)[airborne],
+        "callsign": callsign[airborne].astype(str),
+        "lat": _floats(fields[LAT])[airborne],
+        "lon": _floats(fields[LON])[airborne],
+        "geo_alt": geo_alt[airborne],
+        "velocity": velocity[airborne],
+        "track": track[airborne],
+        "time_position": _floats(fields[TIME_POSITION])[airborne],
+    }
+
+# ---------------------------
+# Streaming parser
+# ---------------------------
+class StateStreamParser:
+    """
+    Incremental parser for a /states/all payload.
+
+    feed() it the body as it arrives (any chunk sizes); whenever chunk_bytes
+    of state vectors are buffered, the complete ones are decoded as one
+    batch, normalized, and their airborne rows appended to StateColumns.
+    close() decodes the rest and returns the FleetSnapshot (timestamp from
+    the payload's "time"); time_position then holds each row's last
+    position report time. Memory is one batch of decoded states plus the
+    compact columns, instead of the whole decoded payload.
+
+    Payloads of at most whole_bytes are buffered and decoded whole in
+    close() instead, which is faster for them; streaming starts once more
+    than whole_bytes have arrived (or right away if expected_bytes says
+    so).
+
+    expected_bytes: payload size if known (Content-Length), used to
+                    preallocate the columns
+    """
+
+    def __init__(self, expected_bytes=None, chunk_bytes=CHUNK_BYTES, whole_bytes=WHOLE_PAYLOAD_BYTES):
+        self.chunk_bytes = chunk_bytes
+        self.whole_bytes = whole_bytes
+        self.capacity = (expected_bytes or 0) // STATE_BYTES or 1024
+        self.columns = None  # allocated once streaming starts
+        self.timestamp = None
+        self.time_position = None
+        self.parse_seconds = 0.0
+        self.streamed = False
+        if (expected_bytes or 0) > whole_bytes:
+            self._start_streaming()
+        self._chunks = []  # body so far, until streaming starts
+        self._received = 0
+        self._buffer = bytearray()
+        self._mode = "head"  # head -> states -> tail
+
+    def feed(self, data):
+        if not self.streamed:
+            self._chunks.append(data)
+            self._received += len(data)
+            if self._received <= self.whole_bytes:
+                return
+            self._start_streaming()
+            data = b"".join(self._chunks)
+            self._chunks = []
+        self._buffer += data
+        if len(self._buffer) >= self.chunk_bytes:
+            t0 = time.perf_counter()
+            self._drain()
+            self.parse_seconds += time.perf_counter() - t0
+
+    def _start_streaming(self):
+        self.streamed = True
+        self.columns = StateColumns(self.capacity)
+
+    def close(self):
+        t0 = time.perf_counter()
+        if self.streamed:
+            self._close_stream()
+            self.time_position = self.columns.time_position()
+            fleet = self.columns.snapshot(self.timestamp)
+        else:
+            fleet = self._decode_whole()
+        self._buffer = bytearray()
+        self.parse_seconds += time.perf_counter() - t0
+        return fleet
+
+    def _decode_whole(self):
+        # Same as response.json() plus FleetSnapshot.from_states
+        data = json.loads(b"".join(self._chunks))
+        self._chunks = []
+        if not isinstance(data, dict) or "states" not in data:
+            raise ValueError("No 'states' in the /states/all payload")
+        airborne = [state for state in data["states"] or [] if not state[ON_GROUND]]
+        self.timestamp = data.get("time")
+        self.time_position = _floats([state[TIME_POSITION] for state in airborne])
+        return FleetSnapshot.from_states(airborne, timestamp=self.timestamp)
+
+    def _close_stream(self):
+        self._drain()
+        tail = self._buffer
+        if self._mode == "states":
+            # Last states, the closing bracket and anything after the array
+            if tail.lstrip().startswith(b"]"):  # "states": []
+                tail = tail[tail.index(b"]") + 1:]
+            else:
+                m = STATES_END.search(tail)
+                if m is None:
+                    raise ValueError("Truncated /states/all payload")
+                self._append(json.loads(b"[" + tail[:m.start() + 1] + b"]"))
+                tail = tail[m.end():]
+            self._mode = "tail"
+        elif self._mode == "head":
+            raise ValueError("No 'states' in the /states/all payload")
+        self._find_time(tail)
+
+    def _drain(self):
+        buf = self._buffer
+        if self._mode == "head":
+            m = STATES_KEY.search(buf)
+            if m is None or m.end() >= len(buf):
+                return
+            self._find_time(buf[:m.start()])
+            rest = buf[m.end():m.end() + 1]
+            if rest == b"[":
+                del buf[:m.end() + 1]
+                self._mode = "states"
+            else:  # "states": null (nothing in the box)
+                del buf[:m.end()]
+                self._mode = "tail"
+                return
+
+        if self._mode != "states":
+            return
+        while len(buf) >= self.chunk_bytes:
+            last = None
+            for last in SEPARATOR.finditer(buf, 0, self.chunk_bytes):
+                pass
+            if last is None:
+                if len(buf) < 2 * self.chunk_bytes:
+                    return
+                # No boundary in a whole chunk: search the full buffer
+                for last in SEPARATOR.finditer(buf):
+                    pass
+                if last is None:
+                    return
+            self._append(json.loads(b"[" + buf[:last.start() + 1] + b"]"))
+            del buf[:last.end() - 1]
+
+    def _append(self, states):
+        if states:
+            self.columns.append(**batch_columns(states))
+
+    def _find_time(self, text):
+        m = TIME_KEY.search(text)
+        if m is not None and self.timestamp is None:
+            self.timestamp = int(m.group(1))
+
+
+def parse_states(chunks, expected_bytes=None, chunk_bytes=CHUNK_BYTES, whole_bytes=WHOLE_PAYLOAD_BYTES):
+    """
+    FleetSnapshot of the airborne aircraft in a /states/all payload given
+    as an iterable of byte chunks (e.g. response.iter_content()).
+    """
+    parser = StateStreamParser(expected_bytes, chunk_bytes, whole_bytes)
+    for chunk in chunks:
+        parser.feed(chunk)
+    return parser.close()
+
+
+def iter_bytes(data, size=1 << 16):
+    """
+    A bytes payload as chunks of size bytes (fixture payloads, tests).
+    """
+    view = memoryview(data)
+    for start in range(0, len(data), size):
+        yield view[start:start + size]
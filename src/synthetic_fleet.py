@@ -0,0 +1,79 @@
+import numpy as np
+
+from fleet import FleetSnapshot
+
+# (lat_min, lat_max, lon_min, lon_max)
+CANADA_BBOX = (40.0, 85.0, -150.0, -50.0)
+WORLD_BBOX = (-60.0, 75.0, -180.0, 180.0)
+
+# Major airports (lat, lon) used as traffic hubs
+HUBS = np.array([
+    (43.68, -79.63), (45.47, -73.74), (49.19, -123.18), (51.13, -114.01),
+    (53.31, -113.58), (49.91, -97.24), (44.88, -63.51), (47.45, -122.31),
+    (40.64, -73.78), (41.98, -87.90), (42.36, -71.01), (61.17, -149.99),
+    (51.47, -0.45), (49.01, 2.55), (50.04, 8.56), (52.31, 4.76),
+    (55.97, 37.41), (25.25, 55.36), (1.36, 103.99), (35.55, 139.78),
+    (22.31, 113.92), (-33.95, 151.18), (-23.43, -46.47), (33.94, -118.41),
+    (33.64, -84.43), (19.44, -99.07), (28.57, 77.10), (40.08, 116.58),
+])
+
+# Share of aircraft near a hub (climbing, descending or holding)
+HUB_SHARE = 0.3
+
+# ---------------------------
+# Synthetic fleet generator
+# ---------------------------
+def synthetic_fleet(n, seed=0, bbox=CANADA_BBOX, timestamp=None):
+    """
+    Seeded synthetic FleetSnapshot with realistic distributions.
+
+    - Positions: ~70% en-route, spread uniformly over the sphere inside
+      bbox (area-weighted, so high latitudes are not oversampled); ~30%
+      within ~150 km of a hub inside bbox.
+    - Altitude: en-route aircraft cruise around FL350 (10.5 km +- 1 km);
+      hub traffic is spread between 300 m and 7 km.
+    - Velocity: ~240 m/s at cruise, slower when low (~110-200 m/s).
+    - Track: en-route traffic follows two opposing flows (east/west-bound
+      +- 25 deg), hub traffic is uniform.
+    """
+    rng = np.random.default_rng(seed)
+    lat_min, lat_max, lon_min, lon_max = bbox
+
+    hubs = HUBS[
+        (HUBS[:, 0] >= lat_min) & (HUBS[:, 0] <= lat_max)
+        & (HUBS[:, 1] >= lon_min) & (HUBS[:, 1] <= lon_max)
+    ]
+    n_hub = int(round(n * HUB_SHARE)) if len(hubs) else 0
+    n_route = n - n_hub
+
+    # En-route: area-uniform latitude via sin(lat)
+    s = rng.uniform(np.sin(np.radians(lat_min)), np.sin(np.radians(lat_max)), n_route)
+    route_lat = np.degrees(np.arcsin(s))
+    route_lon = rng.uniform(lon_min, lon_max, n_route)
+    route_alt = np.clip(rng.normal(10500, 1000, n_route), 7000, 13000)
+    route_vel = np.clip(rng.normal(240, 15, n_route), 180, 290)
+    flow = rng.choice([90.0, 270.0], n_route)
+    route_track = np.mod(flow + rng.uniform(-25, 25, n_route), 360)
+
+    # Hub traffic: offsets of up to ~1.5 deg around a random hub
+    hub = hubs[rng.integers(0, len(hubs), n_hub)] if n_hub else np.empty((0, 2))
+    radius = 1.5 * np.sqrt(rng.uniform(0, 1, n_hub))
+    angle = rng.uniform(0, 2 * np.pi, n_hub)
+    hub_lat = np.clip(hub[:, 0] + radius * np.cos(angle), lat_min, lat_max)
+    hub_lon = hub[:, 1] + radius * np.sin(angle) / np.cos(np.radians(hub[:, 0]))
+    hub_lon = np.clip(hub_lon, lon_min, lon_max)
+    hub_alt = rng.uniform(300, 7000, n_hub)
+    hub_vel = 110 + hub_alt / 7000 * 90 + rng.normal(0, 10, n_hub)
+    hub_track = rng.uniform(0, 360, n_hub)
+
+    order = rng.permutation(n)
+    return FleetSnapshot(
+        [f"{k:06x}" for k in range(n)],
+        [f"SYN{k}" for k in range(n)],
+        np.concatenate([route_lat, hub_lat])[order],
+        np.concatenate([route_lon, hub_lon])[order],
+        np.concatenate([route_alt, hub_alt])[order],
+        np.concatenate([route_vel, hub_vel])[order],
+        np.concatenate([route_track, hub_track])[order],
+        timestamp=timestamp
+    )
@@ -0,0 +1,284 @@
+import math
+import os
+from collections import OrderedDict
+
+import numpy as np
+
+from visibility_graph import R
+
+# No terrain rises above this (meters); ray samples higher up skip the lookup
+MAX_TERRAIN = 8850.0
+
+# SRTM void marker
+VOID = -32768
+
+# Spacing (meters) of the coarse pass that skips links far from any tile;
+# well under the smallest cell width next to a covered cell below 60N
+COARSE_STEP = 10000.0
+
+# ---------------------------
+# DEM tiles
+# ---------------------------
+def tile_name(lat0, lon0):
+    """
+    SRTM file name of the 1x1 degree tile whose south-west corner is
+    (lat0, lon0), e.g. N45W076.hgt.
+    """
+    ns = "N" if lat0 >= 0 else "S"
+    ew = "E" if lon0 >= 0 else "W"
+    return f"{ns}{abs(lat0):02d}{ew}{abs(lon0):03d}.hgt"
+
+
+class DEMTiles:
+    """
+    Elevation lookups over a directory of SRTM .hgt tiles.
+
+    Each tile is a square grid of big-endian int16 heights (1201x1201 for
+    3 arc-second, 3601x3601 for 1 arc-second data), first row at the north
+    edge. Tiles are memory-mapped on first use and at most max_tiles stay
+    open (least recently used are dropped). Missing tiles (e.g. ocean) and
+    voids read as sea level.
+    """
+
+    def __init__(self, directory, max_tiles=64):
+        self.directory = directory
+        self.max_tiles = max_tiles
+        self._tiles = OrderedDict()
+        self.counters = {"hits": 0, "misses": 0, "evictions": 0, "missing": 0}
+        self.rescan()
+
+    def rescan(self):
+        """
+        Index the tile files present in the directory (call after adding
+        tiles). Points outside them are sea level without touching disk.
+        """
+        keys = []
+        names = os.listdir(self.directory) if os.path.isdir(self.directory) else []
+        for name in names:
+            key = _parse_tile_name(name)
+            if key is not None:
+                keys.append(_tile_key(*key))
+        self._available = np.unique(np.array(keys, dtype=np.int64))
+
+        # 1x1 degree cells that have a tile or touch one (lon wraps)
+        covered = np.zeros(180 * 360, dtype=bool)
+        covered[self._available] = True
+        covered = covered.reshape(180, 360)
+        grown = covered.copy()
+        for dlat in (-1, 0, 1):
+            for dlon in (-1, 0, 1):
+                shifted = np.roll(covered, dlon, axis=1)
+                if dlat > 0:
+                    grown[dlat:] |= shifted[:-dlat]
+                elif dlat < 0:
+                    grown[:dlat] |= shifted[-dlat:]
+                else:
+                    grown |= shifted
+        self._near_tiles = grown
+
+    def near_tiles(self, lat, lon):
+        """
+        True for points in or next to a cell that has a tile; elsewhere
+        the terrain is sea level for at least one cell around.
+        """
+        lat0 = np.clip(np.floor(lat).astype(np.int64) + 90, 0, 179)
+        lon0 = np.floor(np.mod(np.asarray(lon) + 180, 360)).astype(np.int64) % 360
+        return self._near_tiles[lat0, lon0]
+
+    def __len__(self):
+        return len(self._tiles)
+
+    def tile(self, lat0, lon0):
+        """
+        Memory-mapped heights of one tile, or None if there is no file.
+        """
+        key = (lat0, lon0)
+        if key in self._tiles:
+            self._tiles.move_to_end(key)
+            self.counters["hits"] += 1
+            return self._tiles[key]
+
+        self.counters["misses"] += 1
+        path = os.path.join(self.directory, tile_name(lat0, lon0))
+        if _tile_key(lat0, lon0) in self._available and os.path.exists(path):
+            n = math.isqrt(os.path.getsize(path) // 2)
+            heights = np.memmap(path, dtype=">i2", mode="r", shape=(n, n))
+        else:
+            self.counters["missing"] += 1
+            heights = None
+        self._tiles[key] = heights
+        while len(self._tiles) > self.max_tiles:
+            self._tiles.popitem(last=False)
+            self.counters["evictions"] += 1
+        return heights
+
+    def elevation(self, lat, lon):
+        """
+        Terrain height (meters) at each point, bilinearly interpolated.
+        Points are sorted by tile so each tile is visited once.
+        """
+        lat = np.asarray(lat, dtype=float)
+        lon = np.mod(np.asarray(lon, dtype=float) + 180, 360) - 180
+        out = np.zeros(lat.shape)
+        if not lat.size:
+            return out
+
+        flat_lat, flat_lon, flat_out = lat.ravel(), lon.ravel(), out.reshape(-1)
+        keys = _tile_key(np.floor(flat_lat).astype(np.int64), np.floor(flat_lon).astype(np.int64))
+        covered = np.nonzero(np.isin(keys, self._available))[0]
+        if not len(covered):
+            return out
+        order = covered[np.argsort(keys[covered], kind='stable')]
+        tiles, starts = np.unique(keys[order], return_index=True)
+        ends = np.append(starts[1:], len(order))
+        for key, start, end in zip(tiles.tolist(), starts.tolist(), ends.tolist()):
+            heights = self.tile(key // 360 - 90, key % 360 - 180)
+            if heights is None:
+                continue
+            sel = order[start:end]
+            flat_out[sel] = _bilinear(heights, key // 360 - 89 - flat_lat[sel], flat_lon[sel] - (key % 360 - 180))
+        return out
+
+
+def _tile_key(lat0, lon0):
+    return (lat0 + 90) * 360 + (lon0 + 180)
+
+
+def _parse_tile_name(name):
+    """
+    (lat0, lon0) of an SRTM tile file name such as N45W076.hgt, else None.
+    """
+    stem, ext = os.path.splitext(name)
+    if ext.lower() != ".hgt" or len(stem) != 7 or stem[0] not in "NSns" or stem[3] not in "EWew":
+        return None
+    try:
+        lat0, lon0 = int(stem[1:3]), int(stem[4:7])
+    except ValueError:
+        return None
+    return (lat0 if stem[0] in "Nn" else -lat0), (lon0 if stem[3] in "Ee" else -lon0)
+
+
+def _bilinear(heights, down, right):
+    """
+    Sample a tile at fractional offsets from its north-west corner
+    (down/right in degrees, 0..1).
+    """
+    n = heights.shape[0]
+    r = np.clip(down * (n - 1), 0, n - 1)
+    c = np.clip(right * (n - 1), 0, n - 1)
+    r0 = np.minimum(np.floor(r).astype(np.int64), n - 2)
+    c0 = np.minimum(np.floor(c).astype(np.int64), n - 2)
+    fr, fc = r - r0, c - c0
+
+    def at(rr, cc):
+        h = np.asarray(heights[rr, cc], dtype=float)
+        return np.where(h == VOID, 0.0, h)
+
+    top = at(r0, c0) * (1 - fc) + at(r0, c0 + 1) * fc
+    bottom = at(r0 + 1, c0) * (1 - fc) + at(r0 + 1, c0 + 1) * fc
+    return top * (1 - fr) + bottom * fr
+
+# ---------------------------
+# Terrain LOS predicate
+# ---------------------------
+class TerrainLOS:
+    """
+    LOS predicate that rejects links blocked by terrain.
+
+    Called as predicate(lat, lon, geo_alt, i, j) on the edges that already
+    passed the geometric horizon test; returns a boolean mask of the links
+    that stay. The straight ray between the two aircraft is sampled every
+    step meters (at most max_samples points); a link is blocked if any
+    sample is less than clearance meters above the terrain under it.
+    Only the stretch of the ray below the highest terrain on earth
+    (solved in closed form) is sampled, so links that stay high cost
+    almost nothing.
+
+    dem: DEMTiles (or anything with an elevation(lat, lon) method)
+    """
+
+    def __init__(self, dem, step=1000.0, max_samples=256, clearance=0.0, batch_size=4096):
+        self.dem = dem
+        self.step = step
+        self.max_samples = max_samples
+        self.clearance = clearance
+        self.batch_size = batch_size
+
+    def __call__(self, lat, lon, geo_alt, i, j):
+        lat = np.asarray(lat, dtype=float)
+        lon = np.asarray(lon, dtype=float)
+        alt = np.nan_to_num(np.asarray(geo_alt, dtype=float))
+        alt = np.maximum(alt, 0.0)
+        i = np.asarray(i, dtype=np.int64)
+        j = np.asarray(j, dtype=np.int64)
+
+        keep = np.ones(len(i), dtype=bool)
+        for start in range(0, len(i), self.batch_size):
+            a, b = i[start:start + self.batch_size], j[start:start + self.batch_size]
+            keep[start:start + len(a)] = self._clear(lat, lon, alt, a, b)
+        return keep
+
+    def _ground_points(self, pa, u, f0, f1, span, step):
+        count = np.clip(np.ceil(span / step).astype(np.int64) + 1, 2, None)
+        k = np.arange(int(count.max()))
+        frac = f0[:, None] + (f1 - f0)[:, None] * np.minimum(k[None, :] / (count[:, None] - 1), 1.0)
+        p = pa[:, None, :] + frac[..., None] * u[:, None, :]
+        return (np.degrees(np.arctan2(p[..., 2], np.hypot(p[..., 0], p[..., 1]))),
+                np.degrees(np.arctan2(p[..., 1], p[..., 0])))
+
+    def _clear(self, lat, lon, alt, a, b):
+        pa = _ecef(lat[a], lon[a], alt[a])
+        u = _ecef(lat[b], lon[b], alt[b]) - pa
+        clear = np.ones(len(a), dtype=bool)
+
+        # Stretch of the ray (fractions f0..f1 of the way from a to b) lying
+        # below the highest terrain: |pa + f u| = R + MAX_TERRAIN
+        top = R + MAX_TERRAIN + self.clearance
+        qa = np.einsum('ij,ij->i', u, u)
+        qb = 2 * np.einsum('ij,ij->i', pa, u)
+        qc = np.einsum('ij,ij->i', pa, pa) - top * top
+        disc = qb * qb - 4 * qa * qc
+        root = np.sqrt(np.maximum(disc, 0.0))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            f0 = np.maximum((-qb - root) / (2 * qa), 0.0)
+            f1 = np.minimum((-qb + root) / (2 * qa), 1.0)
+        low = (disc > 0) & (qa > 0) & (f1 > f0)
+        if not low.any():
+            return clear
+
+        rows = np.nonzero(low)[0]
+        f0, f1 = f0[rows], f1[rows]
+        span = (f1 - f0) * np.sqrt(qa[rows])
+
+        # Coarse pass: links whose low stretch never comes near a DEM tile
+        # cannot be blocked
+        if hasattr(self.dem, "near_tiles"):
+            lat_c, lon_c = self._ground_points(pa[rows], u[rows], f0, f1, span, COARSE_STEP)
+            near = self.dem.near_tiles(lat_c, lon_c).any(axis=1)
+            rows, f0, f1, span = rows[near], f0[near], f1[near], span[near]
+            if not len(rows):
+                return clear
+
+        # Sample that stretch about every step meters
+        count = np.clip(np.ceil(span / self.step).astype(np.int64) + 1, 2, self.max_samples)
+        k = np.arange(int(count.max()))
+        frac = f0[:, None] + (f1 - f0)[:, None] * np.minimum(k[None, :] / (count[:, None] - 1), 1.0)
+
+        p = pa[rows, None, :] + frac[..., None] * u[rows, None, :]
+        dist = np.sqrt((qa[rows, None] * frac + qb[rows, None]) * frac + (qc[rows] + top * top)[:, None])
+        ground = self.dem.elevation(np.degrees(np.arcsin(np.clip(p[..., 2] / dist, -1, 1))),
+                                    np.degrees(np.arctan2(p[..., 1], p[..., 0])))
+        # Only terrain above sea level counts (the smooth-earth horizon was
+        # already decided by the geometric test), and the endpoints
+        # themselves never block their own link
+        blocked = (ground > 0) & (dist - R < ground + self.clearance) & (frac > 0.0) & (frac < 1.0)
+        clear[rows] = ~blocked.any(axis=1)
+        return clear
+
+
+def _ecef(lat, lon, alt):
+    phi = np.radians(lat)
+    lam = np.radians(lon)
+    r = R + alt
+    cos_phi = np.cos(phi)
+    return np.column_stack([r * cos_phi * np.cos(lam), r * cos_phi * np.sin(lam), r * np.sin(phi)])
@@ -0,0 +1,283 @@
+import math
+import threading
+import time
+
+import numpy as np
+
+from calculate_path import extrapolate_positions
+from fleet import FleetSnapshot
+from visibility_graph import R
+
+# Measurement noise: position (m) and velocity (m/s) standard deviations
+POSITION_STD = 150.0
+VELOCITY_STD = 5.0
+
+# Process noise: white acceleration standard deviation (m/s^2)
+ACCEL_STD = 1.0
+
+# Variance standing in for "not measured" (e.g. missing velocity/track)
+UNMEASURED = 1e12
+
+# Tracks without a measurement for this long (seconds) are dropped
+MAX_AGE = 300.0
+
+# Positions are predicted at most this far (seconds) past the last measurement
+MAX_COAST = 120.0
+
+# An update's correction is blended in over this many seconds (no jumps)
+BLEND_SECONDS = 5.0
+
+# A measurement this far (m) from the prediction restarts the track
+REINIT_DISTANCE = 20000.0
+
+# ---------------------------
+# Track store
+# ---------------------------
+class TrackStore:
+    """
+    Filtered kinematic state per aircraft (keyed by icao24), kept across
+    polls.
+
+    Every track runs a constant-velocity Kalman filter over
+    [east, north, v_east, v_north] in a local frame anchored at its
+    filtered position, which moves with the track after every update.
+    update() folds a whole FleetSnapshot in with one vectorized
+    predict/update step. at(t) predicts every track to time t along its
+    filtered velocity (great-circle), so positions between polls are
+    smooth. The correction of each update is blended in over
+    BLEND_SECONDS instead of jumping.
+    """
+
+    def __init__(self, position_std=POSITION_STD, velocity_std=VELOCITY_STD, accel_std=ACCEL_STD,
+                 max_age=MAX_AGE, max_coast=MAX_COAST, blend_seconds=BLEND_SECONDS):
+        self.position_var = position_std ** 2
+        self.velocity_var = velocity_std ** 2
+        self.accel_var = accel_std ** 2
+        self.max_age = max_age
+        self.max_coast = max_coast
+        self.blend_seconds = blend_seconds
+        self._lock = threading.Lock()
+        self._source_id = None
+        self._frame = None
+        self._offsets = None
+        self._set_tracks(_empty_tracks())
+
+    def __len__(self):
+        return len(self._tracks["icao24"])
+
+    def _set_tracks(self, tracks):
+        order = np.argsort(tracks["icao24"], kind="stable")
+        self._tracks = {name: column[order] for name, column in tracks.items()}
+        self._frame = None
+
+    # -----------------------
+    # Filter update
+    # -----------------------
+    def update(self, fleet, timestamp=None):
+        """
+        Fold in one snapshot measured at timestamp (default
+        fleet.timestamp, then now). Aircraft without a position are
+        skipped; measurements older than a track's state are ignored.
+        """
+        t = timestamp if timestamp is not None else fleet.timestamp
+        t = float(t if t is not None else time.time())
+        measured = np.isfinite(fleet.lat) & np.isfinite(fleet.lon)
+        icao24 = fleet.icao24[measured]
+        lat, lon = fleet.lat[measured], fleet.lon[measured]
+        geo_alt, callsign = fleet.geo_alt[measured], fleet.callsign[measured]
+        speed, track = fleet.velocity[measured], fleet.track[measured]
+        moving = np.isfinite(speed) & np.isfinite(track)
+        track_rad = np.radians(np.where(moving, track, 0.0))
+        v_e = np.where(moving, speed * np.sin(track_rad), 0.0)
+        v_n = np.where(moving, speed * np.cos(track_rad), 0.0)
+
+        tracks = self._tracks
+        n = len(tracks["icao24"])
+        pos = np.clip(np.searchsorted(tracks["icao24"], icao24), 0, max(n - 1, 0))
+        known = (pos < n) & (tracks["icao24"][pos] == icao24) if n else np.zeros(len(icao24), dtype=bool)
+        rows, m = pos[known], np.nonzero(known)[0]
+        fresh = t > tracks["t"][rows]
+        rows, m = rows[fresh], m[fresh]
+
+        # Predict matched tracks to t
+        dt = t - tracks["t"][rows]
+        pred_lat, pred_lon = self._predict(rows, dt)
+        cov = _propagate(tracks["cov"][rows], dt, self.accel_var)
+
+        # Innovation in meters / m/s; far-off measurements restart the track
+        y = np.column_stack([
+            np.radians(_wrap(lon[m] - pred_lon)) * R * np.cos(np.radians(pred_lat)),
+            np.radians(lat[m] - pred_lat) * R,
+            v_e[m] - tracks["v_e"][rows],
+            v_n[m] - tracks["v_n"][rows],
+        ])
+        restart = np.hypot(y[:, 0], y[:, 1]) > REINIT_DISTANCE
+        noise = self._measurement_var(moving[m])
+        gain, cov = _kalman_gain(cov, noise)
+        step = np.einsum('nij,nj->ni', gain, y)
+
+        new_lat = pred_lat + np.degrees(step[:, 1] / R)
+        new_lon = _wrap(pred_lon + np.degrees(step[:, 0] / (R * np.maximum(np.cos(np.radians(pred_lat)), 1e-6))))
+        # What was on screen at t, relative to the new estimate
+        decay = self._decay(dt)[:, None]
+        correction = tracks["correction"][rows] * decay - step[:, :2]
+
+        updated = {
+            "lat": np.where(restart, lat[m], new_lat),
+            "lon": np.where(restart, lon[m], new_lon),
+            "v_e": np.where(restart, v_e[m], tracks["v_e"][rows] + step[:, 2]),
+            "v_n": np.where(restart, v_n[m], tracks["v_n"][rows] + step[:, 3]),
+            "cov": np.where(restart[:, None, None], self._initial_cov(moving[m]), cov),
+            "correction": np.where(restart[:, None], 0.0, correction),
+        }
+        for name, values in updated.items():
+            tracks[name][rows] = values
+        tracks["t"][rows] = t
+        tracks["geo_alt"][rows] = geo_alt[m]
+        tracks["callsign"][rows] = callsign[m]
+
+        # New aircraft start at their measurement; stale tracks are dropped
+        new = np.nonzero(~known)[0]
+        keep = tracks["t"] >= t - self.max_age
+        merged = {name: column[keep] for name, column in tracks.items()}
+        if len(new):
+            added = {
+                "icao24": icao24[new], "callsign": callsign[new],
+                "lat": lat[new], "lon": lon[new], "geo_alt": geo_alt[new],
+                "v_e": v_e[new], "v_n": v_n[new], "t": np.full(len(new), t),
+                "cov": self._initial_cov(moving[new]),
+                "correction": np.zeros((len(new), 2)),
+            }
+            merged = {name: np.concatenate([merged[name], added[name]]) for name in merged}
+        self._set_tracks(merged)
+
+    def _measurement_var(self, moving):
+        noise = np.empty((len(moving), 4))
+        noise[:, :2] = self.position_var
+        noise[:, 2:] = np.where(moving, self.velocity_var, UNMEASURED)[:, None]
+        return noise
+
+    def _initial_cov(self, moving):
+        return np.einsum('ni,ij->nij', self._measurement_var(moving), np.eye(4))
+
+    def _decay(self, dt):
+        if not self.blend_seconds:
+            return np.zeros_like(dt)
+        return np.clip(1 - dt / self.blend_seconds, 0.0, 1.0)
+
+    def _predict(self, rows, dt):
+        tracks = self._tracks
+        v_e, v_n = tracks["v_e"][rows], tracks["v_n"][rows]
+        speed = np.hypot(v_e, v_n)
+        heading = np.degrees(np.arctan2(v_e, v_n)) % 360
+        return extrapolate_positions(tracks["lat"][rows], tracks["lon"][rows], speed, heading, dt, 'spherical')
+
+    # -----------------------
+    # Interpolated positions
+    # -----------------------
+    def at(self, t):
+        """
+        FleetSnapshot of every track predicted to time t (seconds since
+        the epoch), at most max_coast past its last measurement.
+        Velocity and track are the filtered estimates.
+        """
+        tracks = self._tracks
+        rows = np.arange(len(tracks["icao24"]))
+        since = np.maximum(t - tracks["t"], 0.0)
+        lat, lon = self._predict(rows, np.minimum(since, self.max_coast))
+
+        offset = tracks["correction"] * self._decay(since)[:, None]
+        lat = lat + np.degrees(offset[:, 1] / R)
+        lon = _wrap(lon + np.degrees(offset[:, 0] / (R * np.maximum(np.cos(np.radians(lat)), 1e-6))))
+
+        v_e, v_n = tracks["v_e"], tracks["v_n"]
+        return FleetSnapshot(
+            tracks["icao24"], tracks["callsign"], lat, lon, tracks["geo_alt"],
+            np.hypot(v_e, v_n), np.degrees(np.arctan2(v_e, v_n)) % 360, timestamp=t
+        )
+
+    def frame(self, t, source=None, frame_seconds=1.0):
+        """
+        at(t) rounded down to a multiple of frame_seconds and cached, so
+        callbacks in the same frame share one snapshot (and its forecast
+        and graph cache entries). source: latest polled snapshot; folded
+        in first if it has not been seen yet. Thread-safe.
+        """
+        with self._lock:
+            if source is not None and source.snapshot_id != self._source_id:
+                self._source_id = source.snapshot_id
+                self.update(source)
+            t = math.floor(t / frame_seconds) * frame_seconds
+            if self._frame is None or self._frame.timestamp != t:
+                self._frame = self.at(t)
+            return self._frame
+
+    def offsets(self, fleet, t, frame_seconds=1.0):
+        """
+        How far the tracks have moved each aircraft of fleet (the polled
+        snapshot) by the frame of time t: (frame timestamp, dlat, dlon),
+        degrees per row of fleet, 0 for aircraft without a track. Adding
+        them to a forecast of fleet shows it at the current frame, so
+        forecasts and graphs can stay keyed on the polled snapshot. Cached
+        per (snapshot, frame).
+        """
+        frame = self.frame(t, fleet, frame_seconds)
+        key = (fleet.snapshot_id, frame.timestamp)
+        cached = self._offsets
+        if cached is not None and cached[0] == key:
+            return cached[1]
+        ids = frame.icao24
+        dlat, dlon = np.zeros(len(fleet)), np.zeros(len(fleet))
+        if len(ids):
+            rows = np.clip(np.searchsorted(ids, fleet.icao24), 0, len(ids) - 1)
+            tracked = (ids[rows] == fleet.icao24) & np.isfinite(fleet.lat) & np.isfinite(fleet.lon)
+            rows = rows[tracked]
+            dlat[tracked] = frame.lat[rows] - fleet.lat[tracked]
+            dlon[tracked] = _wrap(frame.lon[rows] - fleet.lon[tracked])
+        result = (frame.timestamp, dlat, dlon)
+        self._offsets = (key, result)
+        return result
+
+
+def _empty_tracks():
+    return {
+        "icao24": np.empty(0, dtype="U6"), "callsign": np.empty(0, dtype="U8"),
+        "lat": np.empty(0), "lon": np.empty(0), "geo_alt": np.empty(0),
+        "v_e": np.empty(0), "v_n": np.empty(0), "t": np.empty(0),
+        "cov": np.empty((0, 4, 4)), "correction": np.empty((0, 2)),
+    }
+
+
+def _wrap(lon):
+    return np.mod(lon + 180, 360) - 180
+
+# ---------------------------
+# Batched Kalman algebra
+# ---------------------------
+def _propagate(cov, dt, accel_var):
+    """
+    Constant-velocity prediction of (n, 4, 4) covariances over dt seconds
+    each, with white-acceleration process noise.
+    """
+    n = len(dt)
+    f = np.tile(np.eye(4), (n, 1, 1))
+    f[:, 0, 2] = f[:, 1, 3] = dt
+    q = np.zeros((n, 4, 4))
+    for pos, vel in ((0, 2), (1, 3)):
+        q[:, pos, pos] = dt ** 3 / 3
+        q[:, pos, vel] = q[:, vel, pos] = dt ** 2 / 2
+        q[:, vel, vel] = dt
+    return f @ cov @ f.transpose(0, 2, 1) + accel_var * q
+
+
+def _kalman_gain(cov, noise):
+    """
+    Gain and updated covariance for a direct measurement of the full
+    state (H = I) with diagonal noise variances (n, 4); Joseph form.
+    """
+    r = np.einsum('ni,ij->nij', noise, np.eye(4))
+    s = cov + r
+    gain = np.linalg.solve(s, cov).transpose(0, 2, 1)
+    i_k = np.eye(4) - gain
+    cov = i_k @ cov @ i_k.transpose(0, 2, 1) + gain @ r @ gain.transpose(0, 2, 1)
+    return gain, cov
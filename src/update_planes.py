@@ -1,68 +1,82 @@
-import requests
 import json
-import pickle
 import os
-from datetime import datetime
-import random
+import threading
 
-# Load your API client credentials
-with open("../credentials.json") as f:
-    creds = json.load(f)
+from instrumentation import metrics
+from opensky_client import OpenSkyClient
+from sharded_fetch import ShardedFetcher, parse_shards
+from snapshot_archive import SnapshotArchive
 
-# Token endpoint
-TOKEN_URL = "https://auth.opensky-network.org/auth/realms/opensky-network/protocol/openid-connect/token"
+# API client credentials ({"clientId": ..., "clientSecret": ...}) in the
+# repository root; read on the first fetch, not at import
+CREDENTIALS_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "credentials.json")
 
-data = {
-    "grant_type": "client_credentials",
-    "client_id": creds["clientId"],
-    "client_secret": creds["clientSecret"]
+# One client for the process: caches the OAuth token and reuses connections
+_client = None
+_fetcher = None
+_client_lock = threading.Lock()
+
+# Canada bounding box
+BBOX = {
+    "lamin": 40.0,
+    "lamax": 85.0,
+    "lomin": -150.0,
+    "lomax": -50.0
 }
 
-def get_planes():
-    # Get OAuth token
-    r = requests.post(TOKEN_URL, data=data)
-    r.raise_for_status()
-    access_token = r.json()["access_token"]
+# Regions fetched concurrently and merged (see sharded_fetch). LOS_SHARDS
+# replaces the Canada box with a JSON list of [lamin, lamax, lomin, lomax]
+# boxes, e.g. several disjoint regions; each shard gets an even share of
+# the daily API credits
+SHARDS = parse_shards(os.environ.get("LOS_SHARDS")) or [BBOX]
 
-    headers = {
-        "Authorization": f"Bearer {access_token}"
-    }
+# Every fetch is appended here
+archive = SnapshotArchive("archives")
 
-    # Get states over Canada bounding box
-    url = "https://opensky-network.org/api/states/all"
-    params = {
-        "lamin": 40.0,
-        "lamax": 85.0,
-        "lomin": -150.0,
-        "lomax": -50.0
-    }
+def load_credentials(path=CREDENTIALS_PATH):
+    with open(path) as f:
+        return json.load(f)
 
-    response = requests.get(url, headers=headers, params=params)
-    response.raise_for_status()
+def get_client():
+    """
+    Shared OpenSkyClient, created (and credentials loaded) on first use.
+    """
+    global _client
+    with _client_lock:
+        if _client is None:
+            creds = load_credentials()
+            _client = OpenSkyClient(creds["clientId"], creds["clientSecret"], pool_size=max(4, len(SHARDS)))
+        return _client
 
-    planes_data = response.json()
-    planes_list = []
-    for plane in planes_data.get("states", []):
-        if plane[8]:  # skip if on-ground
-            continue
-        planes_list.append({
-            "icao24": plane[0],
-            "callsign": plane[1],
-            "lat": plane[6],
-            "lon": plane[5],
-            "geo_alt": plane[13] if plane[13] else 0,
-            "velocity": plane[9] if plane[9] and plane[10] else 0,
-            "track": plane[10] if plane[10] else 0
-        })
+def get_fetcher():
+    """
+    Shared ShardedFetcher over SHARDS, created on first use.
+    """
+    global _fetcher
+    client = get_client()
+    with _client_lock:
+        if _fetcher is None:
+            _fetcher = ShardedFetcher(client, SHARDS)
+        return _fetcher
 
-    # Create archives folder if it doesn't exist
-    os.makedirs("archives", exist_ok=True)
+def get_planes():
+    """
+    Fetch airborne aircraft over the configured shards (default: the
+    Canada bounding box) as one FleetSnapshot.
+    """
+    # Shards are fetched concurrently (token is fetched only when expired)
+    # and each body is parsed as it streams in
+    planes = get_fetcher().fetch()
+    metrics.gauge("fleet.size", len(planes))
 
-    # Save to pickle with timestamp
-    timestamp = datetime.utcnow().strftime("%Y%m%d_%H%M%S")
-    filename = f"archives/planes_{timestamp}.pkl"
-    with open(filename, "wb") as f:
-        pickle.dump(planes_list, f)
+    # Append to the columnar archive (replaces one pickle per fetch). A
+    # snapshot the archive rejects is still served, just not archived
+    with metrics.timer("archive"):
+        try:
+            archive.append(planes)
+        except ValueError as e:
+            print(f"Not archived: {e}")
+            return planes
 
-    print(f"Saved {len(planes_list)} planes to {filename}")
-    return planes_list
+    print(f"Archived {len(planes)} planes to {archive.path}")
+    return planes
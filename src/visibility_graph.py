@@ -0,0 +1,809 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from spatial_index import ECEFGrid, arc_length, to_ecef
+
+# Earth radius in meters (same value as calculate_path)
+R = 6371000
+
+# Signal propagation speed used for link delay weights
+SIGNAL_SPEED = 300000
+
+# Forecast horizons share one candidate pair set (horizon_adjacencies) while
+# no aircraft moves further than this (meters) from the set's positions
+HORIZON_WINDOW_DRIFT = 150000.0
+
+# ---------------------------
+# Vectorized helpers
+# ---------------------------
+def horizon_radii(geo_alt):
+    """
+    Radio horizon (meters) for each altitude in geo_alt.
+    Missing (None/NaN) or negative altitudes count as ground level,
+    matching los_distance().
+    """
+    h = np.asarray(geo_alt, dtype=float)
+    h = np.where(np.isnan(h) | (h < 0), 0.0, h)
+    return np.sqrt(2 * R * h)
+
+
+def haversine_matrix(lat1, lon1, lat2, lon2):
+    """
+    Great-circle distance (meters) between every point of (lat1, lon1)
+    and every point of (lat2, lon2). Returns an array of shape (len1, len2).
+    """
+    phi1 = np.radians(np.asarray(lat1, dtype=float))[:, None]
+    phi2 = np.radians(np.asarray(lat2, dtype=float))[None, :]
+    dlambda = np.radians(np.asarray(lon2, dtype=float)[None, :] - np.asarray(lon1, dtype=float)[:, None])
+    a = np.sin((phi2 - phi1) / 2) ** 2 + np.cos(phi1) * np.cos(phi2) * np.sin(dlambda / 2) ** 2
+    a = np.clip(a, 0.0, 1.0)
+    return R * 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+
+
+def haversine_pairs(lat1, lon1, lat2, lon2):
+    """
+    Element-wise great-circle distance (meters) between paired points.
+    """
+    phi1 = np.radians(lat1)
+    phi2 = np.radians(lat2)
+    dlambda = np.radians(np.asarray(lon2) - np.asarray(lon1))
+    a = np.sin((phi2 - phi1) / 2) ** 2 + np.cos(phi1) * np.cos(phi2) * np.sin(dlambda / 2) ** 2
+    a = np.clip(a, 0.0, 1.0)
+    return R * 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+
+# ---------------------------
+# Edge generation
+# ---------------------------
+def los_edges_bruteforce(lat, lon, geo_alt, block_size=1024):
+    """
+    Test every pair of aircraft for LOS using NumPy, one block x block tile
+    at a time so memory stays at O(block_size^2) regardless of fleet size.
+
+    Returns (i, j, dist): index arrays with i < j and the great-circle
+    distance of each visible pair, sorted by (i, j).
+    """
+    return _edges_bruteforce(np.asarray(lat, dtype=float), np.asarray(lon, dtype=float),
+                             horizon_radii(geo_alt), block_size)
+
+
+def _edges_bruteforce(lat, lon, horizon, block_size=1024):
+    n = len(lat)
+    rows, cols, dists = [], [], []
+    for a in range(0, n, block_size):
+        a_end = min(a + block_size, n)
+        for b in range(a, n, block_size):
+            b_end = min(b + block_size, n)
+            d = haversine_matrix(lat[a:a_end], lon[a:a_end], lat[b:b_end], lon[b:b_end])
+            max_los = horizon[a:a_end, None] + horizon[None, b:b_end]
+            visible = d <= max_los
+            if a == b:
+                # Diagonal tile: keep only the upper triangle (i < j)
+                visible &= np.triu(np.ones_like(visible), k=1)
+            ii, jj = np.nonzero(visible)
+            rows.append(ii + a)
+            cols.append(jj + b)
+            dists.append(d[ii, jj])
+
+    return _sorted_edges(rows, cols, dists)
+
+
+def los_edges_grid(lat, lon, geo_alt):
+    """
+    LOS edges using radius culling on an ECEF grid. The cutoff is the
+    largest possible los_distance in the fleet (twice the highest horizon),
+    so only pairs in neighboring cells get the exact test and the work
+    scales with N*k instead of N^2.
+
+    Returns (i, j, dist) exactly like los_edges_bruteforce.
+    """
+    return _edges_grid(np.asarray(lat, dtype=float), np.asarray(lon, dtype=float), horizon_radii(geo_alt))
+
+
+def _edges_grid(lat, lon, horizon):
+    if len(lat) < 2:
+        return _sorted_edges([], [], [])
+
+    grid = ECEFGrid(lat, lon, 2 * horizon.max())
+    return _sorted_edges(*_grid_edges(grid, lat, lon, horizon))
+
+
+def _grid_edges(grid, lat, lon, horizon, lo=0, hi=None):
+    """
+    Unsorted (rows, cols, dists) lists for the cell pairs of grid whose
+    first cell is in lo..hi-1.
+    """
+    rows, cols, dists = [], [], []
+    for a, b, same_cell in grid.cell_pairs(lo, hi):
+        d = haversine_matrix(lat[a], lon[a], lat[b], lon[b])
+        visible = d <= horizon[a, None] + horizon[None, b]
+        if same_cell:
+            visible &= np.triu(np.ones_like(visible), k=1)
+        ii, jj = np.nonzero(visible)
+        i, j = a[ii], b[jj]
+        rows.append(np.minimum(i, j))
+        cols.append(np.maximum(i, j))
+        dists.append(d[ii, jj])
+    return rows, cols, dists
+
+
+# ---------------------------
+# Parallel tiled edge generation
+# ---------------------------
+# Below this many aircraft the pool costs more than it saves
+PARALLEL_MIN_AIRCRAFT = 4000
+
+# Worker-side cache: (shared memory name, SharedMemory, lat, lon, horizon, grid)
+_tile_state = None
+
+
+def los_edges_parallel(lat, lon, geo_alt, workers=None, tiles_per_worker=4, executor=None,
+                       min_aircraft=PARALLEL_MIN_AIRCRAFT):
+    """
+    los_edges_grid split over a process pool; returns the same (i, j, dist).
+
+    The occupied grid cells are cut into tiles (contiguous runs of cells
+    with about equal estimated work). A tile owns the cell pairs whose
+    first cell it contains and reads the neighboring cells just outside
+    it as a halo, so every pair is tested by exactly one tile. Positions
+    go to the workers once through shared memory; only the tile bounds
+    and the resulting edges are pickled.
+
+    workers: pool size (default os.cpu_count())
+    executor: optional ProcessPoolExecutor to reuse across builds
+    min_aircraft: smaller fleets are built serially
+    """
+    lat = np.asarray(lat, dtype=float)
+    lon = np.asarray(lon, dtype=float)
+    horizon = horizon_radii(geo_alt)
+    n = len(lat)
+    workers = workers or os.cpu_count() or 1
+    if n < max(min_aircraft, 2) or (workers == 1 and executor is None):
+        return los_edges_grid(lat, lon, geo_alt)
+
+    radius = 2 * horizon.max()
+    grid = ECEFGrid(lat, lon, radius)
+    bounds = _balanced_tiles(grid.cell_work(), workers * tiles_per_worker)
+
+    shm = shared_memory.SharedMemory(create=True, size=3 * n * 8)
+    own = executor is None
+    try:
+        np.ndarray((3, n), dtype=float, buffer=shm.buf)[:] = (lat, lon, horizon)
+        if own:
+            executor = ProcessPoolExecutor(max_workers=workers)
+        futures = [executor.submit(_tile_edges, shm.name, n, radius, lo, hi) for lo, hi in bounds]
+        rows, cols, dists = [], [], []
+        for future in futures:
+            i, j, d = future.result()
+            rows.append(i)
+            cols.append(j)
+            dists.append(d)
+    finally:
+        if own and executor is not None:
+            executor.shutdown()
+        shm.close()
+        shm.unlink()
+    return _sorted_edges(rows, cols, dists)
+
+
+def _balanced_tiles(work, n_tiles):
+    """
+    Split cells 0..len(work)-1 into at most n_tiles contiguous (lo, hi)
+    ranges of roughly equal total work.
+    """
+    total = np.cumsum(work)
+    if not len(total) or total[-1] == 0:
+        return [(0, len(work))]
+    cuts = np.searchsorted(total, total[-1] * np.arange(1, n_tiles) / n_tiles, side='right')
+    edges = np.unique(np.concatenate([[0], cuts, [len(work)]]))
+    return list(zip(edges[:-1].tolist(), edges[1:].tolist()))
+
+
+def _tile_edges(shm_name, n, radius, lo, hi):
+    global _tile_state
+    if _tile_state is None or _tile_state[0] != shm_name:
+        if _tile_state is not None:
+            _tile_state[1].close()
+        shm = _attach_shared(shm_name)
+        lat, lon, horizon = np.ndarray((3, n), dtype=float, buffer=shm.buf)
+        # Same inputs as the parent's grid, so the same cell numbering
+        _tile_state = (shm_name, shm, lat, lon, horizon, ECEFGrid(lat, lon, radius))
+    _, _, lat, lon, horizon, grid = _tile_state
+
+    rows, cols, dists = _grid_edges(grid, lat, lon, horizon, lo, hi)
+    if not rows:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), np.empty(0)
+    return np.concatenate(rows), np.concatenate(cols), np.concatenate(dists)
+
+
+def _attach_shared(name):
+    """
+    Attach to the parent's block; the parent owns and unlinks it.
+    """
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Python < 3.13: workers share the parent's resource tracker, so
+        # registering the name again is harmless
+        return shared_memory.SharedMemory(name=name)
+
+
+LOS_BACKENDS = {
+    'grid': los_edges_grid,
+    'bruteforce': los_edges_bruteforce,
+    'parallel': los_edges_parallel,
+}
+
+
+def los_edges(lat, lon, geo_alt, backend='grid'):
+    """
+    Visible pairs (i, j, dist) using the selected backend:
+    'grid' (spatial culling), 'bruteforce' (all pairs, tiled) or
+    'parallel' (grid tiles on a process pool).
+    """
+    if backend not in LOS_BACKENDS:
+        raise ValueError(f"Unknown LOS backend: {backend}")
+    return LOS_BACKENDS[backend](lat, lon, geo_alt)
+
+
+def edges_within(lat, lon, reach, backend='grid'):
+    """
+    Pairs (i, j, dist) with dist <= reach[i] + reach[j], like los_edges
+    but for arbitrary per-aircraft reach (e.g. horizons plus a margin).
+    backend: 'grid' or 'bruteforce'.
+    """
+    lat = np.asarray(lat, dtype=float)
+    lon = np.asarray(lon, dtype=float)
+    reach = np.asarray(reach, dtype=float)
+    if backend == 'grid':
+        return _edges_grid(lat, lon, reach)
+    if backend == 'bruteforce':
+        return _edges_bruteforce(lat, lon, reach)
+    raise ValueError(f"Unknown LOS backend for edges_within: {backend}")
+
+
+def _sorted_edges(rows, cols, dists):
+    if not rows:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), np.empty(0)
+    i = np.concatenate(rows).astype(np.int64)
+    j = np.concatenate(cols).astype(np.int64)
+    d = np.concatenate(dists)
+    # Sort by (i, j) through a single packed key; faster than lexsort
+    order = np.argsort(i * (int(j.max(initial=0)) + 1) + j)
+    return i[order], j[order], d[order]
+
+# ---------------------------
+# Graph containers
+# ---------------------------
+def edge_weights(dist, metric='delay', extra_delay=0.0):
+    """
+    Link weights for the given metric: unit weights for 'hops',
+    propagation delay plus extra_delay for 'delay'.
+    """
+    if metric == 'hops':
+        return np.ones(len(dist))
+    return dist / SIGNAL_SPEED + extra_delay
+
+
+def edges_to_csr(n, i, j, weights):
+    """
+    Convert an undirected edge list into CSR arrays (indptr, indices, data).
+    Neighbors of each node are sorted by index, which is the order the
+    original pairwise loop produced them in.
+    """
+    src = np.concatenate([i, j])
+    dst = np.concatenate([j, i])
+    w = np.concatenate([weights, weights])
+    # Sort by (src, dst) through a single packed key (edges are unique, so
+    # the unstable sort is fine); several times faster than lexsort
+    order = np.argsort(src * max(n, 1) + dst)
+    src, dst, w = src[order], dst[order], w[order]
+    indptr = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(src, minlength=n), out=indptr[1:])
+    return indptr, dst, w
+
+
+def connected_components(n, i, j):
+    """
+    Connected component of each of n nodes given undirected edges (i, j),
+    labeled 0..k-1 in order of each component's lowest node.
+
+    Batched union-find: every round hooks the larger root of each edge that
+    still joins two trees under the smaller one, then compresses all paths
+    by pointer jumping, until no edge joins two trees.
+    """
+    parent = np.arange(n, dtype=np.int64)
+    # Every node starts as its own root
+    ri = np.asarray(i, dtype=np.int64)
+    rj = np.asarray(j, dtype=np.int64)
+    i, j = ri, rj
+    while len(i):
+        # Any smaller root will do (one write wins per root); no cycles form
+        parent[np.maximum(ri, rj)] = np.minimum(ri, rj)
+        while True:
+            grand = parent[parent]
+            if np.array_equal(grand, parent):
+                break
+            parent = grand
+        ri, rj = parent[i], parent[j]
+        joins = np.flatnonzero(ri != rj)
+        i, j, ri, rj = i[joins], j[joins], ri[joins], rj[joins]
+    # Every root is its component's lowest node
+    _, labels = np.unique(parent, return_inverse=True)
+    return labels.ravel()
+
+
+def csr_to_adjacency(ids, indptr, indices, data):
+    """
+    Build the adjacency dict used by the path searches:
+    id -> list of (neighbor_id, weight).
+    """
+    neighbor_ids = [ids[k] for k in indices.tolist()]
+    weights = data.tolist()
+    bounds = indptr.tolist()
+    graph = {}
+    for row, node_id in enumerate(ids):
+        start, end = bounds[row], bounds[row + 1]
+        graph[node_id] = list(zip(neighbor_ids[start:end], weights[start:end]))
+    return graph
+
+
+class CSRAdjacency:
+    """
+    Adjacency view over CSR arrays of link distances. get(node) returns the
+    same (neighbor_id, weight) list a built graph dict would hold, but only
+    for the nodes a search actually expands.
+
+    index: id -> row, ids: row -> id
+    labels: connected component per row (see connected_components);
+            computed from the CSR arrays on first use if not given
+    """
+
+    def __init__(self, index, ids, indptr, indices, dist, metric='delay', extra_delay=0.0, labels=None):
+        self._index = index
+        self._ids = ids
+        self._indptr = indptr
+        self._indices = indices
+        self._dist = dist
+        self._metric = metric
+        self._extra_delay = extra_delay
+        self._labels = labels
+
+    def __contains__(self, node):
+        return node in self._index
+
+    def __len__(self):
+        return len(self._indptr) - 1
+
+    def edge_count(self):
+        return len(self._indices) // 2
+
+    def with_metric(self, metric='delay', extra_delay=0.0):
+        """
+        Same links, different weights; the CSR arrays are shared.
+        """
+        return CSRAdjacency(self._index, self._ids, self._indptr, self._indices, self._dist, metric, extra_delay,
+                            self._labels)
+
+    def components(self):
+        """
+        Component label per row: aircraft with the same label can reach
+        each other over relays (a relay island), others cannot.
+        """
+        if self._labels is None:
+            n = len(self)
+            rows = np.repeat(np.arange(n, dtype=np.int64), np.diff(self._indptr))
+            self._labels = connected_components(n, rows, self._indices)
+        return self._labels
+
+    def labels_of(self, nodes):
+        """
+        Component labels of the given ids, in order.
+        """
+        rows = np.fromiter((self._index[node] for node in nodes), dtype=np.int64, count=len(nodes))
+        return self.components()[rows]
+
+    def component(self, node):
+        row = self._index.get(node)
+        return None if row is None else int(self.components()[row])
+
+    def connected(self, a, b):
+        """
+        True if a path a -> b exists; O(1) once the components are labeled.
+        """
+        row_a, row_b = self._index.get(a), self._index.get(b)
+        if row_a is None or row_b is None:
+            return False
+        labels = self.components()
+        return bool(labels[row_a] == labels[row_b])
+
+    def get(self, node, default=None):
+        row = self._index.get(node)
+        if row is None:
+            return default
+        start, end = self._indptr[row], self._indptr[row + 1]
+        nbrs = [self._ids[j] for j in self._indices[start:end].tolist()]
+        if self._metric == 'hops':
+            return [(j, 1.0) for j in nbrs]
+        weights = edge_weights(self._dist[start:end], self._metric, self._extra_delay)
+        return list(zip(nbrs, weights.tolist()))
+
+
+def filter_edges(i, j, d, lat, lon, geo_alt, los_predicate=None):
+    """
+    Keep the geometric edges that also pass los_predicate, a callable
+    (lat, lon, geo_alt, i, j) -> boolean mask (e.g. terrain.TerrainLOS).
+    """
+    if los_predicate is None or not len(i):
+        return i, j, d
+    keep = np.asarray(los_predicate(lat, lon, geo_alt, i, j), dtype=bool)
+    return i[keep], j[keep], d[keep]
+
+
+def los_adjacency(fleet, metric='delay', extra_delay=0.0, backend='grid', los_predicate=None):
+    """
+    LOS graph of a FleetSnapshot as a lazy CSRAdjacency (no per-node lists
+    are built up front), with its connected components labeled from the
+    edge list. los_predicate: optional extra test on the geometric edges
+    (see filter_edges).
+    """
+    i, j, d = los_edges(fleet.lat, fleet.lon, fleet.geo_alt, backend=backend)
+    i, j, d = filter_edges(i, j, d, fleet.lat, fleet.lon, fleet.geo_alt, los_predicate)
+    labels = connected_components(len(fleet), i, j)
+    indptr, indices, dist = edges_to_csr(len(fleet), i, j, d)
+    return CSRAdjacency(fleet.index, fleet.icao24.tolist(), indptr, indices, dist, metric, extra_delay, labels)
+
+
+def horizon_adjacencies(fleet, lats, lons, metric='delay', extra_delay=0.0, backend='grid',
+                        max_drift=HORIZON_WINDOW_DRIFT):
+    """
+    LOS graphs (CSRAdjacency, as los_adjacency) of fleet at each row of
+    the (H, N) position arrays lats/lons, e.g. forecast horizons; yielded
+    in row order.
+
+    Consecutive rows share one candidate set while no aircraft strays more
+    than max_drift from its position in the first row of the window: every
+    pair within los_distance plus both aircraft's drift over the window,
+    found once with backend and laid out in CSR order. Each row then only
+    re-tests those candidates and filters the layout, instead of searching
+    and sorting its edges from scratch. Labeling the components is still
+    done per row.
+    """
+    n = len(fleet)
+    ids = fleet.icao24.tolist()
+    horizon = horizon_radii(fleet.geo_alt)
+    start = 0
+    while start < len(lats):
+        # Grow the window while every aircraft stays within max_drift
+        drift = np.zeros(n)
+        end = start + 1
+        while end < len(lats):
+            step = np.nan_to_num(haversine_pairs(lats[start], lons[start], lats[end], lons[end]))
+            if step.max(initial=0.0) > max_drift:
+                break
+            drift = np.maximum(drift, step)
+            end += 1
+
+        # Pairs that can be in view anywhere in the window (+1 m for rounding)
+        i, j, _ = edges_within(lats[start], lons[start], horizon + drift + 1.0, backend)
+        src, dst = np.concatenate([i, j]), np.concatenate([j, i])
+        order = np.argsort(src * max(n, 1) + dst)
+        dst, pair = dst[order], order % max(len(i), 1)
+        # Where each row's candidates start in the layout
+        bounds = np.searchsorted(src[order], np.arange(n + 1))
+        limit = horizon[i] + horizon[j]
+
+        for k in range(start, end):
+            x, y, z = to_ecef(lats[k], lons[k]).T.copy()
+            d = arc_length(np.sqrt((x[i] - x[j]) ** 2 + (y[i] - y[j]) ** 2 + (z[i] - z[j]) ** 2))
+            vis = d <= limit
+            # Layout positions of the visible links, in order: a row's links
+            # start at the first of them past the row's first candidate
+            keep = np.flatnonzero(vis[pair])
+            indptr = np.searchsorted(keep, bounds)
+            labels = connected_components(n, i[vis], j[vis])
+            yield CSRAdjacency(fleet.index, ids, indptr, dst[keep], d[pair[keep]], metric, extra_delay, labels)
+        start = end
+
+
+def build_los_graph(ids, lat, lon, geo_alt, metric='delay', extra_delay=0.0, backend='grid',
+                    los_predicate=None):
+    """
+    Vectorized equivalent of the pairwise loop in compute_los_path.
+    Returns the adjacency dict id -> list of (neighbor_id, weight).
+    """
+    ids = list(ids)
+    i, j, d = los_edges(lat, lon, geo_alt, backend=backend)
+    i, j, d = filter_edges(i, j, d, lat, lon, geo_alt, los_predicate)
+    indptr, indices, data = edges_to_csr(len(ids), i, j, edge_weights(d, metric, extra_delay))
+    return csr_to_adjacency(ids, indptr, indices, data)
+
+# ---------------------------
+# Incremental maintenance
+# ---------------------------
+class IncrementalLOSGraph:
+    """
+    Persistent LOS graph that is updated from deltas instead of rebuilt.
+
+    Each aircraft is indexed against its neighborhood on an ECEFGrid with
+    a slack margin: every pair whose LOS gap (distance - los_distance) is
+    within the margin is kept as a candidate (a Verlet list). While an
+    aircraft's drift since it was indexed (ground displacement plus horizon
+    change) stays below `slack`, no pair outside the candidates can come
+    into view; only aircraft that drift further, and new aircraft, are
+    re-indexed.
+
+    A candidate pair's gap changes by at most the distance its two
+    aircraft travelled since it was last tested, so a pair is only
+    re-tested once that summed travel reaches the |gap| it had then.
+    Exact LOS tests are therefore proportional to churn near the LOS
+    limit, not N^2.
+
+    last_update reports the last update: aircraft re-indexed, moved
+    aircraft kept on their old candidates, and candidate pairs re-tested.
+    """
+
+    def __init__(self, slack=20000.0):
+        self.slack = float(slack)
+        self._slot = {}        # icao24 -> slot in the position arrays
+        self._ids = []         # slot -> icao24 (None for free slots)
+        self._free = []
+        self._lat = np.empty(0)
+        self._lon = np.empty(0)
+        self._xyz = np.empty((0, 3))  # ECEF positions, for cheap pair distances
+        self._horizon = np.empty(0)
+        self._anchor_lat = np.empty(0)
+        self._anchor_lon = np.empty(0)
+        self._anchor_horizon = np.empty(0)
+        self._drift = np.empty(0)
+        self._travel = np.empty(0)  # distance moved (plus horizon change) over all updates
+        # Candidate pairs (slot a, slot b), their visibility at the last
+        # test, and the summed travel of a and b at which they need a
+        # re-test (travel at the last test plus |gap| then)
+        self._pa = np.empty(0, dtype=np.int64)
+        self._pb = np.empty(0, dtype=np.int64)
+        self._pvis = np.empty(0, dtype=bool)
+        self._pbudget = np.empty(0)
+        self._csr = None
+        self.last_update = {"reindexed": 0, "kept": 0, "pair_tests": 0}
+
+    def __len__(self):
+        return len(self._slot)
+
+    def __contains__(self, icao24):
+        return icao24 in self._slot
+
+    # -----------------------
+    # Public API
+    # -----------------------
+    def update(self, moved=(), added=(), removed=()):
+        """
+        Apply a delta. moved/added: iterables of plane mappings (icao24,
+        lat, lon, geo_alt); removed: iterable of icao24s.
+        """
+        self._remove(list(removed))
+
+        added = list(added)
+        moved = list(moved)
+        for p in added:
+            if p["icao24"] in self._slot:
+                raise ValueError(f"Aircraft {p['icao24']} is already in the graph")
+            self._slot[p["icao24"]] = self._allocate(p["icao24"])
+        for p in moved:
+            if p["icao24"] not in self._slot:
+                raise KeyError(p["icao24"])
+
+        added_slots = self._store(added)
+        moved_slots = self._store(moved)
+        self._refresh(added_slots, moved_slots)
+
+    def apply_snapshot(self, fleet):
+        """
+        Bring the graph in line with a FleetSnapshot: aircraft not in the
+        graph are added, missing ones removed, the rest treated as moved.
+        """
+        new_ids = fleet.icao24.tolist()
+        keep = set(new_ids)
+        self._remove([icao for icao in self._slot if icao not in keep])
+
+        is_new = np.array([icao not in self._slot for icao in new_ids], dtype=bool)
+        for icao in fleet.icao24[is_new].tolist():
+            self._slot[icao] = self._allocate(icao)
+
+        slots = np.array([self._slot[icao] for icao in new_ids], dtype=np.int64)
+        self._write(slots, fleet.lat, fleet.lon, horizon_radii(fleet.geo_alt))
+        self._refresh(slots[is_new], slots[~is_new])
+
+    def edge_list(self):
+        """
+        Current edges as a set of (icao_a, icao_b, distance) with icao_a < icao_b.
+        """
+        edges = set()
+        for a, b, d in zip(*(x.tolist() for x in self._visible_edges())):
+            a, b = self._ids[a], self._ids[b]
+            edges.add((a, b, d) if a < b else (b, a, d))
+        return edges
+
+    def adjacency(self, metric='delay', extra_delay=0.0, frozen=False):
+        """
+        Read-only adjacency usable by the path searches (only get() is
+        needed); neighbor lists are materialized on access. With frozen=True
+        the view is detached from later updates (safe to cache).
+        """
+        if self._csr is None:
+            a, b, d = self._visible_edges()
+            # Free slots have no links, so they stay singletons
+            self._csr = edges_to_csr(len(self._ids), a, b, d) + (
+                connected_components(len(self._ids), a, b),)
+        indptr, indices, dist, labels = self._csr
+        index, ids = self._slot, self._ids
+        if frozen:
+            # CSR arrays are replaced, never mutated, so only the id maps need copying
+            index, ids = dict(index), list(ids)
+        return CSRAdjacency(index, ids, indptr, indices, dist, metric, extra_delay, labels)
+
+    # -----------------------
+    # Slot storage
+    # -----------------------
+    def _allocate(self, icao):
+        if self._free:
+            slot = self._free.pop()
+            self._ids[slot] = icao
+        else:
+            slot = len(self._ids)
+            self._ids.append(icao)
+            if slot >= len(self._lat):
+                self._grow(max(16, 2 * len(self._lat)))
+        return slot
+
+    def _grow(self, capacity):
+        for name in ("_lat", "_lon", "_horizon", "_anchor_lat", "_anchor_lon", "_anchor_horizon", "_drift", "_travel"):
+            old = getattr(self, name)
+            new = np.zeros(capacity)
+            new[:len(old)] = old
+            setattr(self, name, new)
+        xyz = np.zeros((capacity, 3))
+        xyz[:len(self._xyz)] = self._xyz
+        self._xyz = xyz
+
+    def _remove(self, icaos):
+        if not icaos:
+            return
+        dead = np.zeros(len(self._ids), dtype=bool)
+        for icao in icaos:
+            slot = self._slot.pop(icao)
+            self._ids[slot] = None
+            self._free.append(slot)
+            dead[slot] = True
+        self._keep_pairs(~(dead[self._pa] | dead[self._pb]))
+
+    def _store(self, planes):
+        slots = np.array([self._slot[p["icao24"]] for p in planes], dtype=np.int64)
+        lat = np.array([p["lat"] for p in planes], dtype=float)
+        lon = np.array([p["lon"] for p in planes], dtype=float)
+        horizon = horizon_radii([p.get("geo_alt") for p in planes])
+        self._write(slots, lat, lon, horizon)
+        return slots
+
+    def _write(self, slots, lat, lon, horizon):
+        xyz = to_ecef(lat, lon)
+        # Slots of new aircraft get a meaningless step; their pairs are all
+        # tested (and budgeted) after this write
+        step = arc_length(np.linalg.norm(xyz - self._xyz[slots], axis=1))
+        self._travel[slots] += step + np.abs(horizon - self._horizon[slots])
+        self._xyz[slots] = xyz
+        self._lat[slots] = lat
+        self._lon[slots] = lon
+        self._horizon[slots] = horizon
+
+    def _keep_pairs(self, keep):
+        self._pa = self._pa[keep]
+        self._pb = self._pb[keep]
+        self._pvis = self._pvis[keep]
+        self._pbudget = self._pbudget[keep]
+        self._csr = None
+
+    def _append_pairs(self, a, b, vis, budget):
+        self._pa = np.concatenate([self._pa, a])
+        self._pb = np.concatenate([self._pb, b])
+        self._pvis = np.concatenate([self._pvis, vis])
+        self._pbudget = np.concatenate([self._pbudget, budget])
+        self._csr = None
+
+    # -----------------------
+    # Maintenance
+    # -----------------------
+    def _refresh(self, added_slots, moved_slots):
+        # Drift since each moved aircraft was last indexed
+        if len(moved_slots):
+            self._drift[moved_slots] = haversine_pairs(
+                self._anchor_lat[moved_slots], self._anchor_lon[moved_slots],
+                self._lat[moved_slots], self._lon[moved_slots]
+            ) + np.abs(self._horizon[moved_slots] - self._anchor_horizon[moved_slots])
+        stale = self._drift[moved_slots] > self.slack
+        reindex = np.concatenate([added_slots, moved_slots[stale]])
+
+        if len(reindex):
+            self._reindex(reindex)
+        pair_tests = self._retest()
+        self._csr = None
+        self.last_update = {"reindexed": int(len(reindex)), "kept": int((~stale).sum()),
+                            "pair_tests": pair_tests}
+
+    def _retest(self):
+        """
+        Re-test the candidate pairs whose aircraft travelled at least their
+        margin since the last test; returns how many were tested.
+        """
+        if not len(self._pa):
+            return 0
+        travelled = self._travel[self._pa] + self._travel[self._pb]
+        # NaN (unknown position) compares false, so such pairs are re-tested
+        sel = np.flatnonzero(~(travelled < self._pbudget))
+        a, b = self._pa[sel], self._pb[sel]
+        self._pvis[sel], self._pbudget[sel] = self._test(a, b)
+        return len(sel)
+
+    def _test(self, a, b):
+        """
+        Exact LOS test of slot pairs: (visible, re-test budget).
+        """
+        gap = self._distance(a, b) - (self._horizon[a] + self._horizon[b])
+        return gap <= 0, np.abs(gap) + self._travel[a] + self._travel[b]
+
+    def _visible_edges(self):
+        """
+        Visible candidate pairs (a, b, dist) at the current positions; a
+        pair that was not re-tested is still visible, but has moved.
+        """
+        vis = self._pvis
+        a, b = self._pa[vis], self._pb[vis]
+        return a, b, self._distance(a, b)
+
+    def _distance(self, a, b):
+        """
+        Great-circle distance of slot pairs, through the ECEF chord (no
+        trigonometry per pair but one arcsin).
+        """
+        xyz = self._xyz
+        chord = np.sqrt((xyz[a, 0] - xyz[b, 0]) ** 2 + (xyz[a, 1] - xyz[b, 1]) ** 2
+                        + (xyz[a, 2] - xyz[b, 2]) ** 2)
+        return arc_length(chord)
+
+    def _reindex(self, slots, block_size=1024):
+        self._anchor_lat[slots] = self._lat[slots]
+        self._anchor_lon[slots] = self._lon[slots]
+        self._anchor_horizon[slots] = self._horizon[slots]
+        self._drift[slots] = 0.0
+
+        # Drop the old candidates of re-indexed aircraft
+        fresh = np.zeros(len(self._ids), dtype=bool)
+        fresh[slots] = True
+        self._keep_pairs(~(fresh[self._pa] | fresh[self._pb]))
+
+        active = np.fromiter(self._slot.values(), dtype=np.int64, count=len(self._slot))
+        # A pair can close by at most slack (this aircraft) plus the other
+        # aircraft's remaining drift budget before either is re-indexed
+        margin = 2 * self.slack + self._drift
+        radius = 2 * self._horizon[active].max() + 2 * self.slack + self._drift[active].max()
+        grid = ECEFGrid(self._lat[active], self._lon[active], radius)
+        position = np.zeros(len(self._ids), dtype=np.int64)
+        position[active] = np.arange(len(active))
+
+        new_a, new_b = [], []
+        for start in range(0, len(slots), block_size):
+            p, q = grid.near(position[slots[start:start + block_size]])
+            a, b = active[p], active[q]
+            # Pairs of two re-indexed aircraft are kept once (lower slot first)
+            keep = np.flatnonzero(~fresh[b] | (b > a))
+            a, b = a[keep], b[keep]
+            gap = self._distance(a, b) - (self._horizon[a] + self._horizon[b])
+            near = np.flatnonzero(gap <= margin[b])
+            new_a.append(a[near])
+            new_b.append(b[near])
+
+        a = np.concatenate(new_a)
+        b = np.concatenate(new_b)
+        self._append_pairs(a, b, *self._test(a, b))
@@ -0,0 +1,243 @@
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+from calculate_path import (
+    bfs_shortest_hops, bidirectional_astar, compute_los_path, compute_los_paths_over_horizons, dijkstra,
+    extrapolate_fleet, extrapolate_position,
+)
+from fleet import FleetSnapshot
+from state_stream import iter_bytes, parse_states
+from synthetic_fleet import CANADA_BBOX, WORLD_BBOX, synthetic_fleet
+from visibility_graph import IncrementalLOSGraph, los_adjacency
+
+# Scaling benchmarks for the routing pipeline on seeded synthetic fleets.
+#
+#   python tests/benchmarks.py                          # default sizes
+#   python tests/benchmarks.py --bbox world --sizes 10000 50000 --output bench.json
+#   python tests/benchmarks.py --check tests/benchmark_thresholds.json
+#
+# Every stage is timed on its own: ingestion of a /states/all payload
+# (decoded whole vs. parse_states, which streams payloads past
+# WHOLE_PAYLOAD_BYTES; with peak traced memory), scalar and
+# vectorized extrapolation, graph construction (rebuilt vs. one
+# incremental step), each search for both metrics, and routing one pair
+# over many forecast horizons (shared vs. one call per horizon). Results are
+# written as JSON; --check exits non-zero if a stage is slower than its
+# threshold (seconds, keyed by stage then fleet size; "<bbox>/<size>" for
+# regions other than canada, e.g. "world/50000").
+
+DEFAULT_SIZES = [100, 1000, 5000]
+FORECAST_SECONDS = 600
+
+# Incremental graph: seconds between updates, and updates run before timing
+# (so aircraft are past their first re-index, as in a long-running server)
+UPDATE_SECONDS = 10
+WARMUP_UPDATES = 12
+
+# Forecast horizons (seconds) for the multi-horizon routing stage
+HORIZONS = range(0, 601, 30)
+BBOXES = {"canada": CANADA_BBOX, "world": WORLD_BBOX}
+
+# Synthetic /states/all fixture (wire format, not a real capture), tiled up to the fleet size for ingestion
+PAYLOAD_FIXTURE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "opensky_states.json")
+
+# Network read size for the streamed ingestion
+READ_BYTES = 1 << 16
+
+# ---------------------------
+# Timing helpers
+# ---------------------------
+def best_of(fn, repeat):
+    """
+    Minimum wall time of fn() over repeat runs, and its last result.
+    """
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - t0)
+    return best, result
+
+def peak_memory(fn):
+    """
+    Peak traced allocation (bytes) while running fn().
+    """
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+def time_searches(search, pairs):
+    """
+    Mean seconds per query and mean settled nodes over the endpoint pairs.
+    """
+    expanded = 0
+    t0 = time.perf_counter()
+    for start, end in pairs:
+        stats = {}
+        search(start, end, stats)
+        expanded += stats['expanded']
+    elapsed = time.perf_counter() - t0
+    return elapsed / len(pairs), expanded / len(pairs)
+
+# ---------------------------
+# Benchmarks
+# ---------------------------
+def fixture_payload(n):
+    """
+    /states/all body with n state vectors: the synthetic fixture's states
+    repeated (with unique icao24s) as compact JSON bytes.
+    """
+    with open(PAYLOAD_FIXTURE) as f:
+        fixture = json.load(f)
+    states = []
+    for k in range(n):
+        state = list(fixture["states"][k % len(fixture["states"])])
+        state[0] = f"{k:06x}"
+        states.append(state)
+    return json.dumps({"time": fixture["time"], "states": states}, separators=(",", ":")).encode()
+
+def decode_whole(payload):
+    # As response.json(): the body is read into one bytes object first
+    data = json.loads(b"".join(iter_bytes(payload, READ_BYTES)))
+    return FleetSnapshot.from_states(data["states"], timestamp=data["time"])
+
+def decode_streamed(payload):
+    return parse_states(iter_bytes(payload, READ_BYTES), expected_bytes=len(payload))
+
+def bench_size(n, seed=0, bbox=CANADA_BBOX, repeat=3, queries=20):
+    """
+    Run every stage on one fleet of n aircraft; returns a list of result
+    dicts {"stage", "n", "seconds", ...}.
+    """
+    fleet = synthetic_fleet(n, seed=seed, bbox=bbox)
+    results = []
+
+    def record(stage, seconds, **extra):
+        results.append({"stage": stage, "n": n, "seconds": seconds, **extra})
+
+    # Ingestion: whole-payload json + from_states vs. the streaming parser
+    payload = fixture_payload(n)
+    for stage, decode in (("ingest/json", decode_whole), ("ingest/stream", decode_streamed)):
+        seconds, _ = best_of(lambda: decode(payload), repeat)
+        record(stage, seconds, payload_mb=len(payload) / 1e6, peak_mb=peak_memory(lambda: decode(payload)) / 1e6)
+
+    # Extrapolation: per-plane scalar calls vs. one vectorized pass
+    rows = list(zip(fleet.lat.tolist(), fleet.lon.tolist(), fleet.velocity.tolist(), fleet.track.tolist()))
+    seconds, _ = best_of(lambda: [extrapolate_position(*row, FORECAST_SECONDS) for row in rows], repeat)
+    record("extrapolate_position", seconds)
+    seconds, _ = best_of(lambda: extrapolate_fleet(fleet, FORECAST_SECONDS), repeat)
+    record("extrapolate_fleet", seconds)
+
+    # Graph construction (LOS edges + CSR); hops shares the links
+    seconds, graph = best_of(lambda: los_adjacency(fleet, metric='delay'), repeat)
+    record("graph_build", seconds, edges=graph.edge_count())
+    build_seconds = seconds
+
+    # One incremental step (delta + adjacency) on a graph kept across updates
+    incremental = IncrementalLOSGraph()
+    for k in range(WARMUP_UPDATES + 1):
+        incremental.apply_snapshot(extrapolate_fleet(fleet, k * UPDATE_SECONDS))
+        incremental.adjacency()
+    steps = [extrapolate_fleet(fleet, (WARMUP_UPDATES + k) * UPDATE_SECONDS) for k in range(1, repeat + 1)]
+    update_seconds = []
+    for moved in steps:
+        t0 = time.perf_counter()
+        incremental.apply_snapshot(moved)
+        incremental.adjacency()
+        update_seconds.append(time.perf_counter() - t0)
+    seconds = float(np.mean(update_seconds))
+    record("graph_update", seconds, speedup=build_seconds / seconds,
+           reindexed=incremental.last_update["reindexed"], pair_tests=incremental.last_update["pair_tests"])
+    hops_graph = graph.with_metric('hops')
+
+    # Searches over the same seeded endpoint pairs
+    rng = np.random.default_rng(seed)
+    ids = fleet.icao24.tolist()
+    pairs = [(ids[a], ids[b]) for a, b in rng.integers(0, n, size=(queries, 2))]
+
+    for stage, search in (
+        ("dijkstra/delay", lambda s, e, st: dijkstra(graph, s, e, st)),
+        ("dijkstra/hops", lambda s, e, st: dijkstra(hops_graph, s, e, st)),
+        ("bfs/hops", lambda s, e, st: bfs_shortest_hops(hops_graph, s, e, st)),
+        ("astar/delay", lambda s, e, st: bidirectional_astar(graph, s, e, fleet, 0.0, st)),
+    ):
+        seconds, expanded = time_searches(search, pairs)
+        record(stage, seconds, expanded=expanded)
+
+    # One pair over all horizons: shared candidate sets vs. a graph per call
+    start, end = pairs[0]
+    per_call, _ = best_of(
+        lambda: [compute_los_path(extrapolate_fleet(fleet, h), start, end) for h in HORIZONS], repeat)
+    record("horizons/per_call", per_call, horizons=len(HORIZONS))
+    seconds, _ = best_of(lambda: compute_los_paths_over_horizons(fleet, start, end, HORIZONS), repeat)
+    record("horizons/shared", seconds, horizons=len(HORIZONS), speedup=per_call / seconds)
+
+    return results
+
+def run(sizes, seed=0, bbox=CANADA_BBOX, repeat=3, queries=20, verbose=True):
+    results = []
+    for n in sizes:
+        for r in bench_size(n, seed, bbox, repeat, queries):
+            results.append(r)
+            if verbose:
+                extra = "".join(f"  {k}={v:.6g}" for k, v in r.items() if k not in ("stage", "n", "seconds"))
+                print(f"{r['stage']:<22}{r['n']:>7}  {r['seconds'] * 1000:10.2f} ms{extra}")
+    return {
+        "seed": seed,
+        "region": next((name for name, box in BBOXES.items() if box == bbox), None),
+        "bbox": list(bbox),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+        "results": results,
+    }
+
+def check_thresholds(report, thresholds):
+    """
+    Stages slower than their threshold, as (stage, n, seconds, limit).
+    thresholds: {stage: {key: max_seconds}} with key str(n) for the canada
+    bbox and "<region>/<n>" otherwise; missing entries are not checked.
+    """
+    region = report.get("region", "canada")
+    failures = []
+    for r in report["results"]:
+        key = str(r["n"]) if region == "canada" else f"{region}/{r['n']}"
+        limit = thresholds.get(r["stage"], {}).get(key)
+        if limit is not None and r["seconds"] > limit:
+            failures.append((r["stage"], r["n"], r["seconds"], limit))
+    return failures
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Scaling benchmarks on synthetic fleets.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="fleet sizes")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--bbox", choices=sorted(BBOXES), default="canada", help="region to populate")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per stage (best is kept)")
+    parser.add_argument("--queries", type=int, default=20, help="endpoint pairs per search")
+    parser.add_argument("--output", help="write the JSON report here")
+    parser.add_argument("--check", help="JSON thresholds file; exit 1 on regression")
+    args = parser.parse_args()
+
+    report = run(args.sizes, args.seed, BBOXES[args.bbox], args.repeat, args.queries)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.check:
+        with open(args.check) as f:
+            failures = check_thresholds(report, json.load(f))
+        for stage, n, seconds, limit in failures:
+            print(f"REGRESSION {stage} n={n}: {seconds:.4f}s > {limit:.4f}s")
+        sys.exit(1 if failures else 0)
@@ -0,0 +1,6 @@
+import os
+import sys
+
+# Modules in src/ import each other by bare name (they are run from src/),
+# so make that directory importable for the test suite as well.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
@@ -1,22 +1,18 @@
-import pickle
+import os
+import sys
 import random
-from src.calculate_path import compute_los_path
 import plotly.graph_objects as go
 
-with open("planes_canada.pkl", "rb") as f:
-    planes_data = pickle.load(f)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+from calculate_path import compute_los_path
+from snapshot_archive import SnapshotArchive, load_pickle
 
-planes_list = []
-for plane in planes_data.get("states", []):
-    if plane[8]:
-        continue
-    planes_list.append({
-        "icao24": plane[0],
-        "callsign": plane[1].strip() if plane[1] else None,
-        "lat": plane[6],
-        "lon": plane[5],
-        "geo_alt": plane[13] if plane[13] else 0
-    })
+# Latest snapshot from the columnar archive if there is one, else the recorded pickle
+archive = SnapshotArchive("archives")
+if len(archive):
+    planes_list = archive.latest()
+else:
+    planes_list = load_pickle("planes_canada.pkl")
 
 # Example: pick two planes from the list
 start_icao = planes_list[int(len(planes_list)*random.random())]['icao24']
@@ -1,5 +1,12 @@
 import math
-from src.calculate_path import extrapolate_position, haversine, los_distance, compute_los_path
+import random
+from calculate_path import (
+    extrapolate_position, haversine, los_distance, compute_los_path,
+    dijkstra, bfs_shortest_hops, find_path, LOSRouter
+)
+from fleet import FleetSnapshot
+from instrumentation import metrics
+from visibility_graph import los_adjacency
 
 def test_extrapolate_position_north():
     lat, lon = 0.0, 0.0
@@ -35,3 +42,61 @@ def test_compute_los_path_none():
     C = {"icao24": "C", "callsign": "C", "lat": 0.0, "lon": 2.0, "geo_alt": 10}
     path = compute_los_path([A, B, C], "A", "C")
     assert path is None
+
+def test_different_islands_are_rejected_without_a_search(monkeypatch):
+    monkeypatch.setattr(metrics, "enabled", True)
+    # Two chains far apart: A-B-C and D-E
+    planes = [
+        {"icao24": k, "callsign": k, "lat": 0.0, "lon": lon, "geo_alt": 100}
+        for k, lon in (("A", 0.0), ("B", 0.35), ("C", 0.7), ("D", 20.0), ("E", 20.3))
+    ]
+    graph = los_adjacency(FleetSnapshot.from_dicts(planes))
+    assert graph.component("A") == graph.component("C") != graph.component("E")
+    for metric in ("delay", "hops"):
+        stats = {}
+        assert find_path(graph.with_metric(metric), "A", "E", metric, stats=stats) is None
+        assert stats == {}  # no node was expanded
+    assert find_path(graph, "A", "C") == ["A", "B", "C"]
+
+    metrics.reset()
+    router = LOSRouter(planes)
+    (path, cost), (other, other_cost) = router.paths_with_costs([("A", "E"), ("D", "E")])
+    assert (path, cost) == (None, None)
+    assert other == ["D", "E"] and abs(other_cost - haversine(0, 20.0, 0, 20.3) / 300000) < 1e-9
+    assert metrics.snapshot()["counters"]["search.rejected"] == 1  # only A-E
+    metrics.reset()
+
+def test_dijkstra_and_bfs_on_small_graph():
+    graph = {
+        "A": [("B", 1.0), ("C", 5.0)],
+        "B": [("A", 1.0), ("C", 1.0), ("D", 4.0)],
+        "C": [("A", 5.0), ("B", 1.0), ("D", 1.0)],
+        "D": [("B", 4.0), ("C", 1.0)],
+    }
+    stats = {}
+    assert dijkstra(graph, "A", "D", stats) == ["A", "B", "C", "D"]
+    assert stats["expanded"] == 4
+    assert bfs_shortest_hops(graph, "A", "D") in (["A", "B", "D"], ["A", "C", "D"])
+    assert dijkstra(graph, "A", "Z") is None
+
+def path_delay(planes, path, extra_delay):
+    return sum(
+        haversine(a["lat"], a["lon"], b["lat"], b["lon"]) / 300000 + extra_delay
+        for a, b in zip(path, path[1:])
+    )
+
+def test_astar_matches_dijkstra_delay():
+    rng = random.Random(2)
+    planes = [
+        {"icao24": str(k), "callsign": None, "lat": rng.uniform(44, 50), "lon": rng.uniform(-90, -60),
+         "geo_alt": rng.uniform(3000, 12000)}
+        for k in range(400)
+    ]
+    for _ in range(10):
+        start, end = rng.sample(planes, 2)
+        p1 = compute_los_path(planes, start["icao24"], end["icao24"], extra_delay=0.001)
+        p2 = compute_los_path(planes, start["icao24"], end["icao24"], extra_delay=0.001, search="astar")
+        assert (p1 is None) == (p2 is None)
+        if p1:
+            assert p2[0] is start and p2[-1] is end
+            assert abs(path_delay(planes, p1, 0.001) - path_delay(planes, p2, 0.001)) < 1e-9
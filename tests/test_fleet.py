@@ -0,0 +1,88 @@
+import numpy as np
+
+from calculate_path import (
+    compute_los_path,
+    compute_los_paths_over_horizons,
+    extrapolate_fleet,
+    extrapolate_position,
+    LOSRouter,
+)
+from fleet import FleetSnapshot
+
+
+PLANES = [
+    {"icao24": "A", "callsign": "ACA1", "lat": 0.0, "lon": 0.0, "geo_alt": 100, "velocity": 250.0, "track": 90.0},
+    {"icao24": "B", "callsign": None, "lat": 0.0, "lon": 0.3, "geo_alt": 100, "velocity": None, "track": None},
+    {"icao24": "C", "callsign": "WJA2", "lat": 0.0, "lon": 0.9, "geo_alt": 100, "velocity": 200.0, "track": 270.0},
+]
+
+
+def test_dict_view_round_trip():
+    fleet = FleetSnapshot.from_dicts(PLANES)
+    assert len(fleet) == 3
+    assert fleet.to_dicts() == PLANES
+    assert fleet[1]["callsign"] is None
+    assert fleet.get("C")["lon"] == 0.9
+    assert fleet.row_of("missing") is None
+    assert fleet.labels().tolist() == ["ACA1", "B", "WJA2"]
+
+
+def test_fingerprint_follows_content_not_identity():
+    fleet = FleetSnapshot.from_dicts(PLANES, timestamp=100)
+    same = FleetSnapshot.from_dicts(PLANES, timestamp=100)
+    assert same.snapshot_id != fleet.snapshot_id and same.fingerprint == fleet.fingerprint
+    assert FleetSnapshot.from_dicts(PLANES, timestamp=101).fingerprint != fleet.fingerprint
+    moved = fleet.with_positions(fleet.lat + 0.1, fleet.lon)
+    assert moved.fingerprint != fleet.fingerprint
+    # Motion and callsigns count too (they change forecasts and labels)
+    for key, value in (("velocity", 260.0), ("track", 91.0), ("callsign", "ACA2")):
+        changed = [dict(PLANES[0], **{key: value})] + PLANES[1:]
+        assert FleetSnapshot.from_dicts(changed, timestamp=100).fingerprint != fleet.fingerprint
+
+
+def test_extrapolate_fleet_matches_scalar_and_shares_columns():
+    fleet = FleetSnapshot.from_dicts(PLANES)
+    forecast = extrapolate_fleet(fleet, 600)
+    for p, q in zip(PLANES, forecast):
+        lat, lon = extrapolate_position(p["lat"], p["lon"], p["velocity"], p["track"], 600)
+        assert np.isclose(q["lat"], lat) and np.isclose(q["lon"], lon)
+    assert forecast.icao24 is fleet.icao24
+    assert forecast.index is fleet.index
+
+
+def test_compute_los_path_on_snapshot():
+    fleet = FleetSnapshot.from_dicts(PLANES)
+    path = compute_los_path(fleet, "A", "C")
+    assert [p["icao24"] for p in path] == ["A", "B", "C"]
+
+
+def test_paths_over_horizons_match_single_calls():
+    fleet = FleetSnapshot.from_dicts(PLANES)
+    horizons = [0, 60, 600, 3600]
+    paths = compute_los_paths_over_horizons(fleet, "A", "C", horizons)
+    assert len(paths) == len(horizons)
+    for seconds, path in zip(horizons, paths):
+        expected = compute_los_path(extrapolate_fleet(fleet, seconds), "A", "C")
+        if expected is None:
+            assert path is None
+        else:
+            assert [p["icao24"] for p in path] == [p["icao24"] for p in expected]
+            assert np.allclose([p["lat"] for p in path], [p["lat"] for p in expected])
+    assert paths[0] is not None and paths[-1] is None
+
+
+def test_router_reuses_trees_for_batches():
+    fleet = FleetSnapshot.from_dicts(PLANES)
+    router = LOSRouter(fleet)
+    cost, prev = router.shortest_path_tree("A")
+    assert set(cost) == {"A", "B", "C"}
+    hops, _ = router.shortest_path_tree("A", metric="hops")
+    assert hops == {"A": 0, "B": 1, "C": 2}
+
+    pairs = [("A", "C"), ("B", "C"), ("C", "A"), ("A", "A")]
+    paths = router.route_many(pairs)
+    assert [[p["icao24"] for p in path] for path in paths] == [["A", "B", "C"], ["B", "C"], ["C", "B", "A"], ["A"]]
+    for (start, end), path in zip(pairs, paths):
+        expected = compute_los_path(fleet, start, end)
+        assert [p["icao24"] for p in path] == [p["icao24"] for p in expected]
+    assert router.route("A", "missing") is None
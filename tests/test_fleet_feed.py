@@ -0,0 +1,41 @@
+import threading
+import time
+
+from fleet import FleetSnapshot
+from fleet_feed import FleetFeed, archive_follower
+from snapshot_archive import SnapshotArchive
+
+
+def test_concurrent_refreshes_share_one_fetch():
+    calls = []
+    gate = threading.Event()
+
+    def fetch():
+        calls.append(1)
+        gate.wait(5)
+        return FleetSnapshot.from_dicts([{"icao24": f"{len(calls):06x}", "lat": 0.0, "lon": 0.0}])
+
+    feed = FleetFeed(fetch)
+    threads = [threading.Thread(target=feed.refresh) for _ in range(4)]
+    for t in threads:
+        t.start()
+    time.sleep(0.2)
+    gate.set()
+    for t in threads:
+        t.join(5)
+    # The first caller fetches; callers that waited on it reuse its result
+    assert len(calls) == 1 and feed.ready.is_set()
+    assert len(feed.current()) == 1
+
+
+def test_archive_follower_only_returns_new_snapshots(tmp_path):
+    archive = SnapshotArchive(str(tmp_path))
+    fetch = archive_follower(archive)
+    assert fetch() is None
+    archive.append(FleetSnapshot.from_dicts([{"icao24": "A", "lat": 1.0, "lon": 2.0}]), timestamp=10)
+    first = fetch()
+    assert first.icao24.tolist() == ["A"] and fetch() is None
+
+    feed = FleetFeed(fetch, initial=first)
+    feed.refresh()
+    assert feed.current() is first and feed.last_error is None
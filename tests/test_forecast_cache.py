@@ -0,0 +1,85 @@
+import threading
+
+import forecast_cache
+from calculate_path import compute_los_path, extrapolate_fleet
+from fleet import FleetSnapshot
+from forecast_cache import ForecastCache
+from visibility_graph import IncrementalLOSGraph
+
+
+PLANES = [
+    {"icao24": "A", "callsign": "A", "lat": 0.0, "lon": 0.0, "geo_alt": 100, "velocity": 200.0, "track": 90.0},
+    {"icao24": "B", "callsign": "B", "lat": 0.0, "lon": 0.3, "geo_alt": 100, "velocity": 200.0, "track": 90.0},
+    {"icao24": "C", "callsign": "C", "lat": 0.0, "lon": 0.9, "geo_alt": 100, "velocity": 200.0, "track": 90.0},
+]
+
+
+def test_repeated_queries_hit_cache():
+    fleet = FleetSnapshot.from_dicts(PLANES)
+    cache = ForecastCache(max_entries=4)
+    first = cache.route(fleet, 60, "A", "C")
+    again = cache.route(fleet, 60, "A", "C")
+    hops = cache.route(fleet, 60, "A", "C", metric="hops")
+    assert [p["icao24"] for p in first] == [p["icao24"] for p in again] == ["A", "B", "C"]
+    assert [p["icao24"] for p in hops] == ["A", "B", "C"]
+    stats = cache.stats()
+    assert stats["forecast_misses"] == 1 and stats["forecast_hits"] == 2
+    assert stats["route_misses"] == 2 and stats["route_hits"] == 1
+    assert stats["graph_misses"] == 1 and stats["graph_hits"] == 1
+
+
+def test_lru_eviction_and_new_snapshot_identity():
+    fleet = FleetSnapshot.from_dicts(PLANES)
+    cache = ForecastCache(max_entries=2)
+    cache.forecast(fleet, 0)
+    cache.forecast(fleet, 60)
+    cache.forecast(fleet, 0)      # refresh 0 -> 60 is now least recent
+    cache.forecast(fleet, 120)    # evicts 60
+    cache.forecast(fleet, 0)
+    assert cache.stats()["evictions"] == 1
+    assert cache.stats()["forecast_hits"] == 2
+
+    refreshed = FleetSnapshot.from_dicts(PLANES)
+    cache.forecast(refreshed, 0)
+    assert cache.stats()["forecast_misses"] == 4
+
+
+def test_incremental_backed_cache_matches_compute_los_path():
+    fleet = FleetSnapshot.from_dicts(PLANES)
+    cache = ForecastCache(los_graph=IncrementalLOSGraph())
+    for seconds in (0, 600, 1200):
+        expected = compute_los_path(extrapolate_fleet(fleet, seconds), "A", "C")
+        actual = cache.route(fleet, seconds, "A", "C")
+        assert (expected is None) == (actual is None)
+        if expected:
+            assert [p["icao24"] for p in actual] == [p["icao24"] for p in expected]
+
+
+def test_graphs_build_outside_the_lock(monkeypatch):
+    fleet = FleetSnapshot.from_dicts(PLANES)
+    # Both builds must be in progress at once, or the barrier times out
+    barrier = threading.Barrier(2, timeout=5)
+    builds = []
+    real_build = forecast_cache.los_adjacency
+
+    def slow_build(forecast, **kwargs):
+        builds.append(forecast)
+        barrier.wait()
+        return real_build(forecast, **kwargs)
+
+    monkeypatch.setattr(forecast_cache, "los_adjacency", slow_build)
+    cache = ForecastCache()
+    results = {}
+
+    def route(seconds):
+        results[seconds] = cache.route(fleet, seconds, "A", "C")
+
+    threads = [threading.Thread(target=route, args=(seconds,)) for seconds in (0, 600)]
+    # A third request for horizon 0 waits for the first build instead of starting its own
+    threads.append(threading.Thread(target=lambda: cache.graph(fleet, 0)))
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(builds) == 2 and results[0] and results[600]
+    assert cache.stats()["graph_misses"] == 2
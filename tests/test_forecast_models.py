@@ -0,0 +1,50 @@
+import math
+
+import numpy as np
+
+from calculate_path import extrapolate_position, extrapolate_positions
+from visibility_graph import haversine_pairs
+
+
+def test_forecast_models_agree_and_handle_missing_kinematics():
+    rng = np.random.default_rng(1)
+    lat = rng.uniform(-60, 60, 500)
+    lon = rng.uniform(-180, 180, 500)
+    velocity = rng.uniform(100, 300, 500)
+    track = rng.uniform(0, 360, 500)
+    velocity[:5] = np.nan
+    track[5:10] = np.nan
+
+    flat_lat, flat_lon = extrapolate_positions(lat, lon, velocity, track, 60.0)
+    scalar = extrapolate_position(lat[20], lon[20], velocity[20], track[20], 60.0)
+    assert np.allclose((flat_lat[20], flat_lon[20]), scalar)
+    assert np.all((flat_lon >= -180) & (flat_lon < 180))
+
+    # Over an hour the great-circle models stay within a fraction of a
+    # percent of each other; missing velocity/track keeps the position
+    sph_lat, sph_lon = extrapolate_positions(lat, lon, velocity, track, 3600.0, 'spherical')
+    ell_lat, ell_lon = extrapolate_positions(lat, lon, velocity, track, 3600.0, 'ellipsoidal')
+    assert np.allclose(sph_lat[:10], lat[:10]) and np.allclose(ell_lon[:10], lon[:10])
+    travelled = velocity[10:] * 3600.0
+    gap = haversine_pairs(sph_lat[10:], sph_lon[10:], ell_lat[10:], ell_lon[10:])
+    assert np.all(gap < 0.01 * travelled)
+
+
+def test_great_circle_models_at_pole_and_antimeridian():
+    # One degree of WGS84 equator and of meridian arc from the equator
+    lat, lon = extrapolate_positions([0.0, 0.0], [179.5, 0.0], 100.0, [90.0, 0.0],
+                                     [1113.1949, 1105.7427], 'ellipsoidal')
+    assert np.allclose(lat, [0.0, 1.0], atol=1e-5)
+    assert np.allclose(lon, [-179.5, 0.0], atol=1e-5)
+
+    # Flying north over the pole comes down the other side
+    dist = 6371000 * math.radians(2.0)
+    lat, lon = extrapolate_positions(89.0, 10.0, dist / 100.0, 0.0, 100.0, 'spherical')
+    assert abs(lat - 89.0) < 1e-6 and abs(lon - (-170.0)) < 1e-6
+    # The flat model reflects over the pole the same way instead of lat > 90
+    lat, lon = extrapolate_positions([89.0, -89.0], 10.0, dist / 100.0, [0.0, 180.0], 100.0, 'flat')
+    assert np.allclose(lat, [89.0, -89.0]) and np.allclose(lon, -170.0)
+    # Due east at 89N stays on (about) the same parallel in every model
+    for model in ('flat', 'spherical', 'ellipsoidal'):
+        lat, lon = extrapolate_positions(89.0, 0.0, 10.0, 90.0, 10.0, model)
+        assert np.isfinite(lon) and abs(lat - 89.0) < 1e-3
@@ -0,0 +1,76 @@
+import json
+
+import pytest
+
+from headless import MalformedQuery, create_app, normalize_query, read_queries, run_batch
+from synthetic_fleet import synthetic_fleet
+
+
+def _queries(fleet, n):
+    ids = fleet.icao24.tolist()
+    queries = []
+    for k in range(n):
+        queries.append({"id": k, "start": ids[k], "end": ids[-1 - k],
+                        "metric": "hops" if k % 3 == 0 else "delay", "horizon": 60 * (k % 2)})
+    return queries
+
+
+def test_pool_matches_in_process_and_reports_errors():
+    fleet = synthetic_fleet(400, seed=1)
+    queries = _queries(fleet, 40) + [{"id": "bad", "start": "x"}, {"start": "a", "end": "b", "metric": "km"}]
+
+    serial = {r["id"]: r for r in run_batch(fleet, queries, workers=1)}
+    pooled = {r["id"]: r for r in run_batch(fleet, queries, workers=2, chunk_size=8)}
+    assert serial == pooled
+    assert len(serial) == 42
+    assert "error" in serial["bad"] and "error" in serial[41]
+
+    routed = [r for r in serial.values() if r.get("path")]
+    assert routed
+    for r in routed:
+        assert r["path"][0] == r["start"] and r["path"][-1] == r["end"]
+        if r["metric"] == "hops":
+            assert r["cost"] == len(r["path"]) - 1
+
+
+def test_http_route_streams_ndjson():
+    fleet = synthetic_fleet(200, seed=2)
+    client = create_app(fleet, workers=1).test_client()
+    assert client.get("/snapshot").get_json()["aircraft"] == 200
+
+    response = client.post("/route", json={"queries": _queries(fleet, 5)})
+    assert response.mimetype == "application/x-ndjson"
+    results = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert sorted(r["id"] for r in results) == [0, 1, 2, 3, 4]
+    assert client.post("/route", json={"queries": "nope"}).status_code == 400
+
+
+def test_read_queries_accepts_list_or_lines():
+    assert read_queries(['[{"start": "a", "end": "b"}]']) == [{"start": "a", "end": "b"}]
+    assert read_queries(['{"start": "a", "end": "b"}\n', '\n', '{"start": "c", "end": "d"}\n']) == [
+        {"start": "a", "end": "b"}, {"start": "c", "end": "d"}]
+
+
+def test_malformed_lines_become_error_results():
+    fleet = synthetic_fleet(100, seed=3)
+    a, b = fleet.icao24[:2].tolist()
+    lines = [json.dumps({"id": "ok", "start": a, "end": b}) + "\n", '{"id": "cut", "start": \n',
+             json.dumps({"id": "after", "start": b, "end": a}) + "\n"]
+    results = {r["id"]: r for r in run_batch(fleet, read_queries(lines), workers=1)}
+    assert sorted(results, key=str) == [1, "after", "ok"]
+    assert "line 2" in results[1]["error"] and "error" not in results["after"]
+    assert "error" in next(run_batch(fleet, read_queries(['[{"start": "a",']), workers=1))
+
+
+def test_negative_or_non_finite_seconds_are_rejected():
+    fleet = synthetic_fleet(50, seed=4)
+    a, b = fleet.icao24[:2].tolist()
+    bad = {"horizon": -60, "extra_delay": float("nan")}
+    queries = [{"id": key, "start": a, "end": b, key: value} for key, value in bad.items()]
+    queries += [{"id": "inf", "start": a, "end": b, "horizon": float("inf")},
+                {"id": "text", "start": a, "end": b, "extra_delay": "soon"}]
+    results = {r["id"]: r for r in run_batch(fleet, queries, workers=1)}
+    assert "horizon" in results["horizon"]["error"] and "extra_delay" in results["extra_delay"]["error"]
+    assert "error" in results["inf"] and "error" in results["text"]
+    with pytest.raises(MalformedQuery):
+        normalize_query({"start": a, "end": b, "extra_delay": -1}, 0)
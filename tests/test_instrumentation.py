@@ -0,0 +1,64 @@
+import pytest
+
+from calculate_path import compute_los_path
+from instrumentation import Metrics, RequestProfiler, metrics
+
+
+PLANES = [
+    {"icao24": "A", "callsign": "A", "lat": 0.0, "lon": 0.0, "geo_alt": 100, "velocity": 200.0, "track": 90.0},
+    {"icao24": "B", "callsign": "B", "lat": 0.0, "lon": 0.3, "geo_alt": 100, "velocity": 200.0, "track": 90.0},
+    {"icao24": "C", "callsign": "C", "lat": 0.0, "lon": 0.9, "geo_alt": 100, "velocity": 200.0, "track": 90.0},
+]
+
+
+def test_disabled_metrics_record_nothing():
+    m = Metrics(enabled=False)
+    with m.timer("stage"):
+        pass
+    m.count("n", 5)
+    m.gauge("g", 1)
+    assert m.snapshot() == {"enabled": False, "timers": {}, "counters": {}, "gauges": {}}
+
+    m.enabled = True
+    with m.timer("stage"):
+        pass
+    with m.timer("stage"):
+        pass
+    timers = m.snapshot()["timers"]
+    assert timers["stage"]["count"] == 2 and timers["stage"]["max"] >= timers["stage"]["mean"]
+
+
+def test_routing_records_graph_size_and_expansions(monkeypatch):
+    monkeypatch.setattr(metrics, "enabled", True)
+    metrics.reset()
+    path = compute_los_path(PLANES, "A", "C")
+    assert [p["icao24"] for p in path] == ["A", "B", "C"]
+    report = metrics.snapshot()
+    assert report["gauges"]["graph.nodes"] == 3
+    assert report["gauges"]["graph.edges"] == 2
+    assert report["counters"]["search.expanded"] == report["gauges"]["search.last_expanded"] > 0
+    assert report["timers"]["graph_build"]["count"] == 1
+    assert report["timers"]["search"]["count"] == 1
+    metrics.reset()
+
+
+def test_profiler_only_captures_requests_that_asked():
+    with pytest.raises(RuntimeError):
+        RequestProfiler().arm()
+
+    profiler = RequestProfiler(enabled=True, keep=2)
+    token = profiler.arm(requests=2)
+    assert profiler.start() is None and profiler.start("forged") is None
+    for _ in range(2):
+        profile = profiler.start(token)
+        sum(range(1000))
+        profiler.finish(profile, "req")
+    # The token is used up
+    assert profiler.start(token) is None
+    assert len(profiler.profiles) == 2
+    assert profiler.profiles[0]["label"] == "req"
+    assert "cumulative" in profiler.profiles[0]["stats"]
+
+    other = profiler.arm()
+    profiler.disarm(other)
+    assert profiler.start(other) is None
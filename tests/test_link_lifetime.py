@@ -0,0 +1,80 @@
+import math
+
+import numpy as np
+
+from calculate_path import extrapolate_fleet, extrapolate_positions, los_distance
+from fleet import FleetSnapshot
+from link_lifetime import RouteTracker, edge_expiry, link_expiry
+from visibility_graph import haversine_pairs
+
+
+def planes(lon_b=2.0, v=200.0):
+    return FleetSnapshot.from_dicts([
+        # A and B fly apart along the equator; C sits still next to A
+        {"icao24": "A", "callsign": "A", "lat": 0.0, "lon": 0.0, "geo_alt": 5000, "velocity": v, "track": 270.0},
+        {"icao24": "B", "callsign": "B", "lat": 0.0, "lon": lon_b, "geo_alt": 5000, "velocity": v, "track": 90.0},
+        {"icao24": "C", "callsign": "C", "lat": 0.1, "lon": 0.0, "geo_alt": 5000, "velocity": None, "track": None},
+    ])
+
+
+def test_link_expiry_matches_closed_form():
+    fleet = planes()
+    limit = los_distance(5000, 5000)
+    d0 = 6371000 * math.radians(2.0)
+    expected = (limit - d0) / (2 * 200.0)
+    expiry = link_expiry(fleet, [0, 0], [1, 2])
+    assert abs(expiry[0] - expected) <= 0.5
+    # A moves away from the stationary C at 200 m/s
+    assert 0 < expiry[1] < np.inf
+    # Links that never break within the horizon, or are already down
+    assert link_expiry(planes(v=0.0), [0], [1])[0] == np.inf
+    assert link_expiry(planes(lon_b=10.0), [0], [1])[0] == 0
+
+
+def test_edge_expiry_forwards_the_forecast_model():
+    # Near the pole an eastbound great circle bends away from the parallel
+    fleet = FleetSnapshot.from_dicts([
+        {"icao24": "A", "callsign": "A", "lat": 85.0, "lon": 0.0, "geo_alt": 10000, "velocity": 250.0, "track": 90.0},
+        {"icao24": "B", "callsign": "B", "lat": 85.0, "lon": 2.0, "geo_alt": 10000, "velocity": None, "track": None},
+    ])
+    expiries = {}
+    for model in ("flat", "spherical", "ellipsoidal"):
+        i, j, _, expiry = edge_expiry(fleet, model=model)
+        assert np.array_equal(expiry, link_expiry(fleet, i, j, model=model))
+        expiries[model] = expiry[0]
+    assert abs(expiries["flat"] - expiries["spherical"]) > 60
+
+
+def test_link_expiry_finds_the_first_break_of_a_returning_link():
+    # Under the flat model an eastbound aircraft near the pole circles it:
+    # A closes on the stationary B, passes it and pulls away, out of range
+    # for a while before it comes around again
+    fleet = FleetSnapshot.from_dicts([
+        {"icao24": "A", "callsign": "A", "lat": 89.5, "lon": 0.0, "geo_alt": 100, "velocity": 250.0, "track": 90.0},
+        {"icao24": "B", "callsign": "B", "lat": 89.85, "lon": 0.0, "geo_alt": 100, "velocity": None, "track": None},
+    ])
+    t = np.arange(0.0, 3600.0, 0.25)
+    lat, lon = extrapolate_positions(fleet.lat[0], fleet.lon[0], fleet.velocity[0], fleet.track[0], t)
+    d = haversine_pairs(lat, lon, fleet.lat[1], fleet.lon[1])
+    out = d > los_distance(100, 100)
+    # Up at the start and again later: the break is only a window
+    assert not out[0] and out.any() and not out[-1]
+    first_break = t[np.argmax(out)]
+    assert abs(link_expiry(fleet, [0], [1])[0] - first_break) <= 1.0
+
+
+def test_route_tracker_reuses_until_first_link_breaks():
+    fleet = planes(lon_b=0.5, v=100.0)
+    tracker = RouteTracker()
+    first = tracker.route(fleet, "A", "B", at=0.0)
+    assert first["ids"] == ["A", "B"] and not first["reused"]
+    lifetime = first["valid_for"]
+
+    later = tracker.route(extrapolate_fleet(fleet, lifetime / 2), "A", "B", at=lifetime / 2)
+    assert later["reused"]
+    assert abs(later["valid_for"] - lifetime / 2) <= 1.0
+
+    # A-B is out of range by then; rerouted through the stationary C
+    rerouted = tracker.route(extrapolate_fleet(fleet, lifetime + 60), "A", "B", at=lifetime + 60)
+    assert rerouted["ids"] == ["A", "C", "B"] and not rerouted["reused"]
+    assert tracker.stats()["reused"] == 1 and tracker.stats()["recomputed"] == 2
@@ -0,0 +1,29 @@
+import numpy as np
+
+from map_view import decimate, in_view, view_bounds
+from synthetic_fleet import synthetic_fleet
+
+
+def test_view_bounds_wrap_the_antimeridian():
+    corners = [[170.0, 10.0], [190.0, 10.0], [190.0, -10.0], [170.0, -10.0]]
+    bounds = view_bounds({"center": {"lat": 0, "lon": 180}, "zoom": 3, "coordinates": corners}, margin=0.0)
+    assert bounds == (-10.0, 10.0, 170.0, -170.0)
+    mask = in_view(np.zeros(4), np.array([175.0, -175.0, 160.0, 0.0]), bounds)
+    assert mask.tolist() == [True, True, False, False]
+
+    # Zoomed all the way out: every longitude is in view
+    assert view_bounds({"center": {"lat": 0, "lon": 0}, "zoom": 0})[2:] == (-180.0, 180.0)
+
+
+def test_decimate_clusters_at_low_zoom_and_keeps_every_aircraft():
+    fleet = synthetic_fleet(3000, seed=2)
+    world = {"center": {"lat": 60, "lon": -100}, "zoom": 0}
+    rows, clusters = decimate(fleet.lat, fleet.lon, world, max_markers=500)
+    assert len(clusters["count"]) and len(rows) + clusters["count"].sum() == len(fleet)
+    assert len(rows) + len(clusters["count"]) <= 500
+
+    # Zoomed in: only the aircraft in view, drawn individually
+    close = {"center": {"lat": 45.3, "lon": -75.7}, "zoom": 9}
+    rows, clusters = decimate(fleet.lat, fleet.lon, close, max_markers=500)
+    assert not len(clusters["count"]) and 0 < len(rows) < len(fleet)
+    assert np.all(np.abs(fleet.lat[rows] - 45.3) < 2) and np.all(np.abs(fleet.lon[rows] + 75.7) < 3)
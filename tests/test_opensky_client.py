@@ -0,0 +1,116 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from opensky_client import OpenSkyClient
+from state_stream import parse_states
+
+STATES = [
+    ["abc123", "ACA1    ", "Canada", 0, 0, -75.0, 45.0, 10000, False, 230.0, 90.0, 0, None, 10200, None, False, 0],
+]
+
+
+class FakeOpenSky(BaseHTTPRequestHandler):
+    """
+    Stand-in for the OpenSky token and /states/all endpoints.
+    server.failures: statuses to return (in order) before succeeding.
+    """
+
+    def log_message(self, *args):
+        pass
+
+    def _reply(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        self.server.token_requests += 1
+        token = f"token-{self.server.token_requests}"
+        self.server.valid_tokens.add(token)
+        self._reply(200, {"access_token": token, "expires_in": self.server.expires_in})
+
+    def do_GET(self):
+        self.server.state_requests += 1
+        if self.server.failures:
+            self._reply(self.server.failures.pop(0), {})
+            return
+        token = self.headers.get("Authorization", "").removeprefix("Bearer ")
+        if token not in self.server.valid_tokens:
+            self._reply(401, {})
+            return
+        self._reply(200, {"time": 1700000000, "states": STATES})
+
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), FakeOpenSky)
+    httpd.token_requests = 0
+    httpd.state_requests = 0
+    httpd.valid_tokens = set()
+    httpd.failures = []
+    httpd.expires_in = 300
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def make_client(server, **kwargs):
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    return OpenSkyClient("id", "secret", token_url=base + "/token", api_url=base + "/api",
+                         backoff_factor=0, **kwargs)
+
+
+def test_token_is_cached_between_fetches(server):
+    with make_client(server) as client:
+        for _ in range(3):
+            assert client.get_states()["states"] == STATES
+    assert server.token_requests == 1
+    assert server.state_requests == 3
+
+
+def test_token_refreshed_near_expiry(server):
+    server.expires_in = 10
+    with make_client(server, expiry_margin=30) as client:
+        client.get_states()
+        client.get_states()
+    assert server.token_requests == 2
+
+
+def test_revoked_token_triggers_one_refresh(server):
+    with make_client(server) as client:
+        client.get_states()
+        server.valid_tokens.clear()
+        assert client.get_states()["time"] == 1700000000
+    assert server.token_requests == 2
+
+
+def test_transient_errors_are_retried(server):
+    server.failures = [503, 502]
+    with make_client(server, retries=3) as client:
+        assert client.get_states()["states"] == STATES
+    assert server.state_requests == 3
+
+    server.failures = [503] * 5
+    with make_client(server, retries=2) as client:
+        with pytest.raises(requests.HTTPError):
+            client.get_states()
+
+
+def test_streamed_states_after_token_revocation(server):
+    with make_client(server) as client:
+        client.get_states()
+        server.valid_tokens.clear()
+        with client.states_stream() as response:
+            fleet = parse_states(response.iter_content(16), chunk_bytes=32)
+    assert fleet.icao24.tolist() == ["abc123"] and fleet.timestamp == 1700000000
+    assert server.token_requests == 2
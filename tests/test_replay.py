@@ -0,0 +1,51 @@
+import numpy as np
+
+from calculate_path import compute_los_path, extrapolate_fleet
+from fleet import FleetSnapshot
+from replay import choose_pairs, interpolate_snapshots, run_replay
+from snapshot_archive import SnapshotArchive
+from synthetic_fleet import synthetic_fleet
+
+
+def test_interpolation_blends_shared_aircraft_and_moves_the_rest():
+    a = FleetSnapshot(["x", "y", "gone"], ["", "", ""], [10.0, 0.0, 5.0], [179.0, 0.0, 0.0],
+                      [1000.0, 0.0, 0.0], [0.0, 0.0, 200.0], [350.0, 0.0, 0.0], timestamp=100.0)
+    b = FleetSnapshot(["new", "y", "x"], ["", "", ""], [1.0, 2.0, 12.0], [0.0, 0.0, -179.0],
+                      [0.0, 0.0, 3000.0], [0.0, 0.0, 0.0], [0.0, 0.0, 10.0], timestamp=110.0)
+    mid = interpolate_snapshots(a, b, 105.0)
+    assert mid.timestamp == 105.0 and sorted(mid.icao24.tolist()) == ["gone", "new", "x", "y"]
+
+    x = mid.get("x")
+    assert np.isclose(x["lat"], 11.0) and np.isclose(abs(x["lon"]), 180.0)  # across the antimeridian
+    assert np.isclose(x["geo_alt"], 2000.0) and np.isclose(x["track"], 0.0)
+    assert np.isclose(mid.get("y")["lat"], 1.0)
+    # Only in a: 5 s north at 200 m/s
+    assert np.isclose(mid.get("gone")["lat"], 5.0 + np.degrees(1000.0 / 6371000), atol=1e-6)
+    assert mid.get("new")["lat"] == 1.0
+
+
+def test_replay_matches_per_snapshot_routing_serial_and_parallel(tmp_path):
+    archive = SnapshotArchive(str(tmp_path / "archive"))
+    fleet = synthetic_fleet(300, seed=5)
+    for k in range(6):
+        archive.append(extrapolate_fleet(fleet, 30 * k), 1000.0 + 30 * k)
+    pairs = choose_pairs(fleet, 8, seed=1)
+
+    serial = run_replay(archive, pairs, workers=1)
+    pooled = run_replay(archive, pairs, workers=2, slice_ticks=2)
+    assert serial.times.tolist() == [1000.0 + 30 * k for k in range(6)]
+    assert np.array_equal(serial.hops, pooled.hops)
+    assert np.allclose(serial.delay, pooled.delay, equal_nan=True)
+
+    snapshot = archive.load(3)
+    for k, (start, end) in enumerate(pairs):
+        path = compute_los_path(snapshot, start, end)
+        assert serial.hops[3, k] == (-1 if path is None else len(path) - 1)
+
+    summary = serial.summary()
+    assert summary["ticks"] == 6 and summary["overall"]["observed"] == 6 * len(pairs)
+    assert summary["overall"]["available"] == int((serial.hops >= 0).sum())
+
+    # Ticks between snapshots see interpolated positions
+    fine = run_replay(archive, pairs, step=10, workers=1)
+    assert len(fine.times) == 16 and fine.present.all()
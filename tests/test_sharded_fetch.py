@@ -0,0 +1,122 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+from opensky_client import OpenSkyClient
+from sharded_fetch import ShardBudget, ShardedFetcher, credit_cost, merge_shards, split_bbox
+
+
+def state(icao24, lat, lon, time_position):
+    return [icao24, "", "x", time_position, 0, lon, lat, 9000, False, 230.0, 90.0, 0, None, 9500, None, False, 0]
+
+
+# "dup" is in both western boxes; the eastern copy has the newer position
+STATES = [
+    state("w1", 50.0, -120.0, 100), state("dup", 50.0, -100.5, 100),
+    state("e1", 50.0, -80.0, 104), state("dup", 50.1, -100.5, 107),
+    state("n1", 70.0, -70.0, None),
+]
+
+
+class LaggyOpenSky(BaseHTTPRequestHandler):
+    """
+    Stand-in OpenSky: /states/all returns the STATES inside the requested
+    bbox (edges included) after server.latency seconds.
+    """
+
+    def log_message(self, *args):
+        pass
+
+    def _reply(self, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        self._reply({"access_token": "token", "expires_in": 300})
+
+    def do_GET(self):
+        time.sleep(self.server.latency)
+        box = {k: float(v[0]) for k, v in parse_qs(urlparse(self.path).query).items()}
+        with self.server.lock:
+            self.server.state_requests += 1
+        inside = [s for s in STATES if box["lamin"] <= s[6] <= box["lamax"] and box["lomin"] <= s[5] <= box["lomax"]]
+        self._reply({"time": 1700000000 + len(inside), "states": inside})
+
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), LaggyOpenSky)
+    httpd.latency = 0.0
+    httpd.state_requests = 0
+    httpd.lock = threading.Lock()
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def make_client(server):
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    return OpenSkyClient("id", "secret", token_url=base + "/token", api_url=base + "/api", backoff_factor=0)
+
+
+def test_shards_fetch_concurrently_and_keep_the_freshest_copy(server):
+    server.latency = 0.4
+    # Two overlapping western boxes, one eastern box, one disjoint arctic box
+    shards = [
+        {"lamin": 40.0, "lamax": 60.0, "lomin": -130.0, "lomax": -100.0},
+        {"lamin": 40.0, "lamax": 60.0, "lomin": -101.0, "lomax": -75.0},
+        {"lamin": 40.0, "lamax": 60.0, "lomin": -75.0, "lomax": -60.0},
+        {"lamin": 65.0, "lamax": 75.0, "lomin": -75.0, "lomax": -65.0},
+    ]
+    with make_client(server) as client:
+        fetcher = ShardedFetcher(client, shards)
+        t0 = time.perf_counter()
+        fleet = fetcher.fetch()
+        elapsed = time.perf_counter() - t0
+        fetcher.close()
+
+    assert server.state_requests == 4 and elapsed < 2 * server.latency
+    assert sorted(fleet.icao24.tolist()) == ["dup", "e1", "n1", "w1"]
+    assert fleet.get("dup")["lat"] == 50.1
+    assert fetcher.time_position[fleet.row_of("dup")] == 107
+    assert fleet.timestamp == 1700000000 + 3
+
+
+def test_budget_skips_shards_and_reuses_their_last_result(server):
+    now = [0.0]
+    clock = lambda: now[0]
+    small = {"lamin": 45.0, "lamax": 55.0, "lomin": -125.0, "lomax": -115.0}  # 100 sq deg: 2 credits
+    large = {"lamin": 40.0, "lamax": 60.0, "lomin": -101.0, "lomax": -75.0}   # 520 sq deg: 4 credits
+    assert (credit_cost(small), credit_cost(large)) == (2, 4)
+
+    # 4 credits per 40 s for the small shard, at most one fetch per 5 s for the large one
+    budgets = [ShardBudget(4, period=40, clock=clock), ShardBudget(400, min_interval=5, clock=clock)]
+    with make_client(server) as client:
+        fetcher = ShardedFetcher(client, [small, large], budgets)
+        counts = []
+        for t in (0, 1, 2, 22):
+            now[0] = t
+            fleet = fetcher.fetch()
+            counts.append(server.state_requests)
+            # Skipped shards still contribute their last result
+            assert sorted(fleet.icao24.tolist()) == ["dup", "e1", "w1"]
+        fetcher.close()
+    # t=0 both; t=1 small only; t=2 neither (small is out of credits); t=22 both again
+    assert counts == [2, 3, 3, 5]
+
+
+def test_merge_and_split_helpers():
+    boxes = split_bbox({"lamin": 40.0, "lamax": 80.0, "lomin": -150.0, "lomax": -50.0}, 2, 4)
+    assert len(boxes) == 8 and boxes[0] == {"lamin": 40.0, "lamax": 60.0, "lomin": -150.0, "lomax": -125.0}
+    assert merge_shards([])[0].icao24.tolist() == []
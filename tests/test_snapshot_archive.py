@@ -0,0 +1,85 @@
+import pickle
+
+import numpy as np
+import pytest
+
+from fleet import FleetSnapshot
+from snapshot_archive import SnapshotArchive, import_pickles, load_pickle
+
+
+def make_fleet(n, seed, timestamp):
+    rng = np.random.default_rng(seed)
+    return FleetSnapshot(
+        [f"{k:06x}" for k in range(n)],
+        [f"ACA{k}" if k % 2 else None for k in range(n)],
+        rng.uniform(40, 85, n), rng.uniform(-150, -50, n), rng.uniform(0, 12000, n),
+        rng.uniform(100, 260, n), rng.uniform(0, 360, n),
+        timestamp=timestamp,
+    )
+
+
+def test_append_load_and_range(tmp_path):
+    archive = SnapshotArchive(str(tmp_path / "archive"), rows_per_chunk=25)
+    fleets = [make_fleet(10 + k, k, 1000.0 + 10 * k) for k in range(6)]
+    for fleet in fleets:
+        archive.append(fleet)
+
+    assert len(archive) == 6
+    assert len({int(c) for c in archive.index()["chunk"]}) > 1
+    loaded = archive.load(3)
+    assert loaded.timestamp == 1030.0
+    assert loaded.icao24.tolist() == fleets[3].icao24.tolist()
+    assert loaded.callsign.tolist() == fleets[3].callsign.tolist()
+    assert np.array_equal(loaded.lat, fleets[3].lat)
+    assert np.allclose(loaded.geo_alt, fleets[3].geo_alt, rtol=1e-6)
+
+    window = list(archive.range(1010, 1035))
+    assert [f.timestamp for f in window] == [1010.0, 1020.0, 1030.0]
+    assert archive.latest().timestamp == 1050.0
+
+
+def test_partial_append_is_ignored(tmp_path):
+    archive = SnapshotArchive(str(tmp_path / "archive"))
+    archive.append(make_fleet(5, 0, 1.0))
+    # Simulate a crash after column data was written but before the index record
+    with open(tmp_path / "archive" / "chunk_000000" / "lat.bin", "ab") as f:
+        f.write(b"\x00" * 64)
+    archive.append(make_fleet(7, 1, 2.0))
+    assert np.array_equal(archive.load(1).lat, make_fleet(7, 1, 2.0).lat)
+
+
+def test_import_legacy_pickles(tmp_path):
+    states = [
+        ["abc123", "ACA1    ", "CA", 0, 0, -75.0, 45.0, 10000, False, 230.0, 90.0, 0, None, 10200, None, False, 0],
+        ["def456", "WJA2    ", "CA", 0, 0, -76.0, 46.0, 0, True, 0.0, 0.0, 0, None, 0, None, False, 0],
+    ]
+    raw = tmp_path / "planes_canada.pkl"
+    with open(raw, "wb") as f:
+        pickle.dump({"time": 500, "states": states}, f)
+    dicts = tmp_path / "planes_20250101_000000.pkl"
+    with open(dicts, "wb") as f:
+        pickle.dump([{"icao24": "abc123", "callsign": "ACA1", "lat": 45.1, "lon": -75.1, "geo_alt": 10000,
+                      "velocity": 230.0, "track": 90.0}], f)
+
+    assert load_pickle(raw).icao24.tolist() == ["abc123"]
+    archive = SnapshotArchive(str(tmp_path / "archive"))
+    assert import_pickles(archive, [str(raw), str(dicts)]) == 2
+    assert archive.load(0).timestamp == 500.0
+    assert archive.load(0)[0]["geo_alt"] == 10200
+
+
+def test_strings_are_replaced_or_rejected_not_truncated(tmp_path):
+    archive = SnapshotArchive(str(tmp_path / "archive"))
+    fleet = make_fleet(2, 0, 1.0)
+    fleet.callsign = np.array(["ÆGIR1", "ACA1"])
+    archive.append(fleet)
+    assert archive.load(0).callsign.tolist() == ["?GIR1", "ACA1"]
+
+    fleet = make_fleet(2, 1, 2.0)
+    fleet.icao24 = np.array(["abc123", "abc123456"])
+    with pytest.raises(ValueError, match="icao24 'abc123456'"):
+        archive.append(fleet)
+    # Nothing of the rejected snapshot was written
+    assert len(archive) == 1
+    archive.append(make_fleet(3, 2, 3.0))
+    assert archive.load(1).icao24.tolist() == make_fleet(3, 2, 3.0).icao24.tolist()
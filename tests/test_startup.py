@@ -0,0 +1,141 @@
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import numpy as np
+
+from fleet import FleetSnapshot
+from forecast_cache import ForecastCache
+from link_lifetime import RouteTracker
+
+SRC = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+
+# Import budget for the GUI module (what src/main.py pays before serving)
+STARTUP_BUDGET_SECONDS = 4.0
+
+
+def test_gui_import_is_offline_and_within_budget():
+    code = (
+        "import time; t = time.perf_counter(); import map_GUI, update_planes; "
+        "print(time.perf_counter() - t, update_planes._client is None, len(map_GUI.feed.current()))"
+    )
+    out = subprocess.run([sys.executable, "-c", code], cwd=SRC, capture_output=True, text=True, check=True)
+    elapsed, no_client, n_planes = out.stdout.split()
+    assert no_client == "True"
+    assert n_planes == "0"
+    assert float(elapsed) < STARTUP_BUDGET_SECONDS
+
+
+def test_first_fetch_runs_in_background(monkeypatch):
+    import map_GUI
+    from fleet_feed import FleetFeed
+
+    release = threading.Event()
+    fetched = FleetSnapshot.from_dicts([
+        {"icao24": "B", "lat": 45.0, "lon": -75.0},
+        {"icao24": "A", "lat": 46.0, "lon": -76.0},
+    ])
+
+    def slow_get_planes():
+        release.wait(5)
+        return fetched
+
+    monkeypatch.setattr(map_GUI, "get_planes", slow_get_planes)
+    archived = FleetSnapshot.from_dicts([{"icao24": "A", "lat": 0.0, "lon": 0.0}])
+    monkeypatch.setattr(map_GUI, "feed", FleetFeed(map_GUI.fetch_planes, initial=archived))
+
+    started = time.perf_counter()
+    map_GUI.start_feed()
+    assert time.perf_counter() - started < 1.0
+    assert not map_GUI.feed.ready.is_set()
+    assert map_GUI.feed.current() is archived
+
+    release.set()
+    assert map_GUI.feed.ready.wait(5)
+    assert map_GUI.feed.current() is fetched
+
+
+def test_sessions_keep_their_own_selections(monkeypatch):
+    import map_GUI
+
+    # Fresh shared caches, so routes cached by other tests are not reused
+    monkeypatch.setattr(map_GUI, "forecast_cache", ForecastCache(model=map_GUI.FORECAST_MODEL))
+    monkeypatch.setattr(map_GUI, "route_tracker", RouteTracker(model=map_GUI.FORECAST_MODEL))
+
+    fleet = FleetSnapshot.from_dicts([
+        {"icao24": "A", "lat": 45.0, "lon": -75.0, "geo_alt": 10000},
+        {"icao24": "B", "lat": 45.0, "lon": -74.0, "geo_alt": 10000},
+        {"icao24": "C", "lat": 46.0, "lon": -75.0, "geo_alt": 10000},
+    ])
+
+    def click(session, icao, mode):
+        points = {"points": [{"curveNumber": 0, "customdata": icao}]}
+        return map_GUI.update_session_map(fleet, "map", points, 0, None, mode, session)[2]
+
+    first = click(click(map_GUI.new_session(), "A", "start"), "B", "end")
+    second = click(map_GUI.new_session(), "C", "start")
+    assert (first["start"], first["end"], second["start"], second["end"]) == ("A", "B", "C", None)
+
+    # Calculate routes only the session that asked; a refreshed snapshot
+    # keeps the selections because they are icao24s
+    _, info, first = map_GUI.update_session_map(fleet, "calc-btn", None, 0, None, None, first)
+    assert first["route"] == ["A", "B"] and info.startswith("Path valid")
+    refreshed = FleetSnapshot.from_dicts(fleet.to_dicts()[::-1])
+    patch, _, first = map_GUI.update_session_map(refreshed, "snapshot-poll", None, 0, None, None, first)
+    assert first["snapshot"] == refreshed.fingerprint and first["start"] == "A"
+
+
+def _assigned(patch):
+    return {tuple(op["location"]): op["params"]["value"] for op in patch.to_plotly_json()["operations"]}
+
+
+def test_frames_reuse_the_polled_snapshots_forecast(monkeypatch):
+    import map_GUI
+
+    cache = ForecastCache(model=map_GUI.FORECAST_MODEL)
+    monkeypatch.setattr(map_GUI, "forecast_cache", cache)
+    fleet = FleetSnapshot.from_dicts([
+        {"icao24": "A", "lat": 45.0, "lon": -75.0, "geo_alt": 10000, "velocity": 200.0, "track": 0.0},
+        {"icao24": "B", "lat": 45.0, "lon": -74.0, "geo_alt": 10000},
+    ])
+
+    session = map_GUI.new_session()
+    for t, dlat in ((10.0, 0.01), (12.0, 0.02)):
+        frame = (t, np.array([dlat, 0.0]), np.zeros(2))
+        patch, _, session = map_GUI.update_session_map(fleet, "snapshot-poll", None, 600, None, None, session,
+                                                       frame=frame)
+        forecast = cache.forecast(fleet, 600)
+        # Drawn on the frame, forecast and graph keyed on the polled snapshot
+        assert np.allclose(_assigned(patch)[("data", 0, "lat")], forecast.lat + [dlat, 0.0])
+        assert session["frame"] == t and session["snapshot"] == fleet.fingerprint
+    # The second frame only moved the aircraft (no labels, colors or clusters)
+    assert {location for location in _assigned(patch) if location[1] in (0, 3)} == {
+        ("data", 0, "lat"), ("data", 0, "lon")}
+    assert cache.stats()["forecast_misses"] == 1
+
+
+def test_profiling_is_opt_in_and_armed_by_post(monkeypatch):
+    import map_GUI
+
+    # No feed: these requests only exercise the profiling routes
+    monkeypatch.setattr(map_GUI, "start_feed", lambda: None)
+    client = map_GUI.server.test_client()
+    assert client.get("/metrics/profile").status_code == 404
+    assert client.post("/metrics/profile").status_code == 404
+
+    monkeypatch.setattr(map_GUI.profiler, "enabled", True)
+    assert client.post("/metrics/profile?requests=1").status_code == 200
+    token = client.get_cookie(map_GUI.PROFILE_COOKIE).value
+    # Only a request presenting this browser's token is profiled
+    assert map_GUI.profiler.start("another browser") is None
+    profile = map_GUI.profiler.start(token)
+    assert profile is not None
+    map_GUI.profiler.finish(profile, "callback")
+    assert map_GUI.profiler.start(token) is None
+
+    client.post("/metrics/profile")
+    token = client.get_cookie(map_GUI.PROFILE_COOKIE).value
+    client.delete("/metrics/profile")
+    assert map_GUI.profiler.start(token) is None and client.get_cookie(map_GUI.PROFILE_COOKIE) is None
@@ -0,0 +1,47 @@
+import json
+import os
+
+import numpy as np
+import pytest
+
+from fleet import FleetSnapshot
+from state_stream import WHOLE_PAYLOAD_BYTES, StateStreamParser, iter_bytes, parse_states
+
+# Synthetic /states/all payload in the wire format (not a real capture)
+FIXTURE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "opensky_states.json")
+
+
+def assert_same(a, b):
+    assert a.timestamp == b.timestamp
+    assert a.icao24.tolist() == b.icao24.tolist() and a.callsign.tolist() == b.callsign.tolist()
+    for name in ("lat", "lon", "geo_alt", "velocity", "track"):
+        assert np.array_equal(getattr(a, name), getattr(b, name), equal_nan=True), name
+
+
+@pytest.mark.parametrize("piece,chunk_bytes,whole_bytes", [
+    (1, 512, 0), (4096, 2000, 0), (1 << 16, 1 << 20, 0),
+    # Small payloads are decoded whole; streaming starts past whole_bytes
+    (4096, 2000, None), (4096, 2000, 10000),
+])
+def test_stream_matches_decoded_payload(piece, chunk_bytes, whole_bytes):
+    with open(FIXTURE, "rb") as f:
+        payload = f.read()
+    data = json.loads(payload)
+    expected = FleetSnapshot.from_states(data["states"], timestamp=data["time"])
+    parser = StateStreamParser(chunk_bytes=chunk_bytes, whole_bytes=WHOLE_PAYLOAD_BYTES if whole_bytes is None else whole_bytes)
+    for chunk in iter_bytes(payload, piece):
+        parser.feed(chunk)
+    assert_same(parser.close(), expected)
+    assert parser.streamed == (whole_bytes is not None and len(payload) > whole_bytes)
+
+
+@pytest.mark.parametrize("whole_bytes", [0, WHOLE_PAYLOAD_BYTES])
+def test_stream_handles_empty_and_reordered_payloads(whole_bytes):
+    assert len(parse_states([b'{"time":5,"states":null}'], whole_bytes=whole_bytes)) == 0
+    fleet = parse_states([b'{"states": [ ["a", null, "x", 1, 2, 3.0, 4.0, 1, false, 2, 3, 0, [7, 8], null,',
+                          b' null, false, 0], ["b", "G", "x", 1, 2, 3.0, 4.0, 1, true, 2, 3, 0, null, 9,'
+                          b' null, false, 0] ] , "time" : 7}'], chunk_bytes=8, whole_bytes=whole_bytes)
+    assert fleet.timestamp == 7 and fleet.icao24.tolist() == ["a"] and fleet.callsign.tolist() == [""]
+    assert fleet.geo_alt[0] == 0 and fleet.velocity[0] == 2
+    with pytest.raises(ValueError):
+        parse_states([b'{"time": 1}'], whole_bytes=whole_bytes)
@@ -0,0 +1,33 @@
+import numpy as np
+
+from benchmarks import bench_size, check_thresholds
+from synthetic_fleet import CANADA_BBOX, synthetic_fleet
+
+
+def test_synthetic_fleet_is_seeded_and_in_range():
+    a = synthetic_fleet(2000, seed=3)
+    b = synthetic_fleet(2000, seed=3)
+    assert len(a) == 2000
+    assert np.array_equal(a.lat, b.lat) and np.array_equal(a.track, b.track)
+    assert not np.array_equal(a.lat, synthetic_fleet(2000, seed=4).lat)
+
+    lat_min, lat_max, lon_min, lon_max = CANADA_BBOX
+    assert np.all((a.lat >= lat_min) & (a.lat <= lat_max))
+    assert np.all((a.lon >= lon_min) & (a.lon <= lon_max))
+    assert np.all((a.geo_alt >= 300) & (a.geo_alt <= 13000))
+    assert np.all((a.track >= 0) & (a.track < 360))
+    # Most traffic is at cruise
+    assert np.median(a.geo_alt) > 8000
+    assert len(set(a.icao24.tolist())) == 2000
+
+
+def test_benchmark_stages_and_threshold_check():
+    results = bench_size(60, repeat=1, queries=3)
+    stages = {r["stage"] for r in results}
+    assert {"extrapolate_position", "extrapolate_fleet", "graph_build",
+            "dijkstra/delay", "dijkstra/hops", "bfs/hops", "astar/delay"} <= stages
+
+    report = {"results": results}
+    assert check_thresholds(report, {"graph_build": {"60": 1e9}}) == []
+    failures = check_thresholds(report, {"graph_build": {"60": 0.0}, "bfs/hops": {"999": 0.0}})
+    assert [f[:2] for f in failures] == [("graph_build", 60)]
@@ -0,0 +1,51 @@
+import numpy as np
+
+from calculate_path import compute_los_path
+from terrain import DEMTiles, TerrainLOS, tile_name
+
+RIDGE_LON = -75.5
+
+
+def write_tile(directory, lat0, lon0, heights):
+    np.asarray(heights, dtype=">i2").tofile(str(directory / tile_name(lat0, lon0)))
+
+
+def ridge_dem(tmp_path, max_tiles=8):
+    # 3000 m ridge running north-south through N45W076, flat elsewhere
+    n = 121
+    lon = -76 + np.arange(n) / (n - 1)
+    heights = np.where(np.abs(lon - RIDGE_LON) < 0.05, 3000, 0)[None, :].repeat(n, axis=0)
+    heights[0, 0] = -32768  # void
+    write_tile(tmp_path, 45, -76, heights)
+    write_tile(tmp_path, 46, -76, np.full((n, n), 100))
+    return DEMTiles(str(tmp_path), max_tiles=max_tiles)
+
+
+def test_elevation_lookup_and_lru(tmp_path):
+    dem = ridge_dem(tmp_path, max_tiles=1)
+    h = dem.elevation([45.5, 45.5, 46.5, 10.0, 46.0 - 1e-9], [RIDGE_LON, -75.9, -75.5, 0.0, -76.0])
+    assert h[0] == 3000 and h[1] == 0 and h[2] == 100 and h[3] == 0
+    assert h[4] == 0  # void reads as sea level
+    assert len(dem) == 1
+    assert dem.counters["evictions"] >= 1
+
+
+def test_terrain_blocks_low_links_only(tmp_path):
+    los = TerrainLOS(ridge_dem(tmp_path), step=500.0)
+    lat = [45.5, 45.5, 45.5, 45.5]
+    lon = [-75.9, -75.1, -75.9, -75.1]
+    alt = [1000, 1000, 10000, 10000]
+    keep = los(lat, lon, alt, [0, 2, 0], [1, 3, 2])
+    assert keep.tolist() == [False, True, True]
+
+
+def test_route_detours_over_terrain(tmp_path):
+    planes = [
+        {"icao24": "A", "callsign": "A", "lat": 45.5, "lon": -75.9, "geo_alt": 1000, "velocity": None, "track": None},
+        {"icao24": "B", "callsign": "B", "lat": 45.5, "lon": -75.1, "geo_alt": 1000, "velocity": None, "track": None},
+        {"icao24": "C", "callsign": "C", "lat": 45.6, "lon": -75.5, "geo_alt": 9000, "velocity": None, "track": None},
+    ]
+    direct = compute_los_path(planes, "A", "B")
+    assert [p["icao24"] for p in direct] == ["A", "B"]
+    terrain = compute_los_path(planes, "A", "B", los_predicate=TerrainLOS(ridge_dem(tmp_path)))
+    assert [p["icao24"] for p in terrain] == ["A", "C", "B"]
@@ -0,0 +1,84 @@
+import numpy as np
+
+from calculate_path import extrapolate_positions
+from fleet import FleetSnapshot
+from track_store import TrackStore
+from visibility_graph import haversine_pairs
+
+N = 500
+
+
+def flights(seed=0):
+    rng = np.random.default_rng(seed)
+    return (rng.uniform(40, 60, N), rng.uniform(-120, -60, N), rng.uniform(150, 250, N), rng.uniform(0, 360, N))
+
+
+def test_filter_beats_raw_samples_and_moves_smoothly_between_polls():
+    lat0, lon0, speed, track = flights()
+    ids = [f"{k:06x}" for k in range(N)]
+    rng = np.random.default_rng(1)
+    store = TrackStore()
+    for k in range(10):
+        lat, lon = extrapolate_positions(lat0, lon0, speed, track, 10.0 * k, 'spherical')
+        noisy = FleetSnapshot(ids, [""] * N, lat + rng.normal(0, 150, N) / 111000,
+                              lon + rng.normal(0, 150, N) / (111000 * np.cos(np.radians(lat))),
+                              np.full(N, 10000.0), speed + rng.normal(0, 5, N), track + rng.normal(0, 2, N),
+                              timestamp=10.0 * k)
+        before = store.at(10.0 * k) if k else None
+        store.update(noisy)
+        if before is not None:
+            # The update is blended in: nothing jumps on screen
+            assert np.max(haversine_pairs(before.lat, before.lon, *_at(store, 10.0 * k))) < 1.0
+
+    raw_error = haversine_pairs(noisy.lat, noisy.lon, lat, lon)
+    filtered = store.at(90.0)
+    assert np.median(haversine_pairs(filtered.lat, filtered.lon, lat, lon)) < 0.8 * np.median(raw_error)
+
+    # Halfway to the next poll, positions follow the true flight path
+    true_lat, true_lon = extrapolate_positions(lat0, lon0, speed, track, 95.0, 'spherical')
+    midway = store.at(95.0)
+    assert np.median(haversine_pairs(midway.lat, midway.lon, true_lat, true_lon)) < 150.0
+
+
+def _at(store, t):
+    s = store.at(t)
+    return s.lat, s.lon
+
+
+def test_tracks_start_coast_and_expire():
+    store = TrackStore(max_age=60.0, max_coast=30.0)
+    first = FleetSnapshot(["a", "b"], ["", "B"], [45.0, 46.0], [-75.0, -76.0], [1e4, 1e4],
+                          [200.0, np.nan], [90.0, np.nan], timestamp=0.0)
+    store.update(first)
+    assert len(store) == 2
+    # b has no velocity yet and stays put; a coasts east for at most max_coast
+    later = store.at(100.0)
+    assert later.lat[1] == 46.0 and later.lon[1] == -76.0
+    assert np.isclose(haversine_pairs(45.0, -75.0, later.lat[0], later.lon[0]), 200.0 * 30.0, rtol=1e-3)
+
+    # b moves 2 km north over 10 s: its velocity is estimated from positions
+    second = FleetSnapshot(["b", "c"], ["B", ""], [46.0 + 2000 / 6371000 * 180 / np.pi, 50.0], [-76.0, -80.0],
+                           [1e4, 1e4], [np.nan, 100.0], [np.nan, 0.0], timestamp=10.0)
+    store.update(second)
+    b = store.at(10.0)
+    row = b.row_of("b")
+    assert b.velocity[row] > 100.0 and (b.track[row] < 10.0 or b.track[row] > 350.0)
+
+    # a is dropped after max_age without measurements; frames are cached
+    store.update(FleetSnapshot(["b"], ["B"], [46.1], [-76.0], [1e4], [200.0], [0.0], timestamp=65.0))
+    assert sorted(store.at(65.0).icao24.tolist()) == ["b", "c"]
+    assert store.frame(81.3, frame_seconds=1.0) is store.frame(81.9, frame_seconds=1.0)
+
+
+def test_offsets_move_the_polled_snapshot_to_the_frame():
+    store = TrackStore(blend_seconds=0)
+    polled = FleetSnapshot(["b", "a", "x"], ["", "", ""], [46.0, 45.0, float("nan")], [-76.0, -75.0, 0.0],
+                           [1e4, 1e4, 1e4], [np.nan, 200.0, 200.0], [np.nan, 0.0, 0.0], timestamp=0.0)
+    t, dlat, dlon = store.offsets(polled, 10.4, frame_seconds=2.0)
+    frame = store.frame(10.4, frame_seconds=2.0)
+    assert t == 10.0
+    # b is parked, a flew 2 km north, x has no position (and no track)
+    assert np.array_equal(dlon, [0.0, 0.0, 0.0]) and dlat[0] == 0.0 and dlat[2] == 0.0
+    assert np.isclose(polled.lat[1] + dlat[1], frame.get("a")["lat"])
+    assert np.isclose(haversine_pairs(45.0, -75.0, 45.0 + dlat[1], -75.0), 2000.0, rtol=1e-3)
+    assert store.offsets(polled, 11.9, frame_seconds=2.0) is store.offsets(polled, 10.1, frame_seconds=2.0)
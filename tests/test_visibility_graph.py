@@ -0,0 +1,229 @@
+import random
+
+import numpy as np
+
+from calculate_path import build_graph_python, extrapolate_fleet, extrapolate_positions, los_distance
+from fleet import FleetSnapshot
+from spatial_index import ECEFGrid
+from visibility_graph import (
+    IncrementalLOSGraph,
+    build_los_graph,
+    connected_components,
+    haversine_matrix,
+    horizon_adjacencies,
+    los_adjacency,
+    horizon_radii,
+    los_edges,
+    los_edges_bruteforce,
+    los_edges_parallel,
+)
+
+
+def random_planes(n, seed=0):
+    rng = random.Random(seed)
+    return [
+        {
+            "icao24": f"{k:06x}",
+            "callsign": None,
+            "lat": rng.uniform(40.0, 60.0),
+            "lon": rng.uniform(-120.0, -70.0),
+            "geo_alt": rng.choice([None, 0, rng.uniform(500, 12000)]),
+        }
+        for k in range(n)
+    ]
+
+
+def assert_same_graph(g1, g2):
+    assert g1.keys() == g2.keys()
+    for node in g1:
+        assert [n for n, _ in g1[node]] == [n for n, _ in g2[node]]
+        assert np.allclose([w for _, w in g1[node]], [w for _, w in g2[node]])
+
+
+def test_horizon_radii_matches_los_distance():
+    alts = [None, -5, 0, 100, 11000]
+    for a, h in zip(alts, horizon_radii(alts)):
+        assert abs(h - los_distance(a, 0)) < 1e-6
+
+
+def test_numpy_graph_matches_python_loop():
+    planes = random_planes(300)
+    for metric in ("delay", "hops"):
+        expected = build_graph_python(planes, extra_delay=0.01, metric=metric)
+        actual = build_los_graph(
+            [p["icao24"] for p in planes],
+            [p["lat"] for p in planes],
+            [p["lon"] for p in planes],
+            [p["geo_alt"] for p in planes],
+            metric=metric,
+            extra_delay=0.01,
+            backend="bruteforce",
+        )
+        assert_same_graph(expected, actual)
+
+
+def test_block_size_does_not_change_edges():
+    planes = random_planes(250, seed=3)
+    args = ([p["lat"] for p in planes], [p["lon"] for p in planes], [p["geo_alt"] for p in planes])
+    full = los_edges_bruteforce(*args, block_size=1024)
+    tiled = los_edges_bruteforce(*args, block_size=37)
+    for a, b in zip(full, tiled):
+        assert np.array_equal(a, b)
+
+
+def test_grid_backend_matches_bruteforce():
+    planes = random_planes(400, seed=5)
+    args = ([p["lat"] for p in planes], [p["lon"] for p in planes], [p["geo_alt"] for p in planes])
+    brute = los_edges(*args, backend="bruteforce")
+    grid = los_edges(*args, backend="grid")
+    assert np.array_equal(brute[0], grid[0])
+    assert np.array_equal(brute[1], grid[1])
+    assert np.allclose(brute[2], grid[2])
+
+
+def test_grid_backend_across_antimeridian_and_pole():
+    rng = np.random.default_rng(7)
+    lat = np.concatenate([rng.uniform(-5, 5, 100), rng.uniform(86, 90, 100)])
+    lon = np.concatenate([rng.choice([-179.5, 179.5], 100) + rng.uniform(-0.4, 0.4, 100), rng.uniform(-180, 180, 100)])
+    alt = rng.uniform(0, 11000, 200)
+    brute = los_edges(lat, lon, alt, backend="bruteforce")
+    grid = los_edges(lat, lon, alt, backend="grid")
+    assert len(brute[0]) > 0
+    assert np.array_equal(brute[0], grid[0])
+    assert np.array_equal(brute[1], grid[1])
+
+
+def test_parallel_tiles_identical_to_serial_grid():
+    planes = random_planes(1500, seed=9)
+    args = ([p["lat"] for p in planes], [p["lon"] for p in planes], [p["geo_alt"] for p in planes])
+    serial = los_edges(*args, backend="grid")
+    parallel = los_edges_parallel(*args, workers=2, tiles_per_worker=3, min_aircraft=0)
+    assert len(serial[0]) > 0
+    for a, b in zip(serial, parallel):
+        assert np.array_equal(a, b)
+
+
+def test_grid_near_covers_every_point_within_radius():
+    rng = np.random.default_rng(2)
+    # Includes points around the pole and across the antimeridian
+    lat = np.concatenate([rng.uniform(-60, 60, 300), rng.uniform(85, 90, 50)])
+    lon = np.concatenate([rng.uniform(-180, 180, 300), rng.uniform(-180, 180, 50)])
+    radius = 800000.0
+    grid = ECEFGrid(lat, lon, radius)
+    queries = np.array([0, 7, 300, 349])
+    p, q = grid.near(queries)
+    d = haversine_matrix(lat[queries], lon[queries], lat, lon)
+    for row, point in enumerate(queries):
+        assert set(np.flatnonzero(d[row] <= radius)) <= set(q[p == point].tolist())
+
+
+def edge_set(i, j, ids):
+    return {(ids[a], ids[b]) if ids[a] < ids[b] else (ids[b], ids[a]) for a, b in zip(i.tolist(), j.tolist())}
+
+
+def test_incremental_graph_tracks_full_rebuild():
+    rng = np.random.default_rng(11)
+    n = 300
+    fleet = FleetSnapshot.from_dicts(random_planes(n, seed=11))
+    graph = IncrementalLOSGraph(slack=20000)
+    graph.apply_snapshot(fleet)
+
+    velocity = rng.uniform(150, 260, n)
+    track = rng.uniform(0, 360, n)
+    for step in range(1, 6):
+        lat, lon = extrapolate_positions(fleet.lat, fleet.lon, velocity, track, 60 * step)
+        moved = fleet.with_positions(lat, lon)
+        graph.apply_snapshot(moved)
+        ids = moved.icao24.tolist()
+        i, j, _ = los_edges(moved.lat, moved.lon, moved.geo_alt, backend="bruteforce")
+        assert {(a, b) for a, b, _ in graph.edge_list()} == edge_set(i, j, ids)
+
+
+def test_incremental_graph_delta_updates():
+    planes = random_planes(200, seed=4)
+    graph = IncrementalLOSGraph(slack=20000)
+    graph.update(added=planes[:150])
+    graph.update(added=planes[150:], removed=[p["icao24"] for p in planes[:20]])
+
+    nudged = [dict(p, lat=p["lat"] + 0.01) for p in planes[20:30]]
+    graph.update(moved=nudged)
+    assert (graph.last_update["reindexed"], graph.last_update["kept"]) == (0, 10)
+
+    current = nudged + planes[30:]
+    ids = [p["icao24"] for p in current]
+    i, j, _ = los_edges([p["lat"] for p in current], [p["lon"] for p in current],
+                        [p["geo_alt"] for p in current], backend="bruteforce")
+    assert len(graph) == len(current)
+    assert {(a, b) for a, b, _ in graph.edge_list()} == edge_set(i, j, ids)
+    # A 1.1 km nudge only re-tests pairs that close to the LOS limit, far
+    # fewer than the links of the nudged aircraft
+    assert graph.last_update["pair_tests"] < np.count_nonzero((i < 10) | (j < 10)) // 4
+
+
+def bfs_components(n, i, j):
+    neighbors = [[] for _ in range(n)]
+    for a, b in zip(i.tolist(), j.tolist()):
+        neighbors[a].append(b)
+        neighbors[b].append(a)
+    labels, count = [None] * n, 0
+    for root in range(n):
+        if labels[root] is None:
+            labels[root], queue = count, [root]
+            while queue:
+                node = queue.pop()
+                for other in neighbors[node]:
+                    if labels[other] is None:
+                        labels[other] = count
+                        queue.append(other)
+            count += 1
+    return labels
+
+
+def test_components_match_bfs_and_follow_incremental_updates():
+    planes = random_planes(400, seed=8)
+    fleet = FleetSnapshot.from_dicts(planes)
+    i, j, _ = los_edges(fleet.lat, fleet.lon, fleet.geo_alt, backend="bruteforce")
+    expected = bfs_components(len(fleet), i, j)
+    assert connected_components(len(fleet), i, j).tolist() == expected
+    assert len(set(expected)) > 1
+
+    graph = los_adjacency(fleet)
+    lone = next(k for k in range(len(fleet)) if expected.count(expected[k]) == 1)
+    other = next(k for k, p in enumerate(planes) if (p["geo_alt"] or 0) > 1000 and k != lone)
+    assert not graph.connected(planes[lone]["icao24"], planes[other]["icao24"])
+    assert graph.with_metric("hops").components() is graph.components()
+
+    # Pull the lone aircraft on top of another one: the islands merge
+    incremental = IncrementalLOSGraph()
+    incremental.apply_snapshot(fleet)
+    lat, lon = fleet.lat.copy(), fleet.lon.copy()
+    lat[lone], lon[lone] = lat[other] + 0.01, lon[other]
+    moved = fleet.with_positions(lat, lon)
+    incremental.apply_snapshot(moved)
+    adjacency = incremental.adjacency(frozen=True)
+    assert adjacency.connected(planes[lone]["icao24"], planes[other]["icao24"])
+    i, j, _ = los_edges(moved.lat, moved.lon, moved.geo_alt, backend="bruteforce")
+    labels = adjacency.labels_of(moved.icao24)
+    expected = bfs_components(len(moved), i, j)
+    # Same partition, whatever the label numbering
+    assert len(set(zip(labels.tolist(), expected))) == len(set(expected)) == len(set(labels.tolist()))
+
+
+def test_horizon_adjacencies_match_per_horizon_graphs():
+    rng = np.random.default_rng(9)
+    planes = [dict(p, velocity=rng.uniform(150, 260), track=rng.uniform(0, 360)) for p in random_planes(300, seed=9)]
+    fleet = FleetSnapshot.from_dicts(planes)
+    forecasts = [extrapolate_fleet(fleet, seconds) for seconds in range(0, 1201, 120)]
+    lats = np.array([f.lat for f in forecasts])
+    lons = np.array([f.lon for f in forecasts])
+    for backend in ("grid", "bruteforce"):
+        # A small drift allowance splits the horizons over several candidate sets
+        graphs = list(horizon_adjacencies(fleet, lats, lons, backend=backend, max_drift=60000))
+        assert len(graphs) == len(forecasts)
+        for graph, forecast in zip(graphs, forecasts):
+            expected = los_adjacency(forecast)
+            for icao in fleet.icao24.tolist():
+                actual_links, expected_links = graph.get(icao), expected.get(icao)
+                assert [n for n, _ in actual_links] == [n for n, _ in expected_links]
+                assert np.allclose([w for _, w in actual_links], [w for _, w in expected_links])
+            assert graph.components().tolist() == expected.components().tolist()
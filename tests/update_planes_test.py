@@ -5,18 +5,18 @@ import os
 from datetime import datetime
 import random
 
-# Load your API client credentials
-with open("../credentials.json") as f:
-    creds = json.load(f)
-
 # Token endpoint
 TOKEN_URL = "https://auth.opensky-network.org/auth/realms/opensky-network/protocol/openid-connect/token"
 
-data = {
-    "grant_type": "client_credentials",
-    "client_id": creds["clientId"],
-    "client_secret": creds["clientSecret"]
-}
+def load_token_request():
+    # Load your API client credentials (only needed for live fetches)
+    with open("../credentials.json") as f:
+        creds = json.load(f)
+    return {
+        "grant_type": "client_credentials",
+        "client_id": creds["clientId"],
+        "client_secret": creds["clientSecret"]
+    }
 
 def get_planes(test=True,pkl_file="planes_canada.pkl"):
     if test:
@@ -45,7 +45,7 @@ def get_planes(test=True,pkl_file="planes_canada.pkl"):
 
         return planes_list
     # Get OAuth token
-    r = requests.post(TOKEN_URL, data=data)
+    r = requests.post(TOKEN_URL, data=load_token_request())
     r.raise_for_status()
     access_token = r.json()["access_token"]
 